@@ -150,6 +150,90 @@ import os
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# Asynchronous uploads are spooled here until `manage.py process_upload_jobs` stores them in S3
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(MEDIA_ROOT, "upload_spool"))
+UPLOAD_JOB_MAX_ATTEMPTS = 3
+# A worker leases a job for this long; if it dies, the job is retried once the lease runs out
+UPLOAD_JOB_LEASE_SECONDS = 600
+
+# Bulk uploads stream files to S3 through a thread pool of this size
+BULK_UPLOAD_MAX_WORKERS = int(os.getenv("BULK_UPLOAD_MAX_WORKERS", "8"))
+BULK_UPLOAD_MAX_FILES = 500
+
+# Seconds an upload token from `generate-tags/` (with stage=true) stays valid for `finalize-upload/`
+UPLOAD_TOKEN_MAX_AGE = 3600
+
+# Rekognition label results are cached by image content hash for this long,
+# keeping at most LABEL_CACHE_MAX_ENTRIES rows (least recently used are evicted first)
+from datetime import timedelta
+
+LABEL_CACHE_TTL = timedelta(days=int(os.getenv("LABEL_CACHE_TTL_DAYS", "30")))
+LABEL_CACHE_MAX_ENTRIES = int(os.getenv("LABEL_CACHE_MAX_ENTRIES", "100000"))
+
+# Image listings paginate with ?page_size=&cursor= (newest first); ?stream=true streams every row,
+# reading IMAGE_LIST_STREAM_CHUNK_SIZE rows from the database at a time
+IMAGE_LIST_DEFAULT_PAGE_SIZE = 100
+IMAGE_LIST_MAX_PAGE_SIZE = 500
+IMAGE_LIST_STREAM_CHUNK_SIZE = 500
+
+# Uploaded images get resized variants at these widths in each format, built by a pool of
+# IMAGE_VARIANT_WORKERS threads; `manage.py build_image_variants` backfills older images
+IMAGE_VARIANT_WIDTHS = (200, 400, 800)
+IMAGE_VARIANT_FORMATS = ("webp", "jpeg")
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "4"))
+
+# Deleted images' stored objects are removed with batched deletes (S3 allows at most 1,000 keys per
+# request); failures stay queued and `manage.py process_storage_deletions` retries them with
+# exponential backoff, from STORAGE_DELETE_RETRY_DELAY up to STORAGE_DELETE_MAX_RETRY_DELAY
+BULK_DELETE_MAX_IMAGES = 1000
+STORAGE_DELETE_BATCH_SIZE = 1000
+STORAGE_DELETE_RETRY_DELAY = timedelta(minutes=1)
+STORAGE_DELETE_MAX_RETRY_DELAY = timedelta(days=1)
+
+# Precomputed Rekognition label embeddings, written by `manage.py build_label_embeddings`
+LABEL_EMBEDDINGS_DIR = os.getenv("LABEL_EMBEDDINGS_DIR", os.path.join(BASE_DIR, "cache", "label_embeddings"))
+
+# Compiled label taxonomy (parents, aliases and categories with precomputed closures), written by
+# `manage.py build_label_taxonomy`. LABEL_TAXONOMY_EXTRA_CSV adds rows with Label, Parents, Aliases
+# and Categories columns to the curated images/label_parents.csv. LABEL_TAXONOMY_HEAD_NOUNS gives
+# labels without explicit parents their head noun as parent; it is off because it misfiles labels
+# such as "Hot Dog" (under "Dog") and "Sea Lion" (under "Lion").
+LABEL_TAXONOMY_DIR = os.getenv("LABEL_TAXONOMY_DIR", os.path.join(BASE_DIR, "cache", "label_taxonomy"))
+LABEL_TAXONOMY_EXTRA_CSV = os.getenv("LABEL_TAXONOMY_EXTRA_CSV")
+LABEL_TAXONOMY_HEAD_NOUNS = False
+
+# Semantic image search: an IVF index of image tag/name vectors, written by
+# `manage.py build_image_index` and kept current by the `manage.py update_image_index` worker,
+# which merges newly encoded images once IMAGE_SEARCH_MERGE_THRESHOLD accumulate. Searches across
+# all images score the IMAGE_SEARCH_NPROBE clusters nearest the query. IMAGE_SEARCH_INDEX_DIR is a
+# symlink to the current version directory, which is written next to it.
+IMAGE_SEARCH_INDEX_DIR = os.getenv("IMAGE_SEARCH_INDEX_DIR", os.path.join(BASE_DIR, "cache", "image_index"))
+IMAGE_SEARCH_NPROBE = 8
+IMAGE_SEARCH_MAX_RESULTS = 100
+IMAGE_SEARCH_MERGE_THRESHOLD = 1000
+IMAGE_SEARCH_ENCODE_BATCH_SIZE = 64
+
+# How text is embedded: "sentence-transformers" (PyTorch), "sentence-transformers-int8" (int8-quantized
+# PyTorch), or "onnx" / "onnx-int8" (ONNX Runtime, no PyTorch needed; export the model first with
+# `manage.py export_embedding_model --quantize`). Rebuild the label and image search caches after switching.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+
+# Prompt encodes from concurrent requests are gathered for up to EMBEDDING_BATCH_WINDOW_MS and run
+# as one batch of at most EMBEDDING_BATCH_MAX_SIZE; the last EMBEDDING_CACHE_SIZE results are cached
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = 64
+EMBEDDING_CACHE_SIZE = 1024
+
+# Album prompts exclude a label that scores at least this (cosine) against a negated phrase
+# ("no animals") and higher than against the rest of the prompt
+PROMPT_NEGATION_MIN_SCORE = 0.4
+
+# Load the embedding model at startup instead of on the first prompt request.
+# Enable for app servers (e.g. with `gunicorn --preload`), never for management commands.
+EMBEDDING_MODEL_PRELOAD = os.getenv("EMBEDDING_MODEL_PRELOAD", "false").lower() in ("1", "true", "yes")
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000", 
 ]
@@ -166,7 +250,42 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
 
-AWS_S3_CUSTOM_DOMAIN = f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com"
-
-if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
-    raise ValueError("AWS Credentials are missing! Make sure they are set as environment variables.")
+AWS_S3_CUSTOM_DOMAIN = os.getenv("AWS_S3_CUSTOM_DOMAIN", f"https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com")
+
+# How image URLs are built: "public" bucket URLs, "cdn" URLs on AWS_S3_CUSTOM_DOMAIN (e.g. a
+# CloudFront distribution), or "presigned" URLs valid for IMAGE_URL_EXPIRY seconds for private buckets.
+# Signed URLs are reused until IMAGE_URL_REFRESH_MARGIN seconds before they expire.
+IMAGE_URL_MODE = os.getenv("IMAGE_URL_MODE", "public")
+IMAGE_URL_EXPIRY = int(os.getenv("IMAGE_URL_EXPIRY", "3600"))
+IMAGE_URL_REFRESH_MARGIN = 300
+IMAGE_URL_CACHE_SIZE = 20000
+
+# Every AWS client is shared per process and keeps up to AWS_MAX_POOL_CONNECTIONS HTTP connections
+# open; keep it at least as large as the busiest thread pool (bulk uploads, variant builds).
+# AWS_RETRY_MODE is "standard" or "adaptive" (client-side rate limiting under throttling), and
+# AWS_MAX_ATTEMPTS counts the first attempt.
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+AWS_CONNECT_TIMEOUT = 5
+AWS_READ_TIMEOUT = 60
+
+# Where images are stored and how they are labelled. Production uses S3 and Rekognition; set
+# STORAGE_BACKEND=images.storage.LocalStorage and LABELER_BACKEND=images.labeling.FakeLabeler to run
+# (or benchmark) the whole upload path offline. `manage.py check` warns when an AWS backend is
+# selected without credentials.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "images.storage.S3Storage")
+LABELER_BACKEND = os.getenv("LABELER_BACKEND", "images.labeling.RekognitionLabeler")
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", os.path.join(MEDIA_ROOT, "storage"))
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", f"http://localhost:8000{MEDIA_URL}storage/")
+
+# Small read-mostly data such as per-user tag vocabularies is cached here. Set CACHE_URL to a
+# redis:// URL to share one cache between app servers; otherwise each process keeps its own.
+CACHE_URL = os.getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "sortfolio"}}
+
+# Seconds a cached tag vocabulary may live; tag writes invalidate it sooner
+TAG_VOCABULARY_CACHE_TIMEOUT = 3600
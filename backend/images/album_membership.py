@@ -0,0 +1,82 @@
+# This module keeps album membership up to date when tags change.
+# An album holds its manually added images plus every image of its owner that carries one of the
+# album's tags or a label below one in the label taxonomy (an "Animal" album takes "Dog" images).
+# Membership is applied at write time from the tag diff, touching only the affected
+# albums and images, so reading an album is a plain indexed query with no writes.
+
+from django.db import transaction
+
+from . import label_taxonomy, tag_index
+from .models import Album, ImageTag
+
+AlbumImage = Album.images.through
+
+
+def _add_members(pairs):
+    AlbumImage.objects.bulk_create(
+        [AlbumImage(album_id=album_id, uploadedimage_id=image_id) for album_id, image_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+def on_image_tags_changed(image, added, removed):
+    """
+    Apply an image's tag diff to its owner's albums: join albums that use an added tag (or a label
+    above it), and leave albums it only matched through a removed tag.
+    """
+    taxonomy = label_taxonomy.get_taxonomy()
+    if added:
+        albums = tag_index.filter_by_tags(Album.objects.filter(user_id=image.user_id), taxonomy.generalise(added))
+        _add_members((album_id, image.id) for album_id in albums.values_list("id", flat=True))
+
+    if removed:
+        remaining = taxonomy.generalise(image.tags)
+        removed = taxonomy.generalise(removed)
+        stale = [
+            album_id
+            for album_id, album_tags in image.albums.values_list("id", "tags")
+            if set(album_tags) & removed and not set(album_tags) & remaining
+        ]
+        AlbumImage.objects.filter(album_id__in=stale, uploadedimage_id=image.id).delete()
+
+
+def on_album_tags_changed(album, added, removed):
+    """
+    Apply an album's tag diff: add the owner's images carrying an added tag (or a label below it),
+    and remove member images that only matched through a removed tag.
+    """
+    taxonomy = label_taxonomy.get_taxonomy()
+    if added:
+        image_ids = ImageTag.objects.filter(
+            user_id=album.user_id, tag__name__in=taxonomy.expand(added)
+        ).values_list("image_id", flat=True)
+        _add_members((album.id, image_id) for image_id in set(image_ids))
+
+    if removed:
+        members = album.images.filter(
+            id__in=ImageTag.objects.filter(user_id=album.user_id, tag__name__in=taxonomy.expand(removed)).values("image_id")
+        )
+        if album.tags:
+            members = members.exclude(
+                id__in=tag_index.images_with_any_tag(album.user_id, taxonomy.expand(album.tags)).values("id")
+            )
+        AlbumImage.objects.filter(album_id=album.id, uploadedimage_id__in=members.values("id")).delete()
+
+
+def set_album_tags(album, tags):
+    """Save new tags on an album and update its membership from the diff. Returns (added, removed)."""
+    old = set(album.tags)
+    new = set(tags)
+    with transaction.atomic():
+        album.tags = tags
+        album.save(update_fields=["tags"])
+        on_album_tags_changed(album, new - old, old - new)
+    return new - old, old - new
+
+
+def resync_album(album):
+    """
+    Add every image the album's tags now match, e.g. after the label taxonomy is recompiled.
+    Images are never removed here, since manually added members look the same as tag-matched ones.
+    """
+    on_album_tags_changed(album, set(album.tags), set())
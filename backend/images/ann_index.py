@@ -0,0 +1,189 @@
+# This module implements the on-disk approximate nearest-neighbour index used by semantic image search.
+# It is an inverted-file (IVF) index: vectors are clustered around k-means centroids and stored
+# grouped by cluster, so a query scores only the few clusters nearest to it instead of every vector.
+# An index is a directory of .npy files plus a JSON manifest, memory-mapped by every worker. Each
+# save writes a new versioned directory and repoints a symlink at it in one rename, so readers
+# always find a complete index. Rebuilding retrains the centroids; merging new vectors reuses them.
+
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout changes so stale indexes are never memory-mapped.
+INDEX_FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+ARRAYS = ("centroids", "vectors", "ids", "owners", "offsets")
+
+
+def normalise(matrix):
+    """Return float32 rows scaled to unit length (zero rows are left as they are)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def default_nlist(count):
+    """Return a cluster count of about sqrt(count), the usual IVF trade-off between probe and scan cost."""
+    return int(min(4096, max(1, round(count ** 0.5))))
+
+
+def train_centroids(vectors, nlist, iterations=10, sample_size=50000, seed=0):
+    """Run spherical k-means on (a sample of) the vectors and return nlist unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Reseed empty clusters with random vectors so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalise(sums)
+    return centroids
+
+
+def _assign(vectors, centroids, chunk_size=65536):
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk_size)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+class IVFIndex:
+    """A memory-mappable IVF index over unit-length vectors, each with an id and an owner id."""
+
+    def __init__(self, centroids, vectors, ids, owners, offsets, meta=None):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.owners = owners
+        self.offsets = offsets
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors, ids, owners, nlist=None, centroids=None, meta=None):
+        """Cluster the vectors (or assign them to the given centroids) and lay them out list by list."""
+        vectors = normalise(vectors).reshape(len(ids), -1)
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = np.asarray(owners, dtype=np.int64)
+        if centroids is None:
+            centroids = (
+                train_centroids(vectors, nlist or default_nlist(len(vectors)))
+                if len(vectors) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            )
+
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, vectors[order], ids[order], owners[order], offsets, meta)
+
+    def merge(self, vectors, ids, owners, meta=None):
+        """
+        Return a new index with these vectors added (replacing any with the same id), reusing the
+        trained centroids. Recall degrades slowly as data drifts, so rebuild from time to time.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        keep = ~np.isin(self.ids, ids)
+        return IVFIndex.build(
+            np.concatenate([np.asarray(self.vectors)[keep], normalise(vectors).reshape(len(ids), -1)]),
+            np.concatenate([np.asarray(self.ids)[keep], ids]),
+            np.concatenate([np.asarray(self.owners)[keep], np.asarray(owners, dtype=np.int64)]),
+            centroids=np.asarray(self.centroids) if len(self.centroids) else None,
+            meta=meta,
+        )
+
+    def candidate_rows(self, query, nprobe=None, owner=None):
+        """
+        Return the row numbers to score for a query: every row of `owner` (an exact scan of one
+        user's vectors), or the rows of the nprobe clusters nearest the query.
+        """
+        if owner is not None:
+            return np.flatnonzero(self.owners == owner)
+        if nprobe is None or nprobe >= len(self.centroids):
+            return np.arange(len(self.ids))
+        lists = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+        return np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+
+    def search(self, query, k, nprobe=None, owner=None):
+        """Return up to k (id, score) pairs for a unit-length query, best first."""
+        rows = self.candidate_rows(query, nprobe, owner)
+        if len(rows) == 0 or k <= 0:
+            return []
+        scores = np.asarray(self.vectors[rows] @ query)
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(self.ids[rows[i]]), float(scores[i])) for i in top]
+
+    def save(self, directory):
+        """
+        Write the index to a new version directory next to `directory`, then point the `directory`
+        symlink at it in one rename. The previous version is kept for readers still opening it.
+        """
+        directory = os.path.abspath(directory)
+        parent, base = os.path.split(directory)
+        os.makedirs(parent, exist_ok=True)
+        version = f".{base}.v-{uuid.uuid4().hex}"
+        staging = os.path.join(parent, version)
+        os.makedirs(staging)
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name)), allow_pickle=False)
+        meta = dict(self.meta, version=INDEX_FORMAT_VERSION, count=len(self), dim=int(self.vectors.shape[1]))
+        with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        # An index saved before versioning is a plain directory; a symlink cannot replace it in one
+        # rename, so it is moved aside first (once, leaving a brief gap)
+        if os.path.isdir(directory) and not os.path.islink(directory):
+            os.replace(directory, os.path.join(parent, f".{base}.v-legacy-{uuid.uuid4().hex}"))
+
+        retired = os.path.realpath(directory) if os.path.islink(directory) else None
+        link = os.path.join(parent, f".{base}.link-{uuid.uuid4().hex}")
+        os.symlink(version, link)
+        os.replace(link, directory)
+        _remove_old_versions(parent, base, keep={staging, retired})
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map an index written by save(). Returns None if there is no usable index."""
+        # Resolve the symlink once so every file comes from the same version
+        directory = os.path.realpath(directory)
+        try:
+            with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_FORMAT_VERSION:
+                return None
+            arrays = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                for name in ARRAYS
+            }
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable image search index %s: %s", directory, e)
+            return None
+        return cls(meta=meta, **arrays)
+
+
+def _remove_old_versions(parent, base, keep):
+    # Versions older than the ones kept can no longer be reached through the symlink; newer ones
+    # may be another writer's save in progress
+    versions = [
+        os.path.join(parent, name) for name in os.listdir(parent) if name.startswith(f".{base}.v-")
+    ]
+    oldest_kept = min(os.stat(path).st_mtime_ns for path in keep if path)
+    for path in versions:
+        if path not in keep and os.stat(path).st_mtime_ns < oldest_kept:
+            shutil.rmtree(path, ignore_errors=True)
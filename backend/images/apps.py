@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ImagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'images'
+
+    def ready(self):
+        from . import checks  # noqa: F401  (registers the backend configuration checks)
+
+        # Preload the embedding model when serving, so a `gunicorn --preload` master loads it
+        # once before forking and workers share its pages copy-on-write.
+        if getattr(settings, "EMBEDDING_MODEL_PRELOAD", False):
+            from . import embedding_model
+
+            embedding_model.warmup()
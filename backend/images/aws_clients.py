@@ -0,0 +1,119 @@
+# This module creates the AWS clients shared by the image views, the users app and the upload worker.
+# Clients are built lazily, once per process and service, from one boto3 session, so every
+# request reuses the same credentials and HTTP connection pool instead of paying for a new
+# client (and TLS handshake) each time. Pool size, retries and timeouts come from settings.
+
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+_lock = threading.Lock()
+_pid = None
+_session = None
+_clients = {}
+_stats = {}
+
+# Old import names, resolved on first access through __getattr__ below
+_ALIASES = {"s3_client": "s3", "rekognition_client": "rekognition"}
+
+
+def max_pool_connections():
+    return getattr(settings, "AWS_MAX_POOL_CONNECTIONS", 50)
+
+
+def retry_mode():
+    return getattr(settings, "AWS_RETRY_MODE", "standard")
+
+
+def max_attempts():
+    return getattr(settings, "AWS_MAX_ATTEMPTS", 3)
+
+
+def connect_timeout():
+    return getattr(settings, "AWS_CONNECT_TIMEOUT", 5)
+
+
+def read_timeout():
+    return getattr(settings, "AWS_READ_TIMEOUT", 60)
+
+
+def client_config():
+    return Config(
+        max_pool_connections=max_pool_connections(),
+        retries={"mode": retry_mode(), "total_max_attempts": max_attempts()},
+        connect_timeout=connect_timeout(),
+        read_timeout=read_timeout(),
+    )
+
+
+def _reset_after_fork():
+    # Connection pools must not be shared with a parent process, so a forked worker starts afresh
+    global _pid, _session
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _session = None
+        _clients.clear()
+        _stats.clear()
+
+
+def get_client(service):
+    """Return this process's shared boto3 client for an AWS service, creating it on first use."""
+    global _session
+    with _lock:
+        _reset_after_fork()
+        if service not in _clients:
+            if _session is None:
+                _session = boto3.session.Session(
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_REGION,
+                )
+            _clients[service] = _session.client(service, config=client_config())
+            _stats[service] = {"created": 1, "reused": 0}
+        else:
+            _stats[service]["reused"] += 1
+        return _clients[service]
+
+
+def __getattr__(name):
+    if name in _ALIASES:
+        return get_client(_ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _connection_counts(client):
+    """Return (connections opened, requests sent) across the client's urllib3 pools, or (None, None)."""
+    try:
+        manager = client._endpoint.http_session._manager
+        pools = [manager.pools[key] for key in manager.pools.keys()]
+    except (AttributeError, KeyError):
+        return None, None
+    return sum(pool.num_connections for pool in pools), sum(pool.num_requests for pool in pools)
+
+
+def stats():
+    """Return per-service client reuse and HTTP connection reuse counters for this process."""
+    with _lock:
+        clients = dict(_clients)
+        snapshot = {service: dict(counts) for service, counts in _stats.items()}
+
+    for service, counts in snapshot.items():
+        connections, requests = _connection_counts(clients[service])
+        counts["connections"] = connections
+        counts["requests"] = requests
+        counts["connection_reuse_ratio"] = (
+            round(1 - connections / requests, 4) if requests else None
+        )
+    return {"max_pool_connections": max_pool_connections(), "clients": snapshot}
+
+
+def clear():
+    """Forget every client, so the next get_client builds a new one (e.g. after settings change)."""
+    global _session
+    with _lock:
+        _session = None
+        _clients.clear()
+        _stats.clear()
@@ -1,26 +1,28 @@
 # This module integrates with AWS Rekognition to analyse images stored in an S3 bucket.
-# It uses the AWS SDK (boto3) to detect labels in images, providing a simple interface
-# for retrieving image metadata such as objects, scenes, and activities.
+# It uses the configured labeler (Rekognition in production) to detect labels in images,
+# providing a simple interface for retrieving image metadata such as objects, scenes, and activities.
 
-import boto3
-import os
+from . import label_cache
+from .labeling import get_labeler
+from .models import UploadedImage
 
-# Initialize AWS Rekognition client
-rekognition = boto3.client(
-    "rekognition",
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
-
-def analyze_image(s3_bucket, image_key):
-    """Analyze an image in S3 and return detected labels."""
+def analyze_image(s3_bucket, image_key, content_hash=None):
+    """Analyze an image in S3 and return detected labels, reusing cached labels for known content."""
     try:
-        response = rekognition.detect_labels(
-            Image={"S3Object": {"Bucket": s3_bucket, "Name": image_key}},
-            MaxLabels=10,
-            MinConfidence=75
-        )
-        labels = [label["Name"] for label in response["Labels"]]
-        return labels
+        if content_hash is None:
+            content_hash = (
+                UploadedImage.objects.filter(image=image_key)
+                .exclude(content_hash="")
+                .values_list("content_hash", flat=True)
+                .first()
+            )
+
+        image = {"S3Object": {"Bucket": s3_bucket, "Name": image_key}}
+        if content_hash:
+            labels = label_cache.detect_labels(content_hash, image, max_labels=10, min_confidence=75)
+        else:
+            labels = get_labeler().detect_labels(Image=image, MaxLabels=10, MinConfidence=75)["Labels"]
+        return [label["Name"] for label in labels]
     except Exception as e:
         print(f"AWS Rekognition Error: {e}")
         return []
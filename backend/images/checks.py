@@ -0,0 +1,26 @@
+# This module registers system checks for the storage and labeling backend settings.
+# Missing AWS credentials used to stop settings.py from loading at all; now the app starts
+# and `manage.py check` warns only when an AWS backend is actually selected.
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+AWS_BACKENDS = {
+    "STORAGE_BACKEND": "images.storage.S3Storage",
+    "LABELER_BACKEND": "images.labeling.RekognitionLabeler",
+}
+
+
+@register()
+def check_aws_credentials(app_configs, **kwargs):
+    if getattr(settings, "AWS_ACCESS_KEY_ID", None) and getattr(settings, "AWS_SECRET_ACCESS_KEY", None):
+        return []
+    return [
+        Warning(
+            f"{name} is {backend} but AWS credentials are missing.",
+            hint="Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY, or choose a local backend.",
+            id="images.W001",
+        )
+        for name, backend in AWS_BACKENDS.items()
+        if getattr(settings, name, backend) == backend
+    ]
@@ -0,0 +1,132 @@
+# This module defines the backends that turn text into embedding vectors.
+# EMBEDDING_BACKEND picks one: "sentence-transformers" runs the model in PyTorch (the default),
+# "sentence-transformers-int8" does the same with int8-quantized linear layers, and "onnx" /
+# "onnx-int8" run a model exported by `manage.py export_embedding_model` in ONNX Runtime, which
+# needs neither torch nor sentence-transformers on the app servers. Every backend exposes the
+# SentenceTransformer-style encode() the rest of the app already calls.
+
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_BACKEND = "sentence-transformers"
+ONNX_MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model-int8.onnx"}
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+def backend_name():
+    return getattr(settings, "EMBEDDING_BACKEND", DEFAULT_BACKEND)
+
+
+def onnx_dir(model_name):
+    default = os.path.join(settings.BASE_DIR, "cache", "onnx", model_name.replace("/", "_"))
+    return getattr(settings, "EMBEDDING_ONNX_DIR", None) or default
+
+
+def onnx_threads():
+    return getattr(settings, "EMBEDDING_ONNX_THREADS", 0)
+
+
+def identity(name, model_name):
+    """
+    Return the name cached embeddings are stored under for a backend and model. Backends other than
+    the default produce slightly different vectors, so their label caches and search vectors are kept apart.
+    """
+    return model_name if name == DEFAULT_BACKEND else f"{model_name}+{name}"
+
+
+def mean_pool(token_embeddings, attention_mask, normalize=True):
+    """Average token embeddings over the real (unpadded) tokens, as sentence-transformers does."""
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32)
+
+
+class SentenceTransformerBackend:
+    """The model in PyTorch through sentence-transformers, optionally with int8 dynamic quantization."""
+
+    def __init__(self, model_name, quantize=False, **kwargs):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu" if quantize else None, **kwargs)
+        if quantize:
+            import torch
+
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        kwargs.setdefault("convert_to_numpy", True)
+        kwargs.setdefault("show_progress_bar", False)
+        return self.model.encode(texts, batch_size=batch_size, **kwargs)
+
+
+class OnnxBackend:
+    """An exported model in ONNX Runtime, tokenized with the `tokenizers` library and mean pooled in numpy."""
+
+    def __init__(self, model_name, quantize=False):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                "The onnx embedding backends need the onnxruntime and tokenizers packages."
+            ) from e
+
+        directory = onnx_dir(model_name)
+        model_path = os.path.join(directory, ONNX_MODEL_FILES["onnx-int8" if quantize else "onnx"])
+        if not os.path.exists(model_path):
+            raise ImproperlyConfigured(
+                f"No exported model at {model_path}; run `manage.py export_embedding_model` first."
+            )
+        with open(os.path.join(directory, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        if onnx_threads():
+            options.intra_op_num_threads = onnx_threads()
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_token_id", 0))
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        return mean_pool(token_embeddings, inputs["attention_mask"], self.config.get("normalize", True))
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        vectors = np.concatenate([
+            self._encode_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)
+        ])
+        return vectors[0] if single else vectors
+
+
+BACKENDS = {
+    "sentence-transformers": lambda model_name: SentenceTransformerBackend(model_name),
+    "sentence-transformers-int8": lambda model_name: SentenceTransformerBackend(model_name, quantize=True),
+    "onnx": lambda model_name: OnnxBackend(model_name),
+    "onnx-int8": lambda model_name: OnnxBackend(model_name, quantize=True),
+}
+
+
+def load(name, model_name):
+    """Load the named backend for a model."""
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(f"Unknown EMBEDDING_BACKEND {name!r}; choose one of {', '.join(BACKENDS)}.")
+    return BACKENDS[name](model_name)
@@ -0,0 +1,265 @@
+# This module provides the process-wide SentenceTransformer model and label index.
+# Both are loaded lazily on first use, so management commands, migrations and the test runner
+# never import torch, and can optionally be preloaded before workers fork so copy-on-write
+# pages are shared between them. Single-text encodes from concurrent requests are micro-batched:
+# a worker thread gathers them for a few milliseconds and encodes them in one model call, and
+# recent results are kept in an LRU cache.
+
+import logging
+import os
+import queue
+import resource
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from . import embedding_backends
+from . import label_embeddings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_model = None
+_label_index = None
+
+# Micro-batching of single-text encodes, and the LRU cache of their results
+_batcher = None
+_cache_lock = threading.Lock()
+_cache = OrderedDict()
+_batch_metrics = {
+    "batches": 0,
+    "texts": 0,
+    "max_batch_size": 0,
+    "encode_seconds": 0.0,
+    "wait_seconds": 0.0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+}
+
+_metrics = {
+    "model_name": label_embeddings.EMBEDDING_MODEL_NAME,
+    "backend": None,
+    "model_loaded": False,
+    "model_load_seconds": None,
+    "model_rss_delta_bytes": None,
+    "label_count": 0,
+    "label_index_load_seconds": None,
+    "loaded_in_pid": None,
+}
+
+
+def batch_window():
+    return getattr(settings, "EMBEDDING_BATCH_WINDOW_MS", 5) / 1000
+
+
+def max_batch_size():
+    return getattr(settings, "EMBEDDING_BATCH_MAX_SIZE", 64)
+
+
+def cache_size():
+    return getattr(settings, "EMBEDDING_CACHE_SIZE", 1024)
+
+
+def _reset_lock_after_fork():
+    # A lock held by another thread at fork time would stay locked forever in the child,
+    # and the batcher's thread does not survive the fork, so the child starts its own.
+    global _lock, _batcher, _cache_lock
+    _lock = threading.RLock()
+    _cache_lock = threading.Lock()
+    _batcher = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+def _current_rss_bytes():
+    """Return the resident set size of this process, falling back to the peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is reported in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_model(model_name):
+    return embedding_backends.load(embedding_backends.backend_name(), model_name)
+
+
+def identity():
+    """Return the name of the configured model and backend that cached vectors are stored under."""
+    return embedding_backends.identity(embedding_backends.backend_name(), _metrics["model_name"])
+
+
+def get_model():
+    """Return the shared embedding model, loading it on first use."""
+    global _model
+    if _model is not None:
+        return _model
+
+    with _lock:
+        if _model is None:
+            rss_before = _current_rss_bytes()
+            started = time.perf_counter()
+            model = _load_model(_metrics["model_name"])
+
+            _metrics["model_load_seconds"] = round(time.perf_counter() - started, 3)
+            _metrics["model_rss_delta_bytes"] = _current_rss_bytes() - rss_before
+            _metrics["model_loaded"] = True
+            _metrics["backend"] = embedding_backends.backend_name()
+            _metrics["loaded_in_pid"] = os.getpid()
+            logger.info("Loaded embedding model %s in %.2fs", _metrics["model_name"], _metrics["model_load_seconds"])
+            _model = model
+    return _model
+
+
+def get_label_index():
+    """
+    Return (labels, matrix) for the Rekognition label set.
+    The matrix is memory-mapped from the on-disk cache; the model is only loaded if that cache is missing.
+    """
+    global _label_index
+    if _label_index is not None:
+        return _label_index
+
+    with _lock:
+        if _label_index is None:
+            started = time.perf_counter()
+            index = label_embeddings.load_label_embeddings(identity())
+            if index is None:
+                index = label_embeddings.get_label_embeddings(get_model(), identity())
+
+            _metrics["label_count"] = len(index[0])
+            _metrics["label_index_load_seconds"] = round(time.perf_counter() - started, 3)
+            _label_index = index
+    return _label_index
+
+
+class _Batcher:
+    """Encodes texts submitted from many threads in batches, on one worker thread."""
+
+    def __init__(self, window, max_size):
+        self.window = window
+        self.max_size = max_size
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self.queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Gather whatever else arrives within the window after the first text
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode(batch)
+
+    def _encode(self, batch):
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        started = time.perf_counter()
+        try:
+            vectors = get_model().encode(texts, batch_size=len(texts), convert_to_numpy=True, show_progress_bar=False)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            future.set_result(by_text[text])
+        _record_batch(len(batch), finished - started, sum(finished - queued for _, _, queued in batch))
+
+
+def _record_batch(size, encode_seconds, wait_seconds):
+    with _cache_lock:
+        _batch_metrics["batches"] += 1
+        _batch_metrics["texts"] += size
+        _batch_metrics["max_batch_size"] = max(_batch_metrics["max_batch_size"], size)
+        _batch_metrics["encode_seconds"] += encode_seconds
+        _batch_metrics["wait_seconds"] += wait_seconds
+
+
+def _get_batcher():
+    global _batcher
+    with _lock:
+        if _batcher is None:
+            _batcher = _Batcher(batch_window(), max_batch_size())
+        return _batcher
+
+
+def encode(text):
+    """
+    Encode a single string with the shared model. Concurrent calls are batched into one model call,
+    and recent results are served from an LRU cache. The returned array is read-only.
+    """
+    with _cache_lock:
+        cached = _cache.get(text)
+        if cached is not None:
+            _cache.move_to_end(text)
+            _batch_metrics["cache_hits"] += 1
+            return cached
+        _batch_metrics["cache_misses"] += 1
+
+    vector = _get_batcher().submit(text).result()
+    vector.setflags(write=False)
+    with _cache_lock:
+        _cache[text] = vector
+        _cache.move_to_end(text)
+        while len(_cache) > cache_size():
+            _cache.popitem(last=False)
+    return vector
+
+
+def clear_cache():
+    """Forget cached encodings, e.g. after switching models."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def encode_many(texts, batch_size=64):
+    """Encode a list of strings in batches with the shared model. Returns a (len(texts), dim) array."""
+    return get_model().encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+def rank_labels(prompt, k=15):
+    """Return the k Rekognition labels closest to the prompt as (label, score) pairs, best first."""
+    labels, matrix = get_label_index()
+    return label_embeddings.top_k_labels(matrix, labels, encode(prompt), k)
+
+
+def warmup():
+    """Load the model and label index now, e.g. in the master process before workers fork."""
+    get_model()
+    get_label_index()
+
+
+def batch_metrics():
+    """Return micro-batching and prompt cache counters: batch sizes, encode latency and queue wait."""
+    with _cache_lock:
+        snapshot = dict(_batch_metrics, cached=len(_cache))
+    batches, texts = snapshot["batches"], snapshot["texts"]
+    snapshot["avg_batch_size"] = round(texts / batches, 2) if batches else None
+    snapshot["avg_encode_ms"] = round(snapshot.pop("encode_seconds") * 1000 / batches, 3) if batches else None
+    snapshot["avg_wait_ms"] = round(snapshot.pop("wait_seconds") * 1000 / texts, 3) if texts else None
+    return snapshot
+
+
+def metrics():
+    """Return load-time, memory and batching metrics for the embedding model in this process."""
+    return dict(_metrics, pid=os.getpid(), rss_bytes=_current_rss_bytes(), batching=batch_metrics())
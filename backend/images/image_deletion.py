@@ -0,0 +1,178 @@
+# This module deletes images in bulk and removes their stored objects.
+# Database rows go in a fixed number of set-based queries however many images are deleted, and
+# the originals and variants no remaining image shares are queued as PendingStorageDeletion rows in
+# the same transaction. After commit they are removed with batched storage deletes; keys that fail
+# stay queued and are retried with backoff by `manage.py process_storage_deletions`. Keys are
+# content-addressed, so a claimed key that a re-upload uses again is dropped rather than deleted.
+
+import logging
+import re
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import tag_rollup
+from .models import Album, PendingStorageDeletion, StagedUpload, UploadedImage
+from .storage import DELETE_BATCH_LIMIT, get_storage
+
+logger = logging.getLogger(__name__)
+
+# See variants.variant_key
+VARIANT_KEY = re.compile(r"user_(?P<user>\d+)/variants/(?P<hash>[^/]+)/")
+
+
+def batch_size():
+    return min(getattr(settings, "STORAGE_DELETE_BATCH_SIZE", DELETE_BATCH_LIMIT), DELETE_BATCH_LIMIT)
+
+
+def retry_delay():
+    return getattr(settings, "STORAGE_DELETE_RETRY_DELAY", timedelta(minutes=1))
+
+
+def max_retry_delay():
+    return getattr(settings, "STORAGE_DELETE_MAX_RETRY_DELAY", timedelta(days=1))
+
+
+def orphaned_keys(user, images, deleted_ids):
+    """
+    Return the storage keys of `images` (dicts with image, content_hash and variants) that no other
+    image of the user still uses. Duplicate uploads share originals and content-addressed variants.
+    """
+    survivors = UploadedImage.objects.filter(user=user).exclude(id__in=deleted_ids)
+    originals = {image["image"] for image in images}
+    hashes = {image["content_hash"] for image in images if image["content_hash"]}
+    kept_originals = set(survivors.filter(image__in=originals).values_list("image", flat=True))
+    kept_hashes = set(survivors.filter(content_hash__in=hashes).values_list("content_hash", flat=True))
+
+    keys = originals - kept_originals
+    for image in images:
+        if image["content_hash"] and image["content_hash"] in kept_hashes:
+            continue
+        keys.update(key for formats in (image["variants"] or {}).values() for key in formats.values())
+    return sorted(keys)
+
+
+def referenced_keys(keys):
+    """Return the keys among `keys` that an image or a staged upload uses, e.g. after the same bytes were uploaded again."""
+    keys = set(keys)
+    referenced = set(UploadedImage.objects.filter(image__in=keys).values_list("image", flat=True))
+    referenced |= set(StagedUpload.objects.filter(key__in=keys).values_list("key", flat=True))
+
+    owners = {(match["user"], match["hash"]) for match in map(VARIANT_KEY.match, keys) if match}
+    if owners:
+        query = Q()
+        for user_id, prefix in owners:
+            query |= Q(user_id=user_id, content_hash__startswith=prefix)
+        for variants in UploadedImage.objects.filter(query).values_list("variants", flat=True):
+            referenced |= keys & {key for formats in (variants or {}).values() for key in formats.values()}
+    return referenced
+
+
+def delete_images(user, image_ids):
+    """
+    Delete a user's images and queue their unshared stored objects for deletion.
+    Returns the ids actually deleted; ids that are not the user's images are ignored.
+    """
+    with transaction.atomic():
+        images = list(
+            UploadedImage.objects.filter(user=user, id__in=image_ids).values("id", "image", "content_hash", "variants")
+        )
+        deleted_ids = [image["id"] for image in images]
+        if not deleted_ids:
+            return []
+
+        Album.images.through.objects.filter(uploadedimage_id__in=deleted_ids).delete()
+        Album.objects.filter(cover_image_id__in=deleted_ids).update(cover_image=None)
+        tag_rollup.remove_images(deleted_ids)
+        keys = orphaned_keys(user, images, deleted_ids)
+        UploadedImage.objects.filter(id__in=deleted_ids).delete()
+        enqueue(keys)
+
+    if keys:
+        transaction.on_commit(lambda: _process_now(keys))
+    return deleted_ids
+
+
+def enqueue(keys):
+    PendingStorageDeletion.objects.bulk_create(
+        [PendingStorageDeletion(key=key) for key in keys], ignore_conflicts=True, batch_size=batch_size()
+    )
+
+
+def _process_now(keys):
+    # Best effort on the request path; anything left over is retried by the command
+    try:
+        for start in range(0, len(keys), batch_size()):
+            process_pending(keys=keys[start:start + batch_size()])
+    except Exception:
+        logger.exception("Deleting %s stored objects failed; they stay queued", len(keys))
+
+
+def _backoff(attempts):
+    return min(retry_delay() * 2 ** (attempts - 1), max_retry_delay())
+
+
+def process_pending(keys=None):
+    """
+    Claim up to one batch of due deletions (only `keys`, if given) and delete them from storage.
+    Returns (deleted, failed). Failed rows are rescheduled with exponential backoff, and rows whose
+    key is in use again are dropped without deleting the object.
+    """
+    with transaction.atomic():
+        due = PendingStorageDeletion.objects.select_for_update(skip_locked=True).filter(next_attempt_at__lte=timezone.now())
+        if keys is not None:
+            due = due.filter(key__in=keys)
+        while True:
+            rows = list(due.order_by("next_attempt_at", "id")[:batch_size()])
+            if not rows:
+                return 0, 0
+            in_use = referenced_keys(row.key for row in rows)
+            if not in_use:
+                break
+            PendingStorageDeletion.objects.filter(id__in=[row.id for row in rows if row.key in in_use]).delete()
+            rows = [row for row in rows if row.key not in in_use]
+            if rows:
+                break
+
+        failed = get_storage().delete_many([row.key for row in rows])
+        PendingStorageDeletion.objects.filter(id__in=[row.id for row in rows if row.key not in failed]).delete()
+
+        now = timezone.now()
+        for row in rows:
+            if row.key in failed:
+                row.attempts += 1
+                row.last_error = failed[row.key]
+                row.next_attempt_at = now + _backoff(row.attempts)
+                row.save(update_fields=["attempts", "last_error", "next_attempt_at"])
+                logger.warning("Deleting stored object %s failed (attempt %s): %s", row.key, row.attempts, row.last_error)
+    return len(rows) - len(failed), len(failed)
+
+
+def run_worker(poll_interval=60.0, once=False):
+    """
+    Retry due deletions, and queue the objects of expired staged uploads, until none are due (with
+    `once`) or forever. Returns (deleted, failed).
+    """
+    from . import upload_pipeline
+
+    deleted = failed = 0
+    while True:
+        upload_pipeline.expire_staged_uploads()
+        batch_deleted, batch_failed = process_pending()
+        deleted += batch_deleted
+        failed += batch_failed
+        if batch_deleted or batch_failed:
+            continue
+        if once:
+            return deleted, failed
+        time.sleep(poll_interval)
+
+
+def stats():
+    """Return how many stored objects are waiting to be deleted and the most attempts any has taken."""
+    pending = PendingStorageDeletion.objects.order_by("-attempts").values_list("attempts", flat=True)
+    return {"pending": pending.count(), "max_attempts": pending.first() or 0}
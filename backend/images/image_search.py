@@ -0,0 +1,262 @@
+# This module implements semantic image search over each image's tags and name.
+# Every image gets an ImageEmbedding row holding its vector. Tag and name edits only mark that row
+# stale; the index worker (`manage.py update_image_index`) re-encodes stale rows in batches and
+# folds them into the on-disk IVF index (see `ann_index`). Searches score the memory-mapped index
+# plus the few rows encoded since it was written, so results reflect edits as soon as they are encoded.
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import embedding_model
+from .ann_index import IVFIndex, normalise
+from .models import ImageEmbedding, UploadedImage
+
+logger = logging.getLogger(__name__)
+
+# Searches also read rows written this long before an index was built from the database, so a
+# row committed late by a slow transaction is never missed by both the index and the tail
+WATERMARK_MARGIN = timedelta(minutes=1)
+
+_lock = threading.Lock()
+_loaded = {"key": None, "index": None}
+
+
+def index_dir():
+    return getattr(settings, "IMAGE_SEARCH_INDEX_DIR", os.path.join(settings.BASE_DIR, "cache", "image_index"))
+
+
+def nprobe():
+    return getattr(settings, "IMAGE_SEARCH_NPROBE", 8)
+
+
+def max_results():
+    return getattr(settings, "IMAGE_SEARCH_MAX_RESULTS", 100)
+
+
+def merge_threshold():
+    return getattr(settings, "IMAGE_SEARCH_MERGE_THRESHOLD", 1000)
+
+
+def encode_batch_size():
+    return getattr(settings, "IMAGE_SEARCH_ENCODE_BATCH_SIZE", 64)
+
+
+def embedding_text(name, tags):
+    """Return the text encoded for an image: its tags, then its file name without the extension."""
+    stem = re.sub(r"[_\-.]+", " ", os.path.splitext(name or "")[0]).strip()
+    text = ", ".join(tags or [])
+    return f"{text}. {stem}" if text and stem else text or stem
+
+
+def _digest(text):
+    return hashlib.sha256(f"{embedding_model.identity()}\n{text}".encode("utf-8")).hexdigest()
+
+
+def mark_stale(images):
+    """Queue images for (re-)encoding after their tags or name changed. Two queries however many images."""
+    images = list(images)
+    if not images:
+        return
+    now = timezone.now()
+    ImageEmbedding.objects.filter(image_id__in=[image.id for image in images]).update(stale_since=now)
+    ImageEmbedding.objects.bulk_create(
+        [ImageEmbedding(image_id=image.id, user_id=image.user_id, stale_since=now) for image in images],
+        ignore_conflicts=True,
+    )
+
+
+def encode_stale(limit=None):
+    """
+    Encode up to `limit` (default: one batch) stale rows, oldest first. Returns how many were encoded.
+    A row edited again while it was being encoded stays stale and is picked up by the next call.
+    """
+    limit = limit or encode_batch_size()
+    rows = list(
+        ImageEmbedding.objects.filter(stale_since__isnull=False)
+        .order_by("stale_since")
+        .values_list("image_id", "stale_since", "source_digest", "image__name", "image__tags")[:limit]
+    )
+    if not rows:
+        return 0
+
+    texts = {image_id: embedding_text(name, tags) for image_id, _, _, name, tags in rows}
+    changed = [row for row in rows if row[2] != _digest(texts[row[0]])]
+    vectors = dict(zip(
+        [row[0] for row in changed],
+        normalise(embedding_model.encode_many([texts[row[0]] for row in changed])) if changed else [],
+    ))
+
+    now = timezone.now()
+    with transaction.atomic():
+        for image_id, stale_since, digest, _, _ in rows:
+            current = ImageEmbedding.objects.filter(image_id=image_id, stale_since=stale_since)
+            if image_id in vectors:
+                current.update(
+                    vector=vectors[image_id].astype(np.float32).tobytes(), source_digest=_digest(texts[image_id]),
+                    stale_since=None, updated_at=now,
+                )
+            else:
+                # Same text as before (e.g. tags re-saved unchanged), so the vector still holds
+                current.update(stale_since=None)
+    return len(rows)
+
+
+def queue_missing():
+    """Mark every image without an ImageEmbedding row as stale. Returns how many were queued."""
+    missing = UploadedImage.objects.filter(embedding__isnull=True).only("id", "user_id")
+    count = last_id = 0
+    while True:
+        batch = list(missing.filter(id__gt=last_id).order_by("id")[:2000])
+        if not batch:
+            return count
+        mark_stale(batch)
+        count += len(batch)
+        last_id = batch[-1].id
+
+
+def _rows(queryset):
+    """Return (vectors, image ids, owner ids) for the encoded rows of an ImageEmbedding queryset."""
+    rows = list(queryset.exclude(vector=None).values_list("image_id", "user_id", "vector"))
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    vectors = np.stack([np.frombuffer(bytes(vector), dtype=np.float32) for _, _, vector in rows])
+    return vectors, np.array([row[0] for row in rows]), np.array([row[1] for row in rows])
+
+
+def _meta(built_at):
+    return {
+        "model": embedding_model.identity(),
+        "built_at": built_at.isoformat(),
+        "watermark": (built_at - WATERMARK_MARGIN).isoformat(),
+    }
+
+
+def rebuild(nlist=None):
+    """Build a fresh index from every encoded row, retraining the clusters. Returns the number of vectors."""
+    built_at = timezone.now()
+    vectors, ids, owners = _rows(ImageEmbedding.objects.all())
+    if not len(ids):
+        return 0
+    IVFIndex.build(vectors, ids, owners, nlist=nlist, meta=_meta(built_at)).save(index_dir())
+    return len(ids)
+
+
+def merge():
+    """Fold the rows encoded since the index was written into it, keeping its clusters. Returns rows merged."""
+    index = current_index()
+    if index is None:
+        return rebuild()
+
+    built_at = timezone.now()
+    vectors, ids, owners = _tail(index)
+    if not len(ids):
+        return 0
+    index.merge(vectors, ids, owners, meta=_meta(built_at)).save(index_dir())
+    return len(ids)
+
+
+def run_worker(poll_interval=1.0, once=False):
+    """Encode stale rows and merge them into the index once enough accumulate. Returns rows encoded."""
+    encoded = 0
+    while True:
+        batch = encode_stale()
+        encoded += batch
+        if batch:
+            continue
+        index = current_index()
+        pending = unmerged(index)
+        if pending and (index is None or pending >= merge_threshold()):
+            merge()
+        if once:
+            return encoded
+        time.sleep(poll_interval)
+
+
+def current_index():
+    """Return this process's memory-mapped index, reloading it when a newer one is written."""
+    directory = index_dir()
+    try:
+        mtime = os.stat(os.path.join(directory, "manifest.json")).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    with _lock:
+        if (directory, mtime) != _loaded["key"]:
+            index = IVFIndex.load(directory) if mtime is not None else None
+            if index is not None and index.meta.get("model") != embedding_model.identity():
+                index = None
+            # While a new index is being swapped in, keep serving the previous one and retry next time
+            if index is None and _loaded["index"] is not None and _loaded["key"][0] == directory:
+                return _loaded["index"]
+            _loaded.update(key=(directory, mtime), index=index)
+        return _loaded["index"]
+
+
+def _tail_queryset(index, user_id=None):
+    queryset = ImageEmbedding.objects.all()
+    if index is not None:
+        queryset = queryset.filter(updated_at__gte=datetime.fromisoformat(index.meta["watermark"]))
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    return queryset
+
+
+def unmerged(index):
+    """Return how many encoded rows are newer than the index."""
+    queryset = ImageEmbedding.objects.exclude(vector=None)
+    if index is not None:
+        queryset = queryset.filter(updated_at__gt=datetime.fromisoformat(index.meta["built_at"]))
+    return queryset.count()
+
+
+def _tail(index, user_id=None):
+    return _rows(_tail_queryset(index, user_id))
+
+
+def search(query, user=None, k=20):
+    """
+    Return up to k (UploadedImage, score) pairs most similar to a free-text query, best first.
+    With `user`, only that user's images are searched (exactly); otherwise every image (approximately).
+    """
+    k = max(1, min(k, max_results()))
+    vector = normalise(np.asarray(embedding_model.encode(query), dtype=np.float32).ravel())
+    user_id = user.id if user is not None else None
+
+    index = current_index()
+    tail_vectors, tail_ids, _ = _tail(index, user_id)
+    # Deleted images are dropped when rows are fetched, so over-fetch a little
+    wanted = k * 2
+    scored = {}
+    if index is not None and len(index):
+        for image_id, score in index.search(vector, wanted + len(tail_ids), nprobe(), owner=user_id):
+            scored[image_id] = score
+    for image_id in tail_ids:
+        scored.pop(int(image_id), None)
+    if len(tail_ids):
+        for image_id, score in zip(tail_ids, tail_vectors @ vector):
+            scored[int(image_id)] = float(score)
+
+    best = sorted(scored.items(), key=lambda item: item[1], reverse=True)[:wanted]
+    images = UploadedImage.objects.select_related("user").in_bulk([image_id for image_id, _ in best])
+    return [(images[image_id], score) for image_id, score in best if image_id in images][:k]
+
+
+def stats():
+    """Return the size of the loaded index and how many rows are waiting to be encoded or merged."""
+    index = current_index()
+    return {
+        "indexed": len(index) if index is not None else 0,
+        "clusters": len(index.centroids) if index is not None else 0,
+        "stale": ImageEmbedding.objects.filter(stale_since__isnull=False).count(),
+        "unmerged": unmerged(index),
+    }
@@ -0,0 +1,100 @@
+# This module builds the URLs clients use to fetch stored images and profile pictures.
+# IMAGE_URL_MODE picks the output: the storage backend's "public" URLs (the default), "cdn" URLs
+# on AWS_S3_CUSTOM_DOMAIN, or pre-signed URLs for private buckets. Signed URLs are cached in
+# process until shortly before they expire, so repeated listings reuse earlier signatures and
+# a batch only signs the keys it has not seen recently.
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from django.conf import settings
+
+from .storage import get_storage
+
+_lock = threading.Lock()
+_signed = OrderedDict()
+_stats = {"signed": 0, "reused": 0}
+
+
+def mode():
+    return getattr(settings, "IMAGE_URL_MODE", "public")
+
+
+def expiry():
+    return getattr(settings, "IMAGE_URL_EXPIRY", 3600)
+
+
+def refresh_margin():
+    return getattr(settings, "IMAGE_URL_REFRESH_MARGIN", 300)
+
+
+def cache_size():
+    return getattr(settings, "IMAGE_URL_CACHE_SIZE", 20000)
+
+
+def _unsigned_url(key):
+    if mode() == "cdn":
+        domain = settings.AWS_S3_CUSTOM_DOMAIN.rstrip("/")
+        if "://" not in domain:
+            domain = f"https://{domain}"
+        return f"{domain}/{quote(key)}"
+    return get_storage().url(key)
+
+
+def _sign(key):
+    return get_storage().signed_url(key, expiry())
+
+
+def image_urls(keys):
+    """Return {key: url} for the given storage keys, signing only keys without a fresh cached URL."""
+    keys = [str(key) for key in keys if key]
+    if mode() != "presigned":
+        return {key: _unsigned_url(key) for key in keys}
+
+    now = time.monotonic()
+    urls = {}
+    with _lock:
+        for key in keys:
+            cached = _signed.get(key)
+            if cached is not None and cached[1] > now:
+                _signed.move_to_end(key)
+                urls[key] = cached[0]
+        _stats["reused"] += len(urls)
+
+    missing = [key for key in dict.fromkeys(keys) if key not in urls]
+    if not missing:
+        return urls
+
+    # Reuse each signature until refresh_margin seconds before it expires
+    reuse_until = now + expiry() - refresh_margin()
+    fresh = {key: _sign(key) for key in missing}
+    with _lock:
+        for key, url in fresh.items():
+            _signed[key] = (url, reuse_until)
+            _signed.move_to_end(key)
+        while len(_signed) > cache_size():
+            _signed.popitem(last=False)
+        _stats["signed"] += len(fresh)
+    urls.update(fresh)
+    return urls
+
+
+def image_url(key):
+    """Return the URL for one storage key, or None if there is no key."""
+    if not key:
+        return None
+    return image_urls([key])[str(key)]
+
+
+def stats():
+    """Return how many URLs this process signed and how many it served from the signature cache."""
+    with _lock:
+        return dict(_stats, cached=len(_signed))
+
+
+def clear():
+    """Forget all cached signatures."""
+    with _lock:
+        _signed.clear()
@@ -0,0 +1,138 @@
+# This module caches Amazon Rekognition label results by image content.
+# Labels depend only on the image bytes and the request parameters, so entries are keyed by the
+# SHA-256 of the image plus MaxLabels/MinConfidence and shared by every detect_labels call site.
+# Entries expire after LABEL_CACHE_TTL and the table is trimmed to LABEL_CACHE_MAX_ENTRIES by
+# evicting the least recently used rows.
+
+import hashlib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .labeling import get_labeler
+from .models import LabelCache
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+_inserts_since_eviction = 0
+
+
+def ttl():
+    return getattr(settings, "LABEL_CACHE_TTL", timedelta(days=30))
+
+
+def max_entries():
+    return getattr(settings, "LABEL_CACHE_MAX_ENTRIES", 100000)
+
+
+def evict_every():
+    return getattr(settings, "LABEL_CACHE_EVICT_EVERY", 100)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    """Return this process's hit/miss/eviction counters and the hit ratio."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_ratio"] = round(snapshot["hits"] / lookups, 4) if lookups else None
+    return snapshot
+
+
+def content_hash(image_file):
+    """Return the SHA-256 hex digest of an uploaded file, streaming it in chunks, and rewind it."""
+    digest = hashlib.sha256()
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+
+def request_params(max_labels, min_confidence):
+    """Return the detect_labels keyword arguments and the cache key fragment that identifies them."""
+    kwargs = {"MaxLabels": max_labels}
+    if min_confidence is not None:
+        kwargs["MinConfidence"] = min_confidence
+    return kwargs, ",".join(f"{name}={value}" for name, value in sorted(kwargs.items()))
+
+
+def get(content_hash, params):
+    """Return cached labels for this hash and parameter key, or None. Expired entries count as misses."""
+    entry = LabelCache.objects.filter(content_hash=content_hash, params=params).first()
+    if entry is None:
+        _count("misses")
+        return None
+
+    if entry.created_at < timezone.now() - ttl():
+        entry.delete()
+        _count("expired")
+        _count("misses")
+        return None
+
+    LabelCache.objects.filter(pk=entry.pk).update(last_used_at=timezone.now(), hits=F("hits") + 1)
+    _count("hits")
+    return entry.labels
+
+
+def put(content_hash, params, labels):
+    """Store labels for this hash and parameter key, evicting old entries every few inserts."""
+    global _inserts_since_eviction
+    try:
+        with transaction.atomic():
+            LabelCache.objects.update_or_create(
+                content_hash=content_hash, params=params,
+                defaults={"labels": labels, "created_at": timezone.now(), "last_used_at": timezone.now()},
+            )
+    except IntegrityError:
+        # Another worker stored the same entry first
+        return
+
+    with _stats_lock:
+        _inserts_since_eviction += 1
+        due = _inserts_since_eviction >= evict_every()
+        if due:
+            _inserts_since_eviction = 0
+    if due:
+        evict()
+
+
+def evict():
+    """Delete expired entries, then the least recently used ones beyond the size limit. Returns the count removed."""
+    removed, _ = LabelCache.objects.filter(created_at__lt=timezone.now() - ttl()).delete()
+
+    cutoff = (
+        LabelCache.objects.order_by("-last_used_at", "-id")
+        .values_list("last_used_at", flat=True)[max_entries():max_entries() + 1]
+    )
+    cutoff = list(cutoff)
+    if cutoff:
+        overflow, _ = LabelCache.objects.filter(last_used_at__lte=cutoff[0]).delete()
+        removed += overflow
+
+    _count("evictions", removed)
+    return removed
+
+
+def detect_labels(content_hash, image, max_labels=10, min_confidence=None, client=None):
+    """
+    Return the labels for an image, calling the labeler's detect_labels only on a cache miss.
+    `image` is the Rekognition Image argument, e.g. {"Bytes": ...} or {"S3Object": {...}}.
+    """
+    kwargs, params = request_params(max_labels, min_confidence)
+
+    cached = get(content_hash, params)
+    if cached is not None:
+        return cached
+
+    client = client or get_labeler()
+    labels = client.detect_labels(Image=image, **kwargs)["Labels"]
+    put(content_hash, params, labels)
+    return labels
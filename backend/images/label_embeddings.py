@@ -0,0 +1,144 @@
+# This module manages the precomputed embedding matrix for the Amazon Rekognition label set.
+# Labels are encoded once in a single batch and written to disk as a normalised float32 matrix
+# plus a JSON label index, keyed on the model name and a hash of the labels CSV, so that
+# worker processes can memory-map the same file at startup and share its pages.
+
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CSV_FILE_PATH = os.path.join(os.path.dirname(__file__), "AmazonRekognitionAllLabels.csv")
+
+# Bump whenever the on-disk layout changes so stale files are never memory-mapped.
+CACHE_FORMAT_VERSION = 1
+
+
+def load_rekognition_tags(csv_path=CSV_FILE_PATH):
+    """Return the unique Rekognition label names from the labels CSV."""
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(csv_path)
+        return df.iloc[:, 0].dropna().unique().tolist()
+    except Exception as e:
+        print(f"Error loading Rekognition tags: {e}")
+        return []
+
+
+def csv_digest(csv_path=CSV_FILE_PATH):
+    """Return the SHA-256 hex digest of the labels CSV."""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir():
+    return getattr(settings, "LABEL_EMBEDDINGS_DIR", os.path.join(settings.BASE_DIR, "cache", "label_embeddings"))
+
+
+def cache_paths(model_name, digest):
+    """Return the (matrix, index) file paths for a model name and CSV digest."""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+    stem = os.path.join(cache_dir(), f"labels-v{CACHE_FORMAT_VERSION}-{slug}-{digest[:16]}")
+    return f"{stem}.npy", f"{stem}.json"
+
+
+def _atomic_write(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def build_label_embeddings(model, model_name=EMBEDDING_MODEL_NAME, csv_path=CSV_FILE_PATH, batch_size=256):
+    """Encode every label in one batch and write the normalised matrix and label index to disk."""
+    labels = load_rekognition_tags(csv_path)
+    digest = csv_digest(csv_path)
+
+    vectors = model.encode(labels, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(labels), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    matrix_path, index_path = cache_paths(model_name, digest)
+    os.makedirs(os.path.dirname(matrix_path), exist_ok=True)
+
+    index = {
+        "version": CACHE_FORMAT_VERSION,
+        "model": model_name,
+        "csv_sha256": digest,
+        "dim": int(matrix.shape[1]),
+        "labels": labels,
+    }
+    # The matrix is written first; the index only appears once the matrix is complete.
+    _atomic_write(matrix_path, lambda f: np.save(f, matrix, allow_pickle=False))
+    _atomic_write(index_path, lambda f: f.write(json.dumps(index).encode("utf-8")))
+
+    return labels, matrix_path
+
+
+def load_label_embeddings(model_name=EMBEDDING_MODEL_NAME, csv_path=CSV_FILE_PATH):
+    """
+    Memory-map the cached label matrix for this model and CSV.
+    Returns (labels, matrix), or None if no matching cache file exists.
+    """
+    matrix_path, index_path = cache_paths(model_name, csv_digest(csv_path))
+    if not (os.path.exists(matrix_path) and os.path.exists(index_path)):
+        return None
+
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        matrix = np.load(matrix_path, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable label embedding cache %s: %s", matrix_path, e)
+        return None
+
+    if index.get("version") != CACHE_FORMAT_VERSION or index.get("model") != model_name:
+        return None
+    if matrix.dtype != np.float32 or matrix.shape != (len(index["labels"]), index["dim"]):
+        logger.warning("Label embedding cache %s does not match its index, ignoring it", matrix_path)
+        return None
+
+    return index["labels"], matrix
+
+
+def get_label_embeddings(model, model_name=EMBEDDING_MODEL_NAME, csv_path=CSV_FILE_PATH):
+    """
+    Return (labels, matrix) from the on-disk cache, building it first if it is missing.
+    Run `manage.py build_label_embeddings` at deploy time so workers never take the slow path.
+    """
+    cached = load_label_embeddings(model_name, csv_path)
+    if cached is not None:
+        return cached
+
+    logger.warning("No label embedding cache for %s, encoding labels in-process", model_name)
+    build_label_embeddings(model, model_name, csv_path)
+    return load_label_embeddings(model_name, csv_path)
+
+
+def top_k_labels(matrix, labels, query_vector, k):
+    """
+    Score every label against a query vector with one matrix-vector product.
+    Returns the k best (label, score) pairs, highest first. The matrix rows must be normalised.
+    """
+    query = np.asarray(query_vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    if norm == 0 or len(labels) == 0 or k <= 0:
+        return []
+
+    scores = matrix @ (query / norm)
+    k = min(k, len(scores))
+    top = np.argpartition(scores, -k)[-k:]
+    top = top[np.argsort(scores[top])[::-1]]
+    return [(labels[i], float(scores[i])) for i in top]
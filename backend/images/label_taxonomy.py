@@ -0,0 +1,212 @@
+# This module compiles the Rekognition label set into a taxonomy: each label's parents, aliases and
+# categories, plus the full ancestor and descendant closure of every label. The closures are
+# computed once, written to disk keyed on a hash of the labels CSV, and loaded as frozensets, so
+# hierarchical matching ("Animal" matches an image tagged "Dog") is a dictionary lookup per tag.
+# Parents come from the optional Parents/Aliases/Categories columns of the labels CSV, the curated
+# label_parents.csv and LABEL_TAXONOMY_EXTRA_CSV. Guessing parents from head nouns ("Police Car" ->
+# "Car") is opt-in, as it also files "Hot Dog" under "Dog" and "Sea Lion" under "Lion".
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+
+from .label_embeddings import CSV_FILE_PATH, csv_digest
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the compiled layout changes so stale files are never loaded.
+TAXONOMY_FORMAT_VERSION = 1
+LIST_SEPARATOR = re.compile(r"\s*[|;]\s*")
+FIELDS = ("parents", "aliases", "categories")
+
+# Hand-checked parents for common labels (Dog -> Mammal -> Animal, Police Car -> Car -> Vehicle)
+PARENTS_CSV_PATH = os.path.join(os.path.dirname(__file__), "label_parents.csv")
+
+_lock = threading.Lock()
+_taxonomy = None
+
+
+def taxonomy_dir():
+    return getattr(settings, "LABEL_TAXONOMY_DIR", os.path.join(settings.BASE_DIR, "cache", "label_taxonomy"))
+
+
+def csv_paths():
+    """Return the labels CSV, the curated parents and LABEL_TAXONOMY_EXTRA_CSV, if set."""
+    extra = getattr(settings, "LABEL_TAXONOMY_EXTRA_CSV", None)
+    return [CSV_FILE_PATH, PARENTS_CSV_PATH] + ([extra] if extra else [])
+
+
+def use_head_nouns():
+    return getattr(settings, "LABEL_TAXONOMY_HEAD_NOUNS", False)
+
+
+def read_entries(paths):
+    """Return {label: {"parents": [...], "aliases": [...], "categories": [...]}} from the CSV files."""
+    import pandas as pd
+
+    entries = {}
+    for path in paths:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        columns = {column.strip().lower(): column for column in df.columns}
+        for _, row in df.iterrows():
+            label = row.iloc[0].strip()
+            if not label:
+                continue
+            entry = entries.setdefault(label, {field: [] for field in FIELDS})
+            for field in FIELDS:
+                if field in columns:
+                    entry[field] += [value for value in LIST_SEPARATOR.split(row[columns[field]].strip()) if value]
+    return entries
+
+
+def _head_noun_parent(label, by_lower):
+    words = label.split()
+    for start in range(1, len(words)):
+        parent = by_lower.get(" ".join(words[start:]).lower())
+        if parent:
+            return parent
+    return None
+
+
+def compile_taxonomy(entries, head_nouns=False):
+    """
+    Return the compiled taxonomy: the entries plus every name's ancestors and descendants.
+    Categories count as parents, and an alias as a child of its label, so album tags naming a
+    category or an alias match too.
+    """
+    by_lower = {label.lower(): label for label in entries}
+    parents = {}
+    for label, entry in entries.items():
+        direct = entry["parents"] + entry["categories"]
+        if not entry["parents"] and head_nouns:
+            head = _head_noun_parent(label, by_lower)
+            direct += [head] if head else []
+        parents.setdefault(label, set()).update(name for name in direct if name != label)
+        for alias in entry["aliases"]:
+            if alias != label:
+                parents.setdefault(alias, set()).add(label)
+
+    ancestors = {}
+
+    def closure(name, visiting):
+        if name in ancestors:
+            return ancestors[name]
+        found = set()
+        for parent in parents.get(name, ()):
+            # A cycle in hand-written parents must not recurse forever
+            if parent not in visiting:
+                found |= {parent} | closure(parent, visiting | {name})
+        ancestors[name] = found
+        return found
+
+    for name in list(parents):
+        closure(name, frozenset())
+
+    descendants = {}
+    for name, names in ancestors.items():
+        for ancestor in names:
+            descendants.setdefault(ancestor, set()).add(name)
+
+    return {
+        "entries": {label: entry for label, entry in entries.items() if any(entry.values())},
+        "ancestors": {name: sorted(names) for name, names in ancestors.items() if names},
+        "descendants": {name: sorted(names) for name, names in descendants.items()},
+    }
+
+
+class Taxonomy:
+    """Compiled label closures, answering each lookup with one dictionary access per tag."""
+
+    def __init__(self, entries, ancestors, descendants):
+        self.entries = entries
+        self._ancestors = {name: frozenset(names) for name, names in ancestors.items()}
+        self._descendants = {name: frozenset(names) for name, names in descendants.items()}
+
+    def ancestors(self, name):
+        return self._ancestors.get(name, frozenset())
+
+    def descendants(self, name):
+        return self._descendants.get(name, frozenset())
+
+    def expand(self, tags):
+        """Return the tags plus everything below them: the image tags an album with these tags matches."""
+        expanded = set(tags)
+        for tag in tags:
+            expanded |= self._descendants.get(tag, frozenset())
+        return expanded
+
+    def generalise(self, tags):
+        """Return the tags plus everything above them: the album tags an image with these tags matches."""
+        general = set(tags)
+        for tag in tags:
+            general |= self._ancestors.get(tag, frozenset())
+        return general
+
+
+def digest(paths=None):
+    """Return a digest of the CSV files and options the taxonomy is compiled from."""
+    parts = [csv_digest(path) for path in paths or csv_paths()] + [f"head_nouns={use_head_nouns()}"]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def cache_path(paths=None):
+    return os.path.join(taxonomy_dir(), f"taxonomy-v{TAXONOMY_FORMAT_VERSION}-{digest(paths)[:16]}.json")
+
+
+def build(paths=None):
+    """Compile the taxonomy from the CSV files and write it to disk. Returns (taxonomy, path)."""
+    paths = paths or csv_paths()
+    compiled = compile_taxonomy(read_entries(paths), use_head_nouns())
+    path = cache_path(paths)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(compiled, version=TAXONOMY_FORMAT_VERSION), f)
+    os.replace(tmp_path, path)
+    return Taxonomy(**compiled), path
+
+
+def load(paths=None):
+    """Load the compiled taxonomy for the current CSV files, or return None if there is none."""
+    path = cache_path(paths)
+    try:
+        with open(path, encoding="utf-8") as f:
+            compiled = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable label taxonomy %s: %s", path, e)
+        return None
+    if compiled.pop("version", None) != TAXONOMY_FORMAT_VERSION:
+        return None
+    return Taxonomy(**compiled)
+
+
+def get_taxonomy():
+    """
+    Return the process-wide taxonomy, compiling it first if no compiled file exists.
+    Run `manage.py build_label_taxonomy` at deploy time so workers never take the slow path.
+    """
+    global _taxonomy
+    if _taxonomy is not None:
+        return _taxonomy
+    with _lock:
+        if _taxonomy is None:
+            taxonomy = load()
+            if taxonomy is None:
+                logger.warning("No compiled label taxonomy, compiling it in-process")
+                taxonomy, _ = build()
+            _taxonomy = taxonomy
+    return _taxonomy
+
+
+def clear():
+    """Forget this process's taxonomy so the next lookup loads the current file."""
+    global _taxonomy
+    with _lock:
+        _taxonomy = None
@@ -0,0 +1,68 @@
+# This module defines the labelers that suggest tags for uploaded images.
+# LABELER_BACKEND names the class to use: RekognitionLabeler calls Amazon Rekognition, while
+# FakeLabeler derives labels from a hash of the image bytes, so uploads and tag suggestions work
+# offline and return the same labels for the same image on every run.
+
+import hashlib
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import aws_clients
+from .storage import get_storage
+
+_lock = threading.Lock()
+_instances = {}
+
+
+class RekognitionLabeler:
+    """Labels from Amazon Rekognition's DetectLabels."""
+
+    def detect_labels(self, Image, MaxLabels=10, MinConfidence=None):
+        kwargs = {"MaxLabels": MaxLabels}
+        if MinConfidence is not None:
+            kwargs["MinConfidence"] = MinConfidence
+        return aws_clients.get_client("rekognition").detect_labels(Image=Image, **kwargs)
+
+
+@lru_cache(maxsize=1)
+def _vocabulary():
+    from .label_embeddings import load_rekognition_tags
+
+    return tuple(load_rekognition_tags()) or ("Object",)
+
+
+class FakeLabeler:
+    """Deterministic labels picked from the Rekognition label list by the SHA-256 of the image bytes."""
+
+    def detect_labels(self, Image, MaxLabels=10, MinConfidence=None):
+        if "Bytes" in Image:
+            data = Image["Bytes"]
+        else:
+            data = get_storage().read(Image["S3Object"]["Name"])
+        digest = hashlib.sha256(data).digest()
+
+        vocabulary = _vocabulary()
+        labels = []
+        for i in range(0, len(digest) - 1, 2):
+            name = vocabulary[int.from_bytes(digest[i:i + 2], "big") % len(vocabulary)]
+            confidence = 99.0 - 3.5 * len(labels)
+            if any(label["Name"] == name for label in labels):
+                continue
+            if MinConfidence is not None and confidence < MinConfidence:
+                break
+            labels.append({"Name": name, "Confidence": confidence, "Parents": []})
+            if len(labels) >= MaxLabels:
+                break
+        return {"Labels": labels}
+
+
+def get_labeler():
+    """Return the shared instance of the configured LABELER_BACKEND."""
+    path = getattr(settings, "LABELER_BACKEND", "images.labeling.RekognitionLabeler")
+    with _lock:
+        if path not in _instances:
+            _instances[path] = import_string(path)()
+        return _instances[path]
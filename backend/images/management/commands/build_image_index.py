@@ -0,0 +1,36 @@
+# This management command builds the semantic image search index from scratch.
+# It queues images that were never encoded, encodes every stale image in batches and then
+# writes a new IVF index with freshly trained clusters, replacing the old one atomically.
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from images import image_search
+from images.models import ImageEmbedding
+
+
+class Command(BaseCommand):
+    help = "Encode every image's tags and name and rebuild the semantic search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--nlist", type=int, default=None, help="Number of clusters (default: about sqrt of the image count)"
+        )
+        parser.add_argument("--reencode", action="store_true", help="Re-encode every image, e.g. after changing the model")
+
+    def handle(self, *args, **options):
+        if options["reencode"]:
+            ImageEmbedding.objects.update(stale_since=timezone.now(), source_digest="")
+        queued = image_search.queue_missing()
+
+        encoded = 0
+        while True:
+            batch = image_search.encode_stale()
+            if not batch:
+                break
+            encoded += batch
+
+        indexed = image_search.rebuild(nlist=options["nlist"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {queued} new images, encoded {encoded}, indexed {indexed} vectors"
+        ))
@@ -0,0 +1,18 @@
+# This management command backfills resized variants for images uploaded before they existed.
+# It downloads each original without variants from S3, renders its WebP/JPEG sizes and blurhash,
+# and stores them, using the same worker pool size as uploads.
+
+from django.core.management.base import BaseCommand
+
+from images import variants
+
+
+class Command(BaseCommand):
+    help = "Build thumbnails, responsive variants and blurhash placeholders for images that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many images")
+
+    def handle(self, *args, **options):
+        built, failed = variants.backfill(limit=options["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} images ({failed} failed)"))
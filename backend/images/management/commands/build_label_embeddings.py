@@ -0,0 +1,32 @@
+# This management command precomputes the Rekognition label embedding matrix.
+# It encodes every label in one batch and writes the versioned .npy matrix and label index
+# that worker processes memory-map at startup.
+
+from django.core.management.base import BaseCommand
+
+from images import embedding_backends, label_embeddings
+
+
+class Command(BaseCommand):
+    help = "Encode the Rekognition label set and write the memory-mappable embedding cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=label_embeddings.EMBEDDING_MODEL_NAME, help="SentenceTransformer model name")
+        parser.add_argument("--backend", default=None, help="Embedding backend (default: EMBEDDING_BACKEND)")
+        parser.add_argument("--batch-size", type=int, default=256)
+        parser.add_argument("--force", action="store_true", help="Rebuild even if a matching cache exists")
+
+    def handle(self, *args, **options):
+        backend = options["backend"] or embedding_backends.backend_name()
+        cache_name = embedding_backends.identity(backend, options["model"])
+
+        if not options["force"] and label_embeddings.load_label_embeddings(cache_name) is not None:
+            matrix_path, _ = label_embeddings.cache_paths(cache_name, label_embeddings.csv_digest())
+            self.stdout.write(f"Label embedding cache is up to date: {matrix_path}")
+            return
+
+        model = embedding_backends.load(backend, options["model"])
+        labels, matrix_path = label_embeddings.build_label_embeddings(
+            model, cache_name, batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(labels)} label embeddings to {matrix_path}"))
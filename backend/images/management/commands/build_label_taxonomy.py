@@ -0,0 +1,37 @@
+# This management command compiles the Rekognition label taxonomy.
+# It reads the labels CSV, label_parents.csv and LABEL_TAXONOMY_EXTRA_CSV, computes every label's ancestor and
+# descendant closure and writes the file that worker processes load at startup. With
+# --resync-albums it then adds the images each album's tags newly match through the taxonomy.
+
+from django.core.management.base import BaseCommand
+
+from images import album_membership, label_taxonomy
+from images.models import Album
+
+
+class Command(BaseCommand):
+    help = "Compile the label taxonomy (parents, aliases, categories) used for hierarchical tag matching."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild even if a matching file exists")
+        parser.add_argument(
+            "--resync-albums", action="store_true", help="Add images that albums' tags now match through the taxonomy"
+        )
+
+    def handle(self, *args, **options):
+        if not options["force"] and label_taxonomy.load() is not None:
+            self.stdout.write(f"Label taxonomy is up to date: {label_taxonomy.cache_path()}")
+        else:
+            taxonomy, path = label_taxonomy.build()
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote taxonomy for {len(taxonomy.entries)} labels with parents, aliases or categories to {path}"
+            ))
+
+        if options["resync_albums"]:
+            label_taxonomy.clear()
+            count = 0
+            for album in Album.objects.only("id", "user_id", "tags").iterator():
+                if album.tags:
+                    album_membership.resync_album(album)
+                    count += 1
+            self.stdout.write(self.style.SUCCESS(f"Re-synced {count} albums"))
@@ -0,0 +1,78 @@
+# This management command exports the embedding model for the onnx embedding backends.
+# It runs once on a machine with torch and sentence-transformers installed and writes the
+# ONNX graph (plus an int8-quantized copy with --quantize), the tokenizer and its settings,
+# so app servers can run EMBEDDING_BACKEND=onnx or onnx-int8 without PyTorch.
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from images import embedding_backends, label_embeddings
+
+
+class Command(BaseCommand):
+    help = "Export the embedding model to ONNX (optionally int8-quantized) for the onnx embedding backends."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=label_embeddings.EMBEDDING_MODEL_NAME, help="SentenceTransformer model name")
+        parser.add_argument("--output", default=None, help="Output directory (default: EMBEDDING_ONNX_DIR)")
+        parser.add_argument("--quantize", action="store_true", help="Also write an int8-quantized model (needs onnxruntime)")
+        parser.add_argument("--opset", type=int, default=14)
+
+    def handle(self, *args, **options):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        model = SentenceTransformer(options["model"], device="cpu")
+        transformer = model[0]
+        pooling = next((module for module in model if isinstance(module, Pooling)), None)
+        if pooling is None or not pooling.pooling_mode_mean_tokens:
+            raise CommandError("Only mean-pooled models can be exported for the onnx backends.")
+
+        directory = options["output"] or embedding_backends.onnx_dir(options["model"])
+        os.makedirs(directory, exist_ok=True)
+
+        class TokenEmbeddings(torch.nn.Module):
+            def __init__(self, auto_model):
+                super().__init__()
+                self.auto_model = auto_model
+
+            def forward(self, input_ids, attention_mask, token_type_ids):
+                return self.auto_model(
+                    input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+                ).last_hidden_state
+
+        sample = transformer.tokenizer(["an example sentence"], return_tensors="pt")
+        input_names = ["input_ids", "attention_mask", "token_type_ids"]
+        model_path = os.path.join(directory, embedding_backends.ONNX_MODEL_FILES["onnx"])
+        with torch.no_grad():
+            torch.onnx.export(
+                TokenEmbeddings(transformer.auto_model).eval(),
+                tuple(sample[name] for name in input_names),
+                model_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["token_embeddings"]},
+                opset_version=options["opset"],
+            )
+        transformer.tokenizer.save_pretrained(directory)
+
+        config = {
+            "model": options["model"],
+            "max_seq_length": model.max_seq_length,
+            "normalize": any(isinstance(module, Normalize) for module in model),
+            "dim": model.get_sentence_embedding_dimension(),
+            "pad_token_id": transformer.tokenizer.pad_token_id or 0,
+        }
+        with open(os.path.join(directory, embedding_backends.ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {model_path}"))
+
+        if options["quantize"]:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantized_path = os.path.join(directory, embedding_backends.ONNX_MODEL_FILES["onnx-int8"])
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {quantized_path}"))
@@ -0,0 +1,20 @@
+# This management command retries storage deletes that failed when images were deleted.
+# It claims due PendingStorageDeletion rows, removes their objects with batched deletes
+# and reschedules any that fail again with exponential backoff. It also queues the objects of
+# staged uploads whose token expired before they were finalized.
+
+from django.core.management.base import BaseCommand
+
+from images import image_deletion
+
+
+class Command(BaseCommand):
+    help = "Delete stored objects queued by image deletion, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds to sleep when nothing is due")
+        parser.add_argument("--once", action="store_true", help="Exit once nothing is due")
+
+    def handle(self, *args, **options):
+        deleted, failed = image_deletion.run_worker(poll_interval=options["poll_interval"], once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} stored objects, {failed} failed attempts"))
@@ -0,0 +1,19 @@
+# This management command runs the upload worker.
+# It claims pending UploadJob rows from the database, stores the images in S3 and
+# labels them with Rekognition, off the request path of the API workers.
+
+from django.core.management.base import BaseCommand
+
+from images import upload_pipeline
+
+
+class Command(BaseCommand):
+    help = "Process queued image uploads: store them in S3 and generate suggested tags."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        processed = upload_pipeline.run_worker(poll_interval=options["poll_interval"], once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} upload jobs"))
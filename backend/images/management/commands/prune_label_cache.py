@@ -0,0 +1,15 @@
+# This management command trims the Rekognition label cache.
+# It removes expired entries and the least recently used ones beyond LABEL_CACHE_MAX_ENTRIES;
+# run it periodically (e.g. from cron) in addition to the eviction done on insert.
+
+from django.core.management.base import BaseCommand
+
+from images import label_cache
+
+
+class Command(BaseCommand):
+    help = "Delete expired and least recently used Rekognition label cache entries."
+
+    def handle(self, *args, **options):
+        removed = label_cache.evict()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} label cache entries"))
@@ -0,0 +1,16 @@
+# This management command rebuilds the normalised tag index.
+# It re-syncs the Tag / ImageTag rows from every image's JSON tag list, then recomputes the
+# per-user TagCount rollup, for use after bulk edits made outside the API.
+
+from django.core.management.base import BaseCommand
+
+from images import tag_index, tag_rollup
+
+
+class Command(BaseCommand):
+    help = "Re-sync the Tag / ImageTag index from UploadedImage.tags and recompute tag counts."
+
+    def handle(self, *args, **options):
+        count = tag_index.rebuild()
+        rows = tag_rollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Re-indexed tags for {count} images ({rows} tag counts)"))
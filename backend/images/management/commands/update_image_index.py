@@ -0,0 +1,19 @@
+# This management command runs the semantic search index worker.
+# It encodes images whose tags or name changed and merges them into the on-disk index,
+# off the request path of the API workers.
+
+from django.core.management.base import BaseCommand
+
+from images import image_search
+
+
+class Command(BaseCommand):
+    help = "Keep the semantic image search index current: encode changed images and merge them in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when nothing is stale")
+        parser.add_argument("--once", action="store_true", help="Exit once nothing is stale")
+
+    def handle(self, *args, **options):
+        encoded = image_search.run_worker(poll_interval=options["poll_interval"], once=options["once"])
+        self.stdout.write(self.style.SUCCESS(f"Encoded {encoded} images"))
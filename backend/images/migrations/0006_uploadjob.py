@@ -0,0 +1,35 @@
+# Generated by Django 4.2.20 on 2026-10-18 09:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0005_uploadedimage_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('spool_path', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(choices=[('received', 'Received'), ('stored', 'Stored'), ('tagged', 'Tagged'), ('failed', 'Failed')], default='received', max_length=16)),
+                ('suggested_tags', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_jobs', to='images.uploadedimage')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='images_uplo_status_47950e_idx')],
+            },
+        ),
+    ]
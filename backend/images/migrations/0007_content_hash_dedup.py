@@ -0,0 +1,35 @@
+# Generated by Django 4.2.20 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0006_uploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelCache',
+            fields=[
+                ('content_hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('labels', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(fields=['user', 'content_hash'], name='images_uplo_user_id_b18a90_idx'),
+        ),
+    ]
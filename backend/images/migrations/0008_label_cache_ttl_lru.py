@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0007_content_hash_dedup'),
+    ]
+
+    # Cached labels are disposable, so the table is recreated rather than migrated in place.
+    operations = [
+        migrations.DeleteModel(
+            name='LabelCache',
+        ),
+        migrations.CreateModel(
+            name='LabelCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('params', models.CharField(max_length=64)),
+                ('labels', models.JSONField(default=list)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'params'), name='unique_label_cache_entry')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_tag_index(apps, schema_editor):
+    UploadedImage = apps.get_model('images', 'UploadedImage')
+    Tag = apps.get_model('images', 'Tag')
+    ImageTag = apps.get_model('images', 'ImageTag')
+
+    tag_ids = {}
+    rows = []
+    for image in UploadedImage.objects.only('id', 'user_id', 'tags').iterator(chunk_size=2000):
+        for name in set(tag for tag in image.tags if isinstance(tag, str) and tag):
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.get_or_create(name=name)[0].id
+            rows.append(ImageTag(image_id=image.id, tag_id=tag_ids[name], user_id=image.user_id))
+        if len(rows) >= 5000:
+            ImageTag.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    ImageTag.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0008_label_cache_ttl_lru'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_tags', to='images.uploadedimage')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_tags', to='images.tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'tag'], name='images_imag_user_id_90da5b_idx'), models.Index(fields=['tag', 'image'], name='images_imag_tag_id_3fda28_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagetag',
+            constraint=models.UniqueConstraint(fields=('image', 'tag'), name='unique_image_tag'),
+        ),
+        migrations.RunPython(backfill_tag_index, migrations.RunPython.noop),
+    ]
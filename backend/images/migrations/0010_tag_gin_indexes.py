@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:20
+
+from django.db import migrations
+
+# GIN indexes are PostgreSQL-only, so they are created with raw SQL that is skipped on other
+# databases (e.g. SQLite for local benchmarks). They are built CONCURRENTLY so large tables
+# stay writable while the migration runs, which requires a non-atomic migration.
+INDEXES = [
+    # jsonb_ops (the default) serves @>, ? and ?| on the tag arrays
+    ('images_uploadedimage_tags_gin', 'images_uploadedimage', 'USING gin (tags)'),
+    ('images_album_tags_gin', 'images_album', 'USING gin (tags)'),
+    # Trigram index for prefix and substring tag-name search; replaced by one on UPPER(name) in 0019,
+    # the expression Django's icontains / istartswith actually compile to
+    ('images_tag_name_trgm', 'images_tag', 'USING gin (name gin_trgm_ops)'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, definition in INDEXES:
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('images', '0009_tag_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:41
+
+from django.db import migrations
+
+
+def materialize_album_membership(apps, schema_editor):
+    # Album views used to add tag-matched images lazily on every GET; store them once so
+    # membership is complete before it starts being maintained at write time.
+    Album = apps.get_model('images', 'Album')
+    ImageTag = apps.get_model('images', 'ImageTag')
+    AlbumImage = Album.images.through
+
+    for album in Album.objects.exclude(tags=[]).only('id', 'user_id', 'tags').iterator():
+        image_ids = set(
+            ImageTag.objects.filter(user_id=album.user_id, tag__name__in=album.tags).values_list('image_id', flat=True)
+        )
+        AlbumImage.objects.bulk_create(
+            [AlbumImage(album_id=album.id, uploadedimage_id=image_id) for image_id in image_ids],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0010_tag_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(materialize_album_membership, migrations.RunPython.noop),
+    ]
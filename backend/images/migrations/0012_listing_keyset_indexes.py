@@ -0,0 +1,21 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0011_materialize_album_membership'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(fields=['user', '-uploaded_at', '-id'], name='image_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='image_uploaded_idx'),
+        ),
+    ]
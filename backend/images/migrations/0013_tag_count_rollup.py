@@ -0,0 +1,49 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_tag_counts(apps, schema_editor):
+    ImageTag = apps.get_model('images', 'ImageTag')
+    TagCount = apps.get_model('images', 'TagCount')
+
+    rows = (
+        ImageTag.objects.values_list('user_id', 'tag_id')
+        .annotate(count=models.Count('id'))
+        .order_by()
+        .iterator()
+    )
+    TagCount.objects.bulk_create(
+        [TagCount(user_id=user_id, tag_id=tag_id, count=count) for user_id, tag_id, count in rows],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0012_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counts', to='images.tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-count'], name='tag_count_user_count_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tagcount',
+            constraint=models.UniqueConstraint(fields=('user', 'tag'), name='unique_user_tag_count'),
+        ),
+        migrations.RunPython(backfill_tag_counts, migrations.RunPython.noop),
+    ]
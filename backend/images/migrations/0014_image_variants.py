@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0013_tag_count_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='blurhash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
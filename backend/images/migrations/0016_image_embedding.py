@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0015_pending_storage_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageEmbedding',
+            fields=[
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='images.uploadedimage')),
+                ('vector', models.BinaryField(null=True)),
+                ('source_digest', models.CharField(blank=True, max_length=64)),
+                ('stale_since', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_embeddings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0016_image_embedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('images', '0017_upload_job_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=500)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:40
+
+from django.db import migrations
+
+# Django compiles icontains / istartswith on PostgreSQL to UPPER("name"::text) LIKE UPPER(%s), which
+# the plain trigram index on `name` from 0010 cannot serve. Index that exact expression instead, so
+# tag-text search and tag suggestions use the index rather than scanning images_tag.
+OLD_INDEX = ('images_tag_name_trgm', 'USING gin (name gin_trgm_ops)')
+NEW_INDEX = ('images_tag_name_upper_trgm', 'USING gin ((UPPER(name::text)) gin_trgm_ops)')
+
+
+def swap_indexes(old, new):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {new[0]} ON images_tag {new[1]}')
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {old[0]}')
+    return run
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('images', '0018_staged_upload'),
+    ]
+
+    operations = [
+        migrations.RunPython(swap_indexes(OLD_INDEX, NEW_INDEX), swap_indexes(NEW_INDEX, OLD_INDEX)),
+    ]
@@ -4,6 +4,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 def user_directory_path(instance, filename):
     """Store images inside `media/user_<id>/uploads/`"""
@@ -15,7 +16,18 @@ class UploadedImage(models.Model):
     tags = models.JSONField(default=list)  
     uploaded_at = models.DateTimeField(auto_now_add=True) 
     name = models.CharField(max_length=255, blank=True, null=True)  
-    
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    # Resized copies as {width: {format: key}}, plus a blurhash placeholder; empty until built
+    variants = models.JSONField(default=dict, blank=True)
+    blurhash = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "content_hash"]),
+            # Keyset pagination of listings, newest first
+            models.Index(fields=["user", "-uploaded_at", "-id"], name="image_user_uploaded_idx"),
+            models.Index(fields=["-uploaded_at", "-id"], name="image_uploaded_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.image}"
@@ -30,3 +42,130 @@ class Album(models.Model):
 
     def __str__(self):
         return f"Album: {self.name} by {self.user.username}"
+
+class Tag(models.Model):
+    """A distinct tag name, shared by every image that carries it."""
+
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+class ImageTag(models.Model):
+    """One tag on one image: the indexed, normalised form of UploadedImage.tags."""
+
+    image = models.ForeignKey(UploadedImage, on_delete=models.CASCADE, related_name="image_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="image_tags")
+    # Denormalised from the image so per-user tag queries need no join
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="image_tags")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["image", "tag"], name="unique_image_tag")]
+        indexes = [models.Index(fields=["user", "tag"]), models.Index(fields=["tag", "image"])]
+
+    def __str__(self):
+        return f"{self.image_id} - {self.tag_id}"
+
+class TagCount(models.Model):
+    """How many of a user's images carry a tag: a rollup of ImageTag kept current on every tag write."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="tag_counts")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="counts")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "tag"], name="unique_user_tag_count")]
+        indexes = [models.Index(fields=["user", "-count"], name="tag_count_user_count_idx")]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.tag_id}: {self.count}"
+
+class UploadJob(models.Model):
+    """An image upload accepted by the API and processed off the request path by the upload worker."""
+
+    STATUS_RECEIVED = "received"
+    STATUS_STORED = "stored"
+    STATUS_TAGGED = "tagged"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_RECEIVED, "Received"),
+        (STATUS_STORED, "Stored"),
+        (STATUS_TAGGED, "Tagged"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_jobs")
+    image = models.ForeignKey(UploadedImage, null=True, blank=True, on_delete=models.SET_NULL, related_name="upload_jobs")
+    name = models.CharField(max_length=255)
+    spool_path = models.CharField(max_length=500, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_RECEIVED)
+    suggested_tags = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # Set while a worker holds the job; a job whose lease has run out is claimed again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Upload job {self.id} ({self.status}) by {self.user.username}"
+
+class StagedUpload(models.Model):
+    """An image stored by a staged upload, waiting for its token to be finalized (once) or to expire."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="staged_uploads")
+    key = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Staged upload {self.key} by {self.user.username}"
+
+class LabelCache(models.Model):
+    """Rekognition labels for an image, keyed by the SHA-256 of its contents and the request parameters."""
+
+    content_hash = models.CharField(max_length=64)
+    params = models.CharField(max_length=64)
+    labels = models.JSONField(default=list)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["content_hash", "params"], name="unique_label_cache_entry")]
+
+    def __str__(self):
+        return f"Labels for {self.content_hash[:12]} ({self.params})"
+
+class PendingStorageDeletion(models.Model):
+    """A stored object whose images are gone, queued until the storage backend confirms it is deleted."""
+
+    key = models.CharField(max_length=500, unique=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Delete {self.key} (attempt {self.attempts})"
+
+class ImageEmbedding(models.Model):
+    """An image's semantic search vector: its tags and name encoded by the embedding model."""
+
+    image = models.OneToOneField(UploadedImage, primary_key=True, on_delete=models.CASCADE, related_name="embedding")
+    # Denormalised from the image so per-user searches need no join
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="image_embeddings")
+    # Unit-length float32 vector, or null until the image is first encoded
+    vector = models.BinaryField(null=True)
+    source_digest = models.CharField(max_length=64, blank=True)
+    # Set when the tags or name change; the index worker re-encodes stale rows, oldest first
+    stale_since = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Embedding of image {self.image_id}"
@@ -0,0 +1,115 @@
+# This module provides keyset (cursor) pagination and NDJSON streaming for image listings.
+# Pages are ordered newest first on (uploaded_at, id) and continue from an opaque cursor holding
+# the last row's key, so every page is an index range scan no matter how deep the client goes.
+# Listings called without pagination parameters keep returning a plain list for older clients.
+
+import base64
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework.response import Response
+
+ORDERING = ("-uploaded_at", "-id")
+
+
+def default_page_size():
+    return getattr(settings, "IMAGE_LIST_DEFAULT_PAGE_SIZE", 100)
+
+
+def max_page_size():
+    return getattr(settings, "IMAGE_LIST_MAX_PAGE_SIZE", 500)
+
+
+def stream_chunk_size():
+    return getattr(settings, "IMAGE_LIST_STREAM_CHUNK_SIZE", 500)
+
+
+def encode_cursor(image):
+    """Return an opaque cursor pointing just after this image."""
+    raw = json.dumps([image.uploaded_at.isoformat(), image.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (uploaded_at, id) from a cursor, raising ValueError if it is malformed."""
+    try:
+        uploaded_at, image_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        uploaded_at = parse_datetime(uploaded_at)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if uploaded_at is None or not isinstance(image_id, int):
+        raise ValueError("Invalid cursor")
+    return uploaded_at, image_id
+
+
+def page_size(request):
+    """Return the requested page size, clamped to IMAGE_LIST_MAX_PAGE_SIZE. Raises ValueError if invalid."""
+    size = int(request.query_params.get("page_size", default_page_size()))
+    if size < 1:
+        raise ValueError("page_size must be positive")
+    return min(size, max_page_size())
+
+
+def paginate(queryset, request):
+    """Return (rows, next_cursor) for the page after the request's cursor. Raises ValueError for bad input."""
+    size = page_size(request)
+    queryset = queryset.order_by(*ORDERING)
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        uploaded_at, image_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=image_id))
+
+    # Fetch one extra row to know whether another page exists
+    rows = list(queryset[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1]) if len(rows) > size else None
+    return rows[:size], next_cursor
+
+
+def chunked(rows, size):
+    """Yield lists of up to `size` rows from an iterable."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def stream_ndjson(queryset, serialize_page):
+    """
+    Stream one JSON object per line, reading the queryset in chunks so memory stays flat.
+    `serialize_page` turns a list of rows into a list of dicts, so each chunk resolves its URLs in one batch.
+    """
+    def lines():
+        rows = queryset.order_by(*ORDERING).iterator(chunk_size=stream_chunk_size())
+        for chunk in chunked(rows, stream_chunk_size()):
+            for item in serialize_page(chunk):
+                yield json.dumps(item, default=str) + "\n"
+
+    return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
+def serialize_all(queryset, serialize_page):
+    """Serialize every row of a queryset, a chunk at a time."""
+    return [item for chunk in chunked(queryset, stream_chunk_size()) for item in serialize_page(chunk)]
+
+
+def list_response(request, queryset, serialize_page):
+    """
+    Respond with an image listing in the mode the client asked for:
+    ?stream=true streams every row, ?page_size / ?cursor return {"results", "next_cursor"},
+    and no parameters return the full list, unordered, as before.
+    """
+    if request.query_params.get("stream") == "true":
+        return stream_ndjson(queryset, serialize_page)
+
+    if "page_size" in request.query_params or "cursor" in request.query_params:
+        try:
+            rows, next_cursor = paginate(queryset, request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"results": serialize_page(rows), "next_cursor": next_cursor}, status=200)
+
+    return Response(serialize_all(queryset, serialize_page), status=200)
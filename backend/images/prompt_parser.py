@@ -0,0 +1,204 @@
+# This module parses album prompts such as "beach photos without people, no cars" into what to
+# include and what to exclude. A prompt is tokenized once; negation cues ("no", "not", "without",
+# "except") open an excluded phrase that runs to the next clause boundary, and a word-level trie
+# over the Rekognition label set finds every label named in either part in one left-to-right pass.
+# The two parts are then scored separately against the label embeddings.
+
+import re
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from . import embedding_model, label_embeddings
+from .ann_index import normalise
+
+NEGATION_CUES = frozenset({"no", "not", "without", "except", "excluding"})
+# Words and punctuation that end an excluded phrase ("no cars, with sunsets")
+CLAUSE_BOUNDARIES = frozenset({"but", "with", "including", "plus", ",", ".", ";", ":", "!", "?"})
+
+# A full stop after these is part of a name ("St. Paul Cathedral"), not the end of a clause
+ABBREVIATIONS = frozenset({"st", "mt", "dr", "mr", "mrs", "ms"})
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['&-][a-z0-9]+)*|[,.;:!?]")
+
+_lock = threading.Lock()
+_matcher = None
+_label_rows = {"labels": None, "rows": None}
+
+
+def negation_min_score():
+    return getattr(settings, "PROMPT_NEGATION_MIN_SCORE", 0.4)
+
+
+def normalise_word(word):
+    """Reduce a lowercase word to a crude singular, so "dogs" and "beaches" match "Dog" and "Beach"."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Return (normalised word, start, end) for each word and clause-ending punctuation mark in the text."""
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token == "." and tokens and tokens[-1][0] in ABBREVIATIONS:
+            continue
+        tokens.append((normalise_word(token), match.start(), match.end()))
+    return tokens
+
+
+class LabelMatcher:
+    """
+    A trie over the words of each label, finding the longest label starting at each word. Labels that
+    normalise to the same words ("Glass", "Glasses") share a node and are matched together.
+    """
+
+    def __init__(self, labels):
+        self.root = {}
+        self.depth = 0
+        for label in labels:
+            words = [word for word, _, _ in tokenize(label) if word not in CLAUSE_BOUNDARIES]
+            if not words:
+                continue
+            node = self.root
+            for word in words:
+                node = node.setdefault(word, {})
+            node.setdefault(None, []).append(label)
+            self.depth = max(self.depth, len(words))
+
+    def find(self, words, segments=None):
+        """
+        Return (start, end, labels) for the labels in a word list, leftmost-longest and non-overlapping.
+        With `segments` (a segment number per word) a label never spans two segments, so "sea, no lions"
+        does not name "Sea Lion". Each position walks at most `depth` trie levels, so the cost is
+        linear in the prompt length.
+        """
+        found = []
+        position = 0
+        while position < len(words):
+            node, match = self.root, None
+            for offset in range(position, min(len(words), position + self.depth)):
+                if segments is not None and segments[offset] != segments[position]:
+                    break
+                node = node.get(words[offset])
+                if node is None:
+                    break
+                if None in node:
+                    match = (position, offset + 1, node[None])
+            if match:
+                found.append(match)
+                position = match[1]
+            else:
+                position += 1
+        return found
+
+
+def get_matcher():
+    """Return the process-wide matcher over the Rekognition labels, building it on first use."""
+    global _matcher
+    with _lock:
+        if _matcher is None:
+            _matcher = LabelMatcher(label_embeddings.load_rekognition_tags())
+        return _matcher
+
+
+class ParsedPrompt:
+    """The included and excluded parts of a prompt, and the labels each names outright."""
+
+    def __init__(self, positive_text, negative_phrases, positive_labels, negative_labels):
+        self.positive_text = positive_text
+        self.negative_phrases = negative_phrases
+        self.positive_labels = positive_labels
+        self.negative_labels = negative_labels
+
+
+def parse(prompt, matcher=None):
+    """Split a prompt into included text and excluded phrases, and find the labels named in each."""
+    matcher = matcher or get_matcher()
+    tokens = tokenize(prompt)
+
+    # One pass over the tokens: each word is included, or belongs to the excluded phrase opened by
+    # the latest negation cue. Cues and boundaries also start a new segment that labels cannot span.
+    words, spans, phrase_of, segments = [], [], [], []
+    phrase = None
+    phrases = segment = 0
+    for word, start, end in tokens:
+        if word in NEGATION_CUES:
+            phrase, phrases, segment = phrases, phrases + 1, segment + 1
+            continue
+        if word in CLAUSE_BOUNDARIES:
+            phrase, segment = None, segment + 1
+            continue
+        words.append(word)
+        spans.append((start, end))
+        phrase_of.append(phrase)
+        segments.append(segment)
+
+    positive_labels, negative_labels = [], []
+    for start, end, labels in matcher.find(words, segments):
+        (positive_labels if phrase_of[start] is None else negative_labels).extend(labels)
+
+    positive_words, negative_words = [], [[] for _ in range(phrases)]
+    for (start, end), phrase in zip(spans, phrase_of):
+        (positive_words if phrase is None else negative_words[phrase]).append(prompt[start:end])
+
+    return ParsedPrompt(
+        " ".join(positive_words),
+        [" ".join(phrase) for phrase in negative_words if phrase],
+        list(dict.fromkeys(positive_labels)),
+        list(dict.fromkeys(negative_labels)),
+    )
+
+
+def _rows_by_label(labels):
+    with _lock:
+        if _label_rows["labels"] is not labels:
+            _label_rows.update(labels=labels, rows={label: row for row, label in enumerate(labels)})
+        return _label_rows["rows"]
+
+
+def _closer_to_negation(parsed, candidates):
+    """Return the candidates scoring higher against an excluded phrase than against the included text."""
+    labels, matrix = embedding_model.get_label_index()
+    rows = _rows_by_label(labels)
+    scored = [label for label in candidates if label in rows]
+    if not scored:
+        return []
+
+    vectors = np.asarray(matrix[[rows[label] for label in scored]], dtype=np.float32)
+    negative = normalise(np.stack([embedding_model.encode(phrase) for phrase in parsed.negative_phrases]))
+    negative_scores = (vectors @ negative.T).max(axis=1)
+    if parsed.positive_text:
+        positive_scores = vectors @ normalise(embedding_model.encode(parsed.positive_text))
+    else:
+        positive_scores = np.zeros(len(scored), dtype=np.float32)
+    return [
+        label for label, negative_score, positive_score in zip(scored, negative_scores, positive_scores)
+        if negative_score >= negation_min_score() and negative_score > positive_score
+    ]
+
+
+def resolve_tags(prompt, k=15):
+    """
+    Return (included, excluded) label lists for a prompt. Included labels are those named outside
+    a negation plus the k labels closest to the included text. A label is excluded when it is named
+    in a negation, or when it is closer to an excluded phrase than to the included text.
+    """
+    parsed = parse(prompt)
+    ranked = embedding_model.rank_labels(parsed.positive_text, k) if parsed.positive_text else []
+    candidates = list(dict.fromkeys(parsed.positive_labels + [label for label, _ in ranked]))
+    excluded = list(parsed.negative_labels)
+
+    if parsed.negative_phrases and candidates:
+        excluded += _closer_to_negation(parsed, candidates)
+
+    excluded = list(dict.fromkeys(excluded))
+    return [label for label in candidates if label not in excluded], excluded
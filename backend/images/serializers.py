@@ -1,27 +1,43 @@
 # This module defines serializers for converting model instances into JSON representations.
 # It includes serializers for user-uploaded images and albums, providing fields for metadata
-# and methods for generating URLs for images stored in S3.
+# and methods for generating URLs for images stored in S3. Listings pass the page's URLs,
+# resolved in one batch, as the "image_urls" context so no row resolves its own.
 
 from rest_framework import serializers
 from .models import UploadedImage, Album
+from . import image_urls
+from . import variants
 from django.contrib.auth.models import User
-from django.conf import settings
 
 class UploadedImageSerializer(serializers.ModelSerializer):
     posted_by = serializers.CharField(source="user.username", read_only=True)
     image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = UploadedImage
-        fields = ["id", "image_url", "name", "tags", "uploaded_at", "posted_by"]
-        read_only_fields = ["image_url", "name", "tags", "uploaded_at", "posted_by"]
+        fields = ["id", "image_url", "thumbnail_url", "srcset", "blurhash", "name", "tags", "uploaded_at", "posted_by"]
+        read_only_fields = ["image_url", "thumbnail_url", "srcset", "blurhash", "name", "tags", "uploaded_at", "posted_by"]
+
+    def _urls(self, obj):
+        urls = self.context.get("image_urls")
+        return urls if urls is not None else variants.page_urls([obj])
 
     def get_image_url(self, obj):
-        """Return the full URL for the image stored in S3"""
+        """Return the URL for the image stored in S3"""
         if obj.image:
-            return f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{obj.image}"
+            return self._urls(obj).get(str(obj.image))
         return None
 
+    def get_thumbnail_url(self, obj):
+        """Return the URL of the smallest resized variant, or the original if none are built yet"""
+        return variants.listing_fields(obj, self._urls(obj))["thumbnail_url"]
+
+    def get_srcset(self, obj):
+        """Return a srcset of the WebP variants for responsive <img> tags"""
+        return variants.listing_fields(obj, self._urls(obj))["srcset"]
+
 
 class AlbumSerializer(serializers.ModelSerializer):
     owner = serializers.CharField(source="user.username", read_only=True)
@@ -33,13 +49,36 @@ class AlbumSerializer(serializers.ModelSerializer):
         read_only_fields = ["name", "cover_image_url", "tags", "owner"]
 
     def get_cover_image_url(self, obj):
-        """Return the full URL for the album cover image stored in S3"""
+        """Return the URL for the album cover image stored in S3"""
         if obj.cover_image:
-            return f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{obj.cover_image.image}"
+            urls = self.context.get("image_urls")
+            return urls.get(str(obj.cover_image.image)) if urls is not None else image_urls.image_url(obj.cover_image.image)
         return None 
 
 
 
+def image_list_context(images):
+    """Return serializer context holding the URLs of a page of images, resolved in one batch."""
+    return {"image_urls": variants.page_urls(images)}
+
+
+def album_list_context(albums):
+    """Return serializer context holding the cover URLs of a page of albums, resolved in one batch."""
+    return {"image_urls": image_urls.image_urls([album.cover_image.image for album in albums if album.cover_image])}
+
+
+def serialize_images(images, **context):
+    """Serialize a page of images, resolving all their URLs in one batch."""
+    images = list(images)
+    return UploadedImageSerializer(images, many=True, context=dict(context, **image_list_context(images))).data
+
+
+def serialize_albums(albums, **context):
+    """Serialize a page of albums, resolving their cover URLs in one batch."""
+    albums = list(albums)
+    return AlbumSerializer(albums, many=True, context=dict(context, **album_list_context(albums))).data
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
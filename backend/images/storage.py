@@ -0,0 +1,164 @@
+# This module defines the storage backends that hold original images, variants and profile pictures.
+# STORAGE_BACKEND names the class to use: S3Storage in production, or LocalStorage, which keeps
+# objects under LOCAL_STORAGE_ROOT so the whole upload path runs (and can be benchmarked) on one
+# machine with no network. Callers use get_storage() and never talk to boto3 directly.
+
+import os
+import shutil
+import threading
+from urllib.parse import quote
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import aws_clients
+
+# The most keys S3 accepts in one DeleteObjects request
+DELETE_BATCH_LIMIT = 1000
+
+_lock = threading.Lock()
+_instances = {}
+
+
+class S3Storage:
+    """Objects in the AWS_STORAGE_BUCKET_NAME bucket."""
+
+    def __init__(self, bucket=None):
+        self._bucket = bucket
+
+    @property
+    def bucket(self):
+        return self._bucket or settings.AWS_STORAGE_BUCKET_NAME
+
+    def upload(self, fileobj, key, content_type=None, cache_control=None, transfer_config=None):
+        """Stream a file-like object to `key`, using a multipart upload for large files."""
+        options = {}
+        if transfer_config is not None:
+            options["Config"] = transfer_config
+        extra_args = _extra_args(content_type, cache_control)
+        if extra_args:
+            options["ExtraArgs"] = extra_args
+        aws_clients.get_client("s3").upload_fileobj(fileobj, self.bucket, key, **options)
+
+    def save_bytes(self, key, data, content_type=None, cache_control=None):
+        aws_clients.get_client("s3").put_object(
+            Bucket=self.bucket, Key=key, Body=data, **_extra_args(content_type, cache_control)
+        )
+
+    def read(self, key):
+        return aws_clients.get_client("s3").get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def delete(self, key):
+        aws_clients.get_client("s3").delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_many(self, keys):
+        """Delete keys with one DeleteObjects request per 1,000. Returns {key: error} for keys that were not deleted."""
+        client = aws_clients.get_client("s3")
+        keys = list(keys)
+        failed = {}
+        for start in range(0, len(keys), DELETE_BATCH_LIMIT):
+            batch = keys[start:start + DELETE_BATCH_LIMIT]
+            try:
+                response = client.delete_objects(
+                    Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            except Exception as e:
+                failed.update((key, str(e)) for key in batch)
+                continue
+            for error in response.get("Errors", []):
+                failed[error["Key"]] = f"{error.get('Code')}: {error.get('Message')}"
+        return failed
+
+    def url(self, key):
+        return f"https://{self.bucket}.s3.amazonaws.com/{quote(key)}"
+
+    def signed_url(self, key, expires_in):
+        return aws_clients.get_client("s3").generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    def labeler_image(self, key):
+        """Return the Rekognition Image argument for a stored object, read in place from the bucket."""
+        return {"S3Object": {"Bucket": self.bucket, "Name": key}}
+
+
+class LocalStorage:
+    """Objects as files under LOCAL_STORAGE_ROOT, served from LOCAL_STORAGE_BASE_URL."""
+
+    def __init__(self, root=None, base_url=None):
+        self._root = root
+        self._base_url = base_url
+
+    @property
+    def root(self):
+        return self._root or getattr(settings, "LOCAL_STORAGE_ROOT", os.path.join(settings.MEDIA_ROOT, "storage"))
+
+    @property
+    def base_url(self):
+        return self._base_url or getattr(settings, "LOCAL_STORAGE_BASE_URL", f"{settings.MEDIA_URL}storage/")
+
+    def path(self, key):
+        """Return the file path for a key, refusing keys that would escape the storage root."""
+        root = os.path.abspath(self.root)
+        path = os.path.abspath(os.path.join(root, key))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def upload(self, fileobj, key, content_type=None, cache_control=None, transfer_config=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def save_bytes(self, key, data, content_type=None, cache_control=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def read(self, key):
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_many(self, keys):
+        failed = {}
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as e:
+                failed[key] = str(e)
+        return failed
+
+    def url(self, key):
+        return f"{self.base_url.rstrip('/')}/{quote(key)}"
+
+    def signed_url(self, key, expires_in):
+        return self.url(key)
+
+    def labeler_image(self, key):
+        return {"Bytes": self.read(key)}
+
+
+def _extra_args(content_type, cache_control):
+    extra_args = {}
+    if content_type:
+        extra_args["ContentType"] = content_type
+    if cache_control:
+        extra_args["CacheControl"] = cache_control
+    return extra_args
+
+
+def get_storage():
+    """Return the shared instance of the configured STORAGE_BACKEND."""
+    path = getattr(settings, "STORAGE_BACKEND", "images.storage.S3Storage")
+    with _lock:
+        if path not in _instances:
+            _instances[path] = import_string(path)()
+        return _instances[path]
@@ -0,0 +1,128 @@
+# This module keeps the normalised Tag / ImageTag index in sync with UploadedImage.tags.
+# The JSON list on the image stays the source of truth for API responses, while tag lookups,
+# per-tag counts and album membership queries run as indexed SQL against ImageTag.
+# Every tag write goes through set_image_tags so the two (and the TagCount rollup) never drift apart.
+# On PostgreSQL, tag containment searches use the GIN indexes on the JSON tag arrays directly.
+
+from django.db import connection, models, transaction
+
+from .models import ImageTag, Tag, UploadedImage
+
+
+def _tag_ids(names):
+    """Return {name: id} for the given tag names, creating any that do not exist yet."""
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+
+
+def sync_image_tags(image):
+    """
+    Bring the index rows for one image in line with image.tags.
+    Returns (added, removed) as sets of tag names.
+    """
+    wanted = set(tag for tag in image.tags if isinstance(tag, str) and tag)
+    indexed = dict(ImageTag.objects.filter(image=image).values_list("tag__name", "id"))
+
+    added = wanted - indexed.keys()
+    removed = indexed.keys() - wanted
+
+    if removed:
+        ImageTag.objects.filter(id__in=[indexed[name] for name in removed]).delete()
+    if added:
+        tag_ids = _tag_ids(added)
+        ImageTag.objects.bulk_create(
+            [ImageTag(image=image, tag_id=tag_ids[name], user_id=image.user_id) for name in added],
+            ignore_conflicts=True,
+        )
+    return added, removed
+
+
+def set_image_tags(image, tags):
+    """
+    Save new tags on an image, update the tag index, the owner's tag counts and album membership,
+    invalidate the owner's cached tag vocabulary and queue the image for search re-encoding. Returns (added, removed) tag names.
+    """
+    from . import album_membership, image_search, tag_rollup, tag_vocabulary
+
+    with transaction.atomic():
+        image.tags = tags
+        image.save(update_fields=["tags"])
+        added, removed = sync_image_tags(image)
+        tag_rollup.apply_diff(image.user_id, added, removed)
+        album_membership.on_image_tags_changed(image, added, removed)
+        if added or removed:
+            tag_vocabulary.invalidate_on_commit(image.user_id)
+            image_search.mark_stale([image])
+    return added, removed
+
+
+def rebuild(queryset=None, chunk_size=2000):
+    """Re-sync the index for every image in the queryset (all images by default). Returns the image count."""
+    queryset = queryset if queryset is not None else UploadedImage.objects.all()
+    count = 0
+    for image in queryset.only("id", "user_id", "tags").iterator(chunk_size=chunk_size):
+        with transaction.atomic():
+            sync_image_tags(image)
+        count += 1
+    return count
+
+
+def user_tag_names(user):
+    """Return the sorted distinct tag names across a user's images."""
+    return list(
+        Tag.objects.filter(image_tags__user=user).distinct().order_by("name").values_list("name", flat=True)
+    )
+
+
+def images_with_any_tag(user, tag_names):
+    """Return a queryset of the user's images carrying at least one of the tag names."""
+    return UploadedImage.objects.filter(
+        user=user,
+        id__in=ImageTag.objects.filter(user=user, tag__name__in=tag_names).values("image_id"),
+    )
+
+
+def images_matching_tag_text(text):
+    """Return a queryset of images with a tag containing the text (case-insensitive), served by the trigram index."""
+    return UploadedImage.objects.filter(
+        id__in=ImageTag.objects.filter(tag__name__icontains=text).values("image_id")
+    )
+
+
+def filter_by_tags(queryset, tags, match_all=False):
+    """
+    Filter images or albums to those whose tags contain all (match_all) or any of the given tags.
+    On PostgreSQL this is jsonb containment (@>) or overlap (?|), served by the GIN indexes on `tags`.
+    """
+    if connection.vendor == "postgresql":
+        if match_all:
+            return queryset.filter(tags__contains=list(tags))
+        return queryset.filter(tags__has_any_keys=list(tags))
+
+    # Other databases cannot index JSON arrays: images use the normalised index instead,
+    # and albums (a handful per user) are matched in Python
+    wanted = set(tags)
+    if queryset.model is not UploadedImage:
+        ids = [
+            album_id for album_id, album_tags in queryset.values_list("id", "tags")
+            if (wanted <= set(album_tags) if match_all else wanted & set(album_tags))
+        ]
+        return queryset.filter(id__in=ids)
+
+    matches = ImageTag.objects.filter(tag__name__in=wanted)
+    if match_all:
+        matches = (
+            matches.values("image_id")
+            .annotate(matched=models.Count("tag_id", distinct=True))
+            .filter(matched=len(wanted))
+        )
+    return queryset.filter(id__in=matches.values("image_id"))
+
+
+def suggest_tag_names(prefix, limit=20):
+    """Return tag names starting with the prefix (case-insensitive), served by the trigram index."""
+    return list(
+        Tag.objects.filter(name__istartswith=prefix).order_by("name").values_list("name", flat=True)[:limit]
+    )
@@ -0,0 +1,77 @@
+# This module maintains the per-user TagCount rollup used by the analytics dashboard.
+# Counts are adjusted incrementally from the tag diff of every image tag write and from the
+# tags of images being deleted, so reading a user's tag distribution is a single indexed query
+# whose cost does not grow with the size of their library.
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from . import tag_vocabulary
+from .models import ImageTag, Tag, TagCount
+
+
+def apply_diff(user_id, added, removed):
+    """Add one to the user's count for each added tag name and subtract one for each removed tag name."""
+    if added:
+        tag_ids = list(Tag.objects.filter(name__in=added).values_list("id", flat=True))
+        TagCount.objects.bulk_create(
+            [TagCount(user_id=user_id, tag_id=tag_id, count=0) for tag_id in tag_ids], ignore_conflicts=True
+        )
+        TagCount.objects.filter(user_id=user_id, tag_id__in=tag_ids).update(count=F("count") + 1)
+
+    if removed:
+        TagCount.objects.filter(user_id=user_id, tag__name__in=removed, count__gt=0).update(count=F("count") - 1)
+        TagCount.objects.filter(user_id=user_id, count=0).delete()
+
+
+def remove_images(image_ids):
+    """Subtract the tags of images about to be deleted and invalidate their owners' vocabularies. Call before deleting."""
+    per_tag = (
+        ImageTag.objects.filter(image_id__in=image_ids)
+        .values_list("user_id", "tag_id")
+        .annotate(images=Count("id"))
+    )
+
+    # One update per (user, amount): a single-image delete is one query however many tags it had
+    groups = defaultdict(list)
+    for user_id, tag_id, images in per_tag:
+        groups[user_id, images].append(tag_id)
+
+    # Floored at zero: a count that drifted low must not fail the delete on the non-negative constraint
+    for (user_id, images), tag_ids in groups.items():
+        TagCount.objects.filter(user_id=user_id, tag_id__in=tag_ids).update(count=Greatest(F("count") - images, 0))
+    users = {user_id for user_id, _ in groups}
+    if users:
+        TagCount.objects.filter(user_id__in=users, count__lte=0).delete()
+    for user_id in users:
+        tag_vocabulary.invalidate_on_commit(user_id)
+
+
+def rebuild(user=None):
+    """Recompute counts from the tag index, for one user or everyone. Returns the number of rows written."""
+    source = ImageTag.objects.all()
+    target = TagCount.objects.all()
+    if user is not None:
+        source = source.filter(user=user)
+        target = target.filter(user=user)
+
+    rows = [
+        TagCount(user_id=user_id, tag_id=tag_id, count=count)
+        for user_id, tag_id, count in source.values_list("user_id", "tag_id").annotate(count=Count("id")).iterator()
+    ]
+    with transaction.atomic():
+        target.delete()
+        TagCount.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def user_tag_counts(user):
+    """Return [(tag name, image count)] for a user, most used first."""
+    return list(
+        TagCount.objects.filter(user=user, count__gt=0)
+        .order_by("-count", "tag__name")
+        .values_list("tag__name", "count")
+    )
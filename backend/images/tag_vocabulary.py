@@ -0,0 +1,50 @@
+# This module caches each user's tag vocabulary (the distinct tags across their images).
+# Entries live in Django's default cache (local memory, or Redis when CACHE_URL is set) under a
+# per-user version number; any tag write bumps the version once its transaction commits, so
+# stale vocabularies are never read again and simply age out of the cache.
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import tag_index
+
+
+def cache_timeout():
+    return getattr(settings, "TAG_VOCABULARY_CACHE_TIMEOUT", 3600)
+
+
+def _version_key(user_id):
+    return f"tag-vocabulary:version:{user_id}"
+
+
+def _version(user_id):
+    # A clock-based first version cannot collide with entries written before the key was evicted
+    key = _version_key(user_id)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def user_tags(user):
+    """Return the user's sorted distinct tag names, from the cache when possible."""
+    key = f"tag-vocabulary:{user.id}:{_version(user.id)}"
+    tags = cache.get(key)
+    if tags is None:
+        tags = tag_index.user_tag_names(user)
+        cache.set(key, tags, cache_timeout())
+    return tags
+
+
+def invalidate(user_id):
+    """Move the user to a new vocabulary version, orphaning the cached one."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def invalidate_on_commit(user_id):
+    """Invalidate after the current transaction commits, so no reader can re-cache the old tags."""
+    transaction.on_commit(lambda: invalidate(user_id))
@@ -0,0 +1,71 @@
+# This module contains unit tests for write-time album membership.
+# It tests that image and album tag edits apply only their diff to album membership,
+# and that viewing an album performs no writes.
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from images import album_membership, tag_index
+from images.models import Album, UploadedImage
+
+
+class AlbumMembershipTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _image(self, tags):
+        image = UploadedImage.objects.create(user=self.user, image="key.jpg")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def _member_ids(self, album):
+        return set(album.images.values_list("id", flat=True))
+
+    def test_image_tag_edit_joins_and_leaves_albums(self):
+        dogs = Album.objects.create(user=self.user, name="Dogs", tags=["Dog"])
+        beach = Album.objects.create(user=self.user, name="Beach", tags=["Beach"])
+        image = self._image(["Dog"])
+        self.assertEqual(self._member_ids(dogs), {image.id})
+
+        self.client.post(f"/images/image/{image.id}/edit-tags/", {"tags": ["beach"]}, format="json")
+
+        self.assertEqual(self._member_ids(dogs), set())
+        self.assertEqual(self._member_ids(beach), {image.id})
+
+    def test_album_tag_edits_apply_diff(self):
+        dog = self._image(["Dog"])
+        beach = self._image(["Beach"])
+        manual = self._image(["Sky"])
+        album = Album.objects.create(user=self.user, name="Mixed")
+        album.images.add(manual)
+
+        self.client.post(f"/images/album/{album.id}/add-tags/", {"tags": ["Dog", "Beach"]}, format="json")
+        self.assertEqual(self._member_ids(album), {dog.id, beach.id, manual.id})
+
+        self.client.post(f"/images/album/{album.id}/remove-tags/", {"tags": ["Dog"]}, format="json")
+        self.assertEqual(self._member_ids(album), {beach.id, manual.id})
+
+    def test_removing_tag_keeps_images_matching_other_tags(self):
+        both = self._image(["Dog", "Beach"])
+        album = Album.objects.create(user=self.user, name="Album")
+        album_membership.set_album_tags(album, ["Dog", "Beach"])
+
+        album_membership.set_album_tags(album, ["Beach"])
+        self.assertEqual(self._member_ids(album), {both.id})
+
+    def test_album_get_is_read_only(self):
+        image = self._image(["Dog"])
+        album = Album.objects.create(user=self.user, name="Dogs")
+        album_membership.set_album_tags(album, ["Dog"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/images/album/{album.id}/")
+
+        self.assertEqual([img["id"] for img in response.data["images"]], [image.id])
+        statements = [query["sql"].split()[0].upper() for query in queries.captured_queries]
+        self.assertEqual(set(statements), {"SELECT"})
@@ -0,0 +1,58 @@
+# This module contains unit tests for the shared AWS client factory.
+# It tests that each service gets one client per process however many threads ask for it,
+# that the pool, retry and timeout settings are applied, and that reuse shows up in stats().
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from images import aws_clients
+
+
+@override_settings(AWS_MAX_POOL_CONNECTIONS=24, AWS_RETRY_MODE="adaptive", AWS_MAX_ATTEMPTS=5,
+                   AWS_CONNECT_TIMEOUT=2, AWS_READ_TIMEOUT=30)
+class AwsClientsTest(SimpleTestCase):
+    def setUp(self):
+        aws_clients.clear()
+        self.addCleanup(aws_clients.clear)
+
+    def test_one_client_per_service_across_threads(self):
+        barrier = threading.Barrier(8)
+
+        def fetch(_):
+            barrier.wait()
+            return aws_clients.get_client("s3")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            clients = list(pool.map(fetch, range(8)))
+
+        self.assertEqual(len({id(client) for client in clients}), 1)
+        self.assertIs(aws_clients.s3_client, clients[0])
+        self.assertIsNot(aws_clients.rekognition_client, clients[0])
+        counts = aws_clients.stats()["clients"]["s3"]
+        self.assertEqual((counts["created"], counts["reused"]), (1, 8))
+
+    def test_settings_are_applied(self):
+        config = aws_clients.get_client("s3").meta.config
+
+        self.assertEqual(config.max_pool_connections, 24)
+        self.assertEqual(config.retries, {"mode": "adaptive", "total_max_attempts": 5})
+        self.assertEqual((config.connect_timeout, config.read_timeout), (2, 30))
+
+    def test_forked_process_builds_new_clients(self):
+        parent = aws_clients.get_client("s3")
+
+        with patch("images.aws_clients.os.getpid", return_value=-1):
+            child = aws_clients.get_client("s3")
+
+        self.assertIsNot(parent, child)
+
+    def test_stats_report_connection_reuse(self):
+        aws_clients.get_client("rekognition")
+
+        counts = aws_clients.stats()["clients"]["rekognition"]
+
+        self.assertEqual((counts["connections"], counts["requests"]), (0, 0))
+        self.assertIsNone(counts["connection_reuse_ratio"])
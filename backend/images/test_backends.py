@@ -0,0 +1,93 @@
+# This module contains unit tests for the pluggable storage and labeling backends.
+# It tests the local filesystem store, that the fake labeler is deterministic and honours
+# MaxLabels/MinConfidence, and that the upload path runs end to end with no AWS calls.
+
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.checks import run_checks
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from images import image_urls
+from images.labeling import FakeLabeler
+from images.models import UploadedImage
+from images.storage import LocalStorage
+
+
+def image_bytes(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 200), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class LocalBackendsTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(
+            STORAGE_BACKEND="images.storage.LocalStorage",
+            LABELER_BACKEND="images.labeling.FakeLabeler",
+            LOCAL_STORAGE_ROOT=self.root,
+            LOCAL_STORAGE_BASE_URL="http://testserver/media/storage/",
+            IMAGE_URL_MODE="public",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_local_storage_round_trip(self):
+        storage = LocalStorage()
+        storage.upload(io.BytesIO(b"hello"), "user_1/uploads/a b.jpg")
+
+        self.assertEqual(storage.read("user_1/uploads/a b.jpg"), b"hello")
+        self.assertEqual(storage.url("user_1/uploads/a b.jpg"), "http://testserver/media/storage/user_1/uploads/a%20b.jpg")
+        storage.delete("user_1/uploads/a b.jpg")
+        storage.delete("user_1/uploads/a b.jpg")
+        with self.assertRaises(FileNotFoundError):
+            storage.read("user_1/uploads/a b.jpg")
+
+    def test_local_storage_rejects_escaping_keys(self):
+        with self.assertRaises(ValueError):
+            LocalStorage().save_bytes("../outside.txt", b"x")
+
+    def test_fake_labeler_is_deterministic(self):
+        labeler = FakeLabeler()
+        first = labeler.detect_labels({"Bytes": b"one"}, MaxLabels=5)["Labels"]
+
+        self.assertEqual(first, labeler.detect_labels({"Bytes": b"one"}, MaxLabels=5)["Labels"])
+        self.assertNotEqual(first, labeler.detect_labels({"Bytes": b"two"}, MaxLabels=5)["Labels"])
+        self.assertEqual(len(first), 5)
+        self.assertTrue(all(label["Confidence"] >= 80 for label in
+                            labeler.detect_labels({"Bytes": b"one"}, MinConfidence=80)["Labels"]))
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_upload_runs_offline(self, mock_upload, mock_detect):
+        data = image_bytes((10, 120, 40))
+        image_file = io.BytesIO(data)
+        image_file.name = "photo.jpg"
+
+        response = self.client.post("/images/upload/", {"image": image_file}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        mock_upload.assert_not_called()
+        mock_detect.assert_not_called()
+        image = UploadedImage.objects.get(id=response.data["data"]["id"])
+        self.assertEqual(LocalStorage().read(image.image), data)
+        self.assertEqual(len(response.data["data"]["tags"]), 5)
+        self.assertEqual(image_urls.image_url(image.image), f"http://testserver/media/storage/{image.image}")
+
+    def test_no_credential_warning_for_local_backends(self):
+        with override_settings(AWS_ACCESS_KEY_ID=None):
+            self.assertEqual([m.id for m in run_checks() if m.id == "images.W001"], [])
+
+    def test_credential_warning_for_aws_backends(self):
+        with override_settings(AWS_ACCESS_KEY_ID=None, STORAGE_BACKEND="images.storage.S3Storage"):
+            self.assertEqual([m.id for m in run_checks() if m.id == "images.W001"], ["images.W001"])
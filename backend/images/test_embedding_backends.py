@@ -0,0 +1,72 @@
+# This module contains unit tests for the pluggable embedding backends.
+# It tests backend selection, the cache names each backend's vectors are kept under, mean pooling,
+# and that the quantized and ONNX backends match the reference model on the label vocabulary.
+# The parity tests only run where the model (and, for ONNX, an exported copy) is available.
+
+import unittest
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from images import embedding_backends, embedding_model, label_embeddings
+
+
+class BackendSelectionTest(SimpleTestCase):
+    def test_each_backend_caches_under_its_own_name(self):
+        self.assertEqual(embedding_model.identity(), label_embeddings.EMBEDDING_MODEL_NAME)
+        with override_settings(EMBEDDING_BACKEND="onnx-int8"):
+            self.assertEqual(embedding_model.identity(), f"{label_embeddings.EMBEDDING_MODEL_NAME}+onnx-int8")
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            embedding_backends.load("tensorflow", label_embeddings.EMBEDDING_MODEL_NAME)
+
+    def test_missing_export_is_reported(self):
+        with override_settings(EMBEDDING_ONNX_DIR="/nonexistent"), self.assertRaises(ImproperlyConfigured):
+            embedding_backends.load("onnx", label_embeddings.EMBEDDING_MODEL_NAME)
+
+    def test_mean_pool_ignores_padding(self):
+        tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0]])
+
+        np.testing.assert_allclose(embedding_backends.mean_pool(tokens, mask, normalize=False), [[2.0, 0.0]])
+        np.testing.assert_allclose(embedding_backends.mean_pool(tokens, mask), [[1.0, 0.0]])
+
+
+class BackendParityTest(SimpleTestCase):
+    """Every backend should rank labels like the reference model: near-identical vectors on the vocabulary."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            reference = embedding_backends.SentenceTransformerBackend(
+                label_embeddings.EMBEDDING_MODEL_NAME, local_files_only=True
+            )
+        except Exception as e:
+            raise unittest.SkipTest(f"embedding model not available offline: {e}")
+        cls.labels = label_embeddings.load_rekognition_tags()
+        cls.expected = reference.encode(cls.labels, batch_size=256, normalize_embeddings=True)
+
+    def assert_matches_reference(self, backend):
+        vectors = backend.encode(self.labels, batch_size=256)
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        similarity = (vectors * self.expected).sum(axis=1)
+        self.assertGreaterEqual(similarity.mean(), 0.99)
+        self.assertGreaterEqual(similarity.min(), 0.95)
+
+    def test_int8_backend(self):
+        backend = embedding_backends.SentenceTransformerBackend(
+            label_embeddings.EMBEDDING_MODEL_NAME, quantize=True, local_files_only=True
+        )
+        self.assert_matches_reference(backend)
+
+    def test_onnx_backends(self):
+        for name in ("onnx", "onnx-int8"):
+            with self.subTest(backend=name):
+                try:
+                    backend = embedding_backends.load(name, label_embeddings.EMBEDDING_MODEL_NAME)
+                except ImproperlyConfigured as e:
+                    self.skipTest(str(e))
+                self.assert_matches_reference(backend)
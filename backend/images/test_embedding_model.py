@@ -0,0 +1,115 @@
+# This module contains unit tests for the lazily loaded embedding model registry.
+# It tests that importing the views does not load the model, that the model is loaded
+# once on first use, that load metrics are recorded, and that concurrent encodes are
+# micro-batched and cached.
+
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from images import embedding_model
+
+
+class EmbeddingModelRegistryTest(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, embedding_model, "_model", embedding_model._model)
+        self.addCleanup(setattr, embedding_model, "_label_index", embedding_model._label_index)
+        embedding_model._model = None
+        embedding_model._label_index = None
+
+    def test_importing_views_does_not_load_model(self):
+        # A fresh interpreter, as images.views is already imported in this one
+        check = (
+            "import sys, django; django.setup(); import images.views; "
+            "assert 'torch' not in sys.modules and 'sentence_transformers' not in sys.modules, "
+            "sorted(name for name in ('torch', 'sentence_transformers') if name in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", check], cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_model_is_loaded_once(self):
+        with patch("images.embedding_model._load_model", return_value=MagicMock()) as mock_load:
+            first = embedding_model.get_model()
+            second = embedding_model.get_model()
+
+        mock_load.assert_called_once()
+        self.assertIs(first, second)
+        metrics = embedding_model.metrics()
+        self.assertTrue(metrics["model_loaded"])
+        self.assertIsNotNone(metrics["model_load_seconds"])
+
+    def test_label_index_from_cache_does_not_load_model(self):
+        index = (["Dog"], np.ones((1, 3), dtype=np.float32))
+        with patch("images.label_embeddings.load_label_embeddings", return_value=index), \
+                patch("images.embedding_model._load_model") as mock_load:
+            self.assertIs(embedding_model.get_label_index(), index)
+        mock_load.assert_not_called()
+
+
+class FakeModel:
+    """Stands in for SentenceTransformer: records each batch and takes a little time per call."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        time.sleep(0.02)
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+@override_settings(EMBEDDING_BATCH_WINDOW_MS=20, EMBEDDING_BATCH_MAX_SIZE=8, EMBEDDING_CACHE_SIZE=2)
+class MicroBatchingTest(TestCase):
+    def setUp(self):
+        self.model = FakeModel()
+        for name in ("_model", "_batcher"):
+            self.addCleanup(setattr, embedding_model, name, getattr(embedding_model, name))
+        embedding_model._model = self.model
+        embedding_model._batcher = None
+        embedding_model.clear_cache()
+        self.addCleanup(embedding_model.clear_cache)
+
+    def test_concurrent_encodes_are_batched(self):
+        texts = [f"prompt {i}" * (i + 1) for i in range(16)]
+        barrier = threading.Barrier(len(texts))
+
+        def encode(text):
+            barrier.wait()
+            return embedding_model.encode(text)
+
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            vectors = list(pool.map(encode, texts))
+
+        self.assertEqual([vector[0] for vector in vectors], [len(text) for text in texts])
+        self.assertLess(len(self.model.batches), len(texts))
+        self.assertLessEqual(max(len(batch) for batch in self.model.batches), 8)
+        metrics = embedding_model.metrics()["batching"]
+        self.assertGreater(metrics["avg_batch_size"], 1)
+        self.assertIsNotNone(metrics["avg_encode_ms"])
+
+    def test_recent_prompts_are_cached(self):
+        first = embedding_model.encode("dogs on a beach")
+        embedding_model.encode("cats")
+        again = embedding_model.encode("dogs on a beach")
+        embedding_model.encode("birds")
+        embedding_model.encode("cats")
+
+        self.assertIs(first, again)
+        self.assertFalse(first.flags.writeable)
+        # "cats" was evicted by "birds" once "dogs on a beach" was used again
+        self.assertEqual(self.model.batches, [["dogs on a beach"], ["cats"], ["birds"], ["cats"]])
+
+    def test_errors_reach_every_caller(self):
+        self.model.encode = MagicMock(side_effect=RuntimeError("model failed"))
+
+        with self.assertRaises(RuntimeError):
+            embedding_model.encode("anything")
@@ -0,0 +1,137 @@
+# This module contains unit tests for bulk image deletion.
+# It tests that albums, covers and tag counts are cleaned up with a constant number of queries,
+# that only unshared objects are deleted in batches of at most 1,000 keys, and that failed
+# deletes stay queued and are retried with backoff, unless a re-upload uses the key again.
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from images import image_deletion, tag_index
+from images.models import Album, PendingStorageDeletion, TagCount, UploadedImage
+
+
+@patch("images.aws_clients.s3_client.delete_objects", return_value={})
+class BulkDeleteTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def _image(self, key, content_hash="", variants=None, tags=("Dog",)):
+        image = UploadedImage.objects.create(
+            user=self.user, image=key, content_hash=content_hash, variants=variants or {}
+        )
+        tag_index.set_image_tags(image, list(tags))
+        return image
+
+    def _delete(self, image_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/images/bulk-delete/", {"image_ids": image_ids}, format="json")
+
+    def test_bulk_delete_cleans_up_albums_and_counts(self, mock_delete):
+        images = [self._image(f"user_1/uploads/{i}.jpg") for i in range(3)]
+        album = Album.objects.create(user=self.user, name="Dogs", cover_image=images[0])
+        album.images.add(*images)
+        other = User.objects.create_user(username="other", password="pass")
+        foreign = UploadedImage.objects.create(user=other, image="user_2/uploads/x.jpg")
+
+        response = self._delete([images[0].id, images[1].id, foreign.id, "12"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data["deleted"]), [images[0].id, images[1].id])
+        self.assertEqual(response.data["not_found"], sorted([foreign.id, 12]))
+        album.refresh_from_db()
+        self.assertIsNone(album.cover_image)
+        self.assertEqual(list(album.images.all()), [images[2]])
+        self.assertEqual(TagCount.objects.get(user=self.user).count, 1)
+        self.assertTrue(UploadedImage.objects.filter(id=foreign.id).exists())
+        deleted_keys = {item["Key"] for item in mock_delete.call_args.kwargs["Delete"]["Objects"]}
+        self.assertEqual(deleted_keys, {"user_1/uploads/0.jpg", "user_1/uploads/1.jpg"})
+        self.assertFalse(PendingStorageDeletion.objects.exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self, mock_delete):
+        def queries(count):
+            ids = [self._image(f"user_1/uploads/{count}-{i}.jpg").id for i in range(count)]
+            album = Album.objects.create(user=self.user, name="Album", cover_image_id=ids[0])
+            album.images.add(*ids)
+            with CaptureQueriesContext(connection) as captured:
+                image_deletion.delete_images(self.user, ids)
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(20))
+
+    def test_shared_objects_are_kept(self, mock_delete):
+        variants = {"200": {"webp": "user_1/variants/aa/200w.webp"}}
+        first = self._image("user_1/uploads/a.jpg", "aa" * 32, variants)
+        self._image("user_1/uploads/a.jpg", "aa" * 32, variants)
+        unique = self._image("user_1/uploads/b.jpg", "bb" * 32, {"200": {"webp": "user_1/variants/bb/200w.webp"}})
+
+        self._delete([first.id, unique.id])
+
+        deleted_keys = {item["Key"] for item in mock_delete.call_args.kwargs["Delete"]["Objects"]}
+        self.assertEqual(deleted_keys, {"user_1/uploads/b.jpg", "user_1/variants/bb/200w.webp"})
+
+    @override_settings(STORAGE_DELETE_BATCH_SIZE=5000)
+    def test_deletes_are_batched_by_1000(self, mock_delete):
+        UploadedImage.objects.bulk_create(
+            [UploadedImage(user=self.user, image=f"user_1/uploads/{i}.jpg") for i in range(2500)]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image_deletion.delete_images(self.user, list(UploadedImage.objects.values_list("id", flat=True)))
+
+        self.assertEqual([len(call.kwargs["Delete"]["Objects"]) for call in mock_delete.call_args_list], [1000, 1000, 500])
+        self.assertFalse(PendingStorageDeletion.objects.exists())
+
+    def test_failed_deletes_are_retried(self, mock_delete):
+        mock_delete.return_value = {"Errors": [{"Key": "user_1/uploads/a.jpg", "Code": "InternalError", "Message": "Oops"}]}
+        self._delete([self._image("user_1/uploads/a.jpg").id, self._image("user_1/uploads/b.jpg").id])
+
+        pending = PendingStorageDeletion.objects.get()
+        self.assertEqual((pending.key, pending.attempts), ("user_1/uploads/a.jpg", 1))
+        self.assertEqual(pending.last_error, "InternalError: Oops")
+        self.assertGreater(pending.next_attempt_at, timezone.now())
+        self.assertEqual(image_deletion.process_pending(), (0, 0))
+
+        mock_delete.side_effect = Exception("Network down")
+        PendingStorageDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(image_deletion.process_pending(), (0, 1))
+        pending.refresh_from_db()
+        self.assertEqual(pending.attempts, 2)
+        self.assertGreater(pending.next_attempt_at, timezone.now() + timedelta(minutes=1))
+
+        mock_delete.side_effect = None
+        mock_delete.return_value = {}
+        PendingStorageDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(image_deletion.run_worker(once=True), (1, 0))
+        self.assertFalse(PendingStorageDeletion.objects.exists())
+
+    def test_retry_keeps_keys_that_were_uploaded_again(self, mock_delete):
+        variants = {"200": {"jpeg": f"user_{self.user.id}/variants/abcdef/200w.jpg"}}
+        key = f"user_{self.user.id}/uploads/abcdef/a.jpg"
+        image = self._image(key, content_hash="abcdef", variants=variants)
+        mock_delete.side_effect = Exception("Network down")
+        self._delete([image.id])
+        self.assertEqual(PendingStorageDeletion.objects.count(), 2)
+
+        # The same bytes are uploaded again before the retry, reusing both content-addressed keys
+        self._image(key, content_hash="abcdef", variants=variants)
+        mock_delete.reset_mock(side_effect=True)
+        PendingStorageDeletion.objects.update(next_attempt_at=timezone.now())
+
+        self.assertEqual(image_deletion.process_pending(), (0, 0))
+        mock_delete.assert_not_called()
+        self.assertFalse(PendingStorageDeletion.objects.exists())
+
+    def test_invalid_payload(self, mock_delete):
+        self.assertEqual(self._delete([]).status_code, 400)
+        self.assertEqual(self._delete(["abc"]).status_code, 400)
+        with override_settings(BULK_DELETE_MAX_IMAGES=2):
+            self.assertEqual(self._delete([1, 2, 3]).status_code, 400)
@@ -0,0 +1,187 @@
+# This module contains unit tests for semantic image search.
+# It tests the IVF index (recall, save/load, merging, swapping versions), that tag edits queue
+# images for encoding, and the search endpoint over the on-disk index plus rows encoded since it was built.
+# A bag-of-words encoder stands in for the embedding model.
+
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from images import image_search, tag_index
+from images.ann_index import IVFIndex, normalise
+from images.models import ImageEmbedding, UploadedImage
+
+
+def fake_encode(text):
+    vector = np.zeros(64, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        vector[zlib.crc32(word.encode()) % 64] += 1
+    return vector
+
+
+def fake_encode_many(texts):
+    return np.stack([fake_encode(text) for text in texts])
+
+
+class IVFIndexTest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        centres = normalise(rng.normal(size=(20, 32)))
+        self.vectors = normalise(np.repeat(centres, 100, axis=0) + rng.normal(scale=0.1, size=(2000, 32)))
+        self.ids = np.arange(2000) + 1
+        self.owners = self.ids % 3
+        self.queries = normalise(centres + rng.normal(scale=0.1, size=centres.shape))
+
+    def test_probing_few_clusters_finds_nearest_neighbours(self):
+        index = IVFIndex.build(self.vectors, self.ids, self.owners, nlist=40)
+
+        recalls = []
+        for query in self.queries:
+            exact = {int(i) for i in self.ids[np.argsort(self.vectors @ query)[::-1][:10]]}
+            found = {image_id for image_id, _ in index.search(query, 10, nprobe=4)}
+            recalls.append(len(exact & found) / 10)
+        self.assertGreaterEqual(np.mean(recalls), 0.9)
+        self.assertLess(len(index.candidate_rows(self.queries[0], nprobe=4)), 2000)
+
+    def test_owner_search_is_exact(self):
+        index = IVFIndex.build(self.vectors, self.ids, self.owners, nlist=40)
+        query = self.queries[3]
+
+        mine = self.owners == 2
+        expected = [int(i) for i in self.ids[mine][np.argsort(self.vectors[mine] @ query)[::-1][:5]]]
+        self.assertEqual([image_id for image_id, _ in index.search(query, 5, nprobe=1, owner=2)], expected)
+
+    def test_save_load_and_merge(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        directory = os.path.join(root, "index")
+        IVFIndex.build(self.vectors, self.ids, self.owners, nlist=10, meta={"model": "m"}).save(directory)
+
+        loaded = IVFIndex.load(directory)
+        self.assertEqual((len(loaded), loaded.meta["model"]), (2000, "m"))
+        self.assertIsInstance(loaded.vectors, np.memmap)
+
+        merged = loaded.merge(-self.vectors[:1], [1], [0])
+        self.assertEqual(len(merged), 2000)
+        self.assertEqual(merged.search(-self.vectors[0], 1)[0][0], 1)
+        np.testing.assert_array_equal(merged.centroids, loaded.centroids)
+
+    def test_save_swaps_versions_behind_a_symlink(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        directory = os.path.join(root, "index")
+        # An index saved before versioning is a plain directory
+        IVFIndex.build(self.vectors[:10], self.ids[:10], self.owners[:10], nlist=2).save(directory)
+        os.replace(os.path.realpath(directory), os.path.join(root, "plain"))
+        os.remove(directory)
+        os.replace(os.path.join(root, "plain"), directory)
+
+        versions = []
+        for count in (20, 30, 40):
+            IVFIndex.build(self.vectors[:count], self.ids[:count], self.owners[:count], nlist=2).save(directory)
+            self.assertTrue(os.path.islink(directory))
+            self.assertEqual(len(IVFIndex.load(directory)), count)
+            versions.append(os.path.realpath(directory))
+
+        # The current and previous versions stay on disk; older ones are removed
+        self.assertEqual(
+            sorted(os.path.join(root, name) for name in os.listdir(root) if name != "index"), sorted(versions[1:])
+        )
+
+
+@patch("images.embedding_model.encode_many", side_effect=fake_encode_many)
+@patch("images.embedding_model.encode", side_effect=fake_encode)
+class SemanticSearchTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(IMAGE_SEARCH_INDEX_DIR=os.path.join(root, "index"))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def _image(self, tags, user=None, name="photo.jpg"):
+        image = UploadedImage.objects.create(user=user or self.user, image=f"{name}-{tags}", name=name)
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def _search(self, query, **params):
+        response = self.client.get("/images/search/semantic/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_tag_edits_queue_images_for_encoding(self, *mocks):
+        image = self._image(["Dog", "Beach"])
+        self.assertIsNotNone(ImageEmbedding.objects.get(image=image).stale_since)
+
+        self.assertEqual(image_search.encode_stale(), 1)
+        embedding = ImageEmbedding.objects.get(image=image)
+        self.assertIsNone(embedding.stale_since)
+        self.assertEqual(len(bytes(embedding.vector)), 64 * 4)
+
+        tag_index.set_image_tags(image, ["Dog", "Beach", "Sunset"])
+        self.assertIsNotNone(ImageEmbedding.objects.get(image=image).stale_since)
+
+    def test_edit_during_encoding_stays_stale(self, mock_encode, mock_encode_many):
+        image = self._image(["Dog"])
+
+        def edit_then_encode(texts):
+            image_search.mark_stale([image])
+            return fake_encode_many(texts)
+
+        mock_encode_many.side_effect = edit_then_encode
+        image_search.encode_stale()
+
+        self.assertIsNotNone(ImageEmbedding.objects.get(image=image).stale_since)
+
+    def test_search_ranks_by_meaning_across_index_and_new_rows(self, *mocks):
+        dog = self._image(["Dog", "Beach"])
+        cat = self._image(["Cat", "Sofa"])
+        others_dog = self._image(["Dog", "Park"], user=self.other)
+        image_search.encode_stale()
+        self.assertEqual(image_search.rebuild(), 3)
+
+        # Encoded after the index was written, so served from the database until the next merge
+        new_dog = self._image(["Dog"], name="dog_walk.jpg")
+        image_search.encode_stale()
+
+        mine = self._search("dog", scope="mine")
+        self.assertEqual(set(mine[:2]), {dog.id, new_dog.id})
+        self.assertEqual(mine[-1], cat.id)
+        self.assertIn(others_dog.id, self._search("dog")[:3])
+        self.assertEqual(self._search("cat sofa", limit=1), [cat.id])
+
+        dog.delete()
+        self.assertNotIn(dog.id, self._search("dog"))
+
+    def test_worker_merges_into_index(self, *mocks):
+        self._image(["Dog"])
+        with override_settings(IMAGE_SEARCH_MERGE_THRESHOLD=2):
+            self.assertEqual(image_search.run_worker(once=True), 1)
+            self.assertEqual(image_search.stats()["indexed"], 1)
+
+            self._image(["Cat"])
+            image_search.run_worker(once=True)
+            self.assertEqual(image_search.stats()["indexed"], 1)
+            self.assertEqual(image_search.stats()["unmerged"], 1)
+
+            self._image(["Bird"])
+            image_search.run_worker(once=True)
+        self.assertEqual(image_search.stats()["indexed"], 3)
+
+    def test_invalid_requests(self, *mocks):
+        self.assertEqual(self.client.get("/images/search/semantic/").status_code, 400)
+        self.assertEqual(APIClient().get("/images/search/semantic/", {"q": "dog", "scope": "mine"}).status_code, 401)
+        self.assertEqual(self.client.get("/images/search/semantic/", {"q": "dog", "limit": "x"}).status_code, 400)
@@ -0,0 +1,51 @@
+# This module contains unit tests for the central image URL builder.
+# It tests public and CDN URL output, that pre-signed URLs are reused until shortly before
+# they expire, and that a batch only signs keys it has not signed recently.
+
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from images import aws_clients, image_urls
+
+
+class ImageUrlsTest(TestCase):
+    def setUp(self):
+        image_urls.clear()
+
+    @override_settings(AWS_STORAGE_BUCKET_NAME="test-bucket")
+    def test_public_url(self):
+        self.assertEqual(
+            image_urls.image_url("user_1/uploads/ab/my photo.jpg"),
+            "https://test-bucket.s3.amazonaws.com/user_1/uploads/ab/my%20photo.jpg",
+        )
+        self.assertIsNone(image_urls.image_url(""))
+
+    @override_settings(IMAGE_URL_MODE="cdn", AWS_S3_CUSTOM_DOMAIN="cdn.example.com/")
+    def test_cdn_url(self):
+        self.assertEqual(image_urls.image_url("user_1/a.jpg"), "https://cdn.example.com/user_1/a.jpg")
+
+    @override_settings(IMAGE_URL_MODE="presigned", AWS_STORAGE_BUCKET_NAME="test-bucket")
+    def test_presigned_urls_are_reused(self):
+        with patch.object(aws_clients.s3_client, "generate_presigned_url",
+                          wraps=aws_clients.s3_client.generate_presigned_url) as sign:
+            first = image_urls.image_url("user_1/a.jpg")
+            again = image_urls.image_url("user_1/a.jpg")
+            batch = image_urls.image_urls(["user_1/a.jpg", "user_1/b.jpg", "user_1/b.jpg"])
+
+        self.assertIn("Signature=", first)
+        self.assertEqual(first, again)
+        self.assertEqual(batch["user_1/a.jpg"], first)
+        self.assertEqual(sign.call_count, 2)
+
+    @override_settings(IMAGE_URL_MODE="presigned", IMAGE_URL_EXPIRY=600, IMAGE_URL_REFRESH_MARGIN=600)
+    def test_presigned_urls_near_expiry_are_resigned(self):
+        with patch.object(aws_clients.s3_client, "generate_presigned_url", side_effect=["one", "two"]):
+            self.assertEqual(image_urls.image_url("user_1/a.jpg"), "one")
+            self.assertEqual(image_urls.image_url("user_1/a.jpg"), "two")
+
+    @override_settings(IMAGE_URL_MODE="presigned", IMAGE_URL_CACHE_SIZE=1)
+    def test_signature_cache_is_bounded(self):
+        image_urls.image_urls(["a.jpg", "b.jpg"])
+
+        self.assertEqual(image_urls.stats()["cached"], 1)
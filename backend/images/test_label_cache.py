@@ -0,0 +1,126 @@
+# This module contains unit tests for content-hash deduplication and the Rekognition label cache.
+# It tests that identical bytes are stored once per user, that labels are reused from the cache
+# per request parameters, and that entries expire and are evicted least recently used first.
+
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from images import label_cache
+from images.aws_rekognition import analyze_image
+from images.models import LabelCache, UploadedImage
+
+
+def image_file(content=b"fake image content", name="test.jpg"):
+    f = io.BytesIO(content)
+    f.name = name
+    return f
+
+
+@patch("images.aws_clients.rekognition_client.detect_labels")
+@patch("images.aws_clients.s3_client.upload_fileobj")
+class ContentHashDeduplicationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _labels(self, mock_detect):
+        mock_detect.return_value = {"Labels": [{"Name": "Tree", "Confidence": 99}]}
+
+    def test_reupload_reuses_object_and_labels(self, mock_upload, mock_detect):
+        self._labels(mock_detect)
+        first = self.client.post("/images/upload/", {"image": image_file()}, format="multipart")
+        second = self.client.post("/images/upload/", {"image": image_file(name="copy.jpg")}, format="multipart")
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data["data"]["tags"], ["Tree"])
+        self.assertEqual(first.data["data"]["image_url"], second.data["data"]["image_url"])
+        self.assertEqual(mock_upload.call_count, 1)
+        self.assertEqual(mock_detect.call_count, 1)
+        self.assertEqual(UploadedImage.objects.filter(user=self.user).count(), 2)
+
+    def test_same_name_different_content_gets_distinct_keys(self, mock_upload, mock_detect):
+        self._labels(mock_detect)
+        self.client.post("/images/upload/", {"image": image_file(b"one")}, format="multipart")
+        self.client.post("/images/upload/", {"image": image_file(b"two")}, format="multipart")
+
+        keys = set(UploadedImage.objects.values_list("image", flat=True))
+        self.assertEqual(len(keys), 2)
+
+    def test_generate_tags_then_upload_labels_once(self, mock_upload, mock_detect):
+        self._labels(mock_detect)
+        self.client.post("/images/generate-tags/", {"image": image_file()}, format="multipart")
+        response = self.client.post("/images/upload/", {"image": image_file()}, format="multipart")
+
+        self.assertEqual(response.data["data"]["tags"], ["Tree"])
+        self.assertEqual(mock_detect.call_count, 1)
+        self.assertEqual(LabelCache.objects.count(), 1)
+
+    @patch("images.aws_clients.s3_client.delete_objects")
+    def test_shared_object_kept_until_last_delete(self, mock_delete, mock_upload, mock_detect):
+        self._labels(mock_detect)
+        first = self.client.post("/images/upload/", {"image": image_file()}, format="multipart")
+        second = self.client.post("/images/upload/", {"image": image_file()}, format="multipart")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/images/delete-image/{first.data['data']['id']}/")
+        mock_delete.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/images/delete-image/{second.data['data']['id']}/")
+        mock_delete.assert_called_once()
+
+
+class LabelCacheTest(TestCase):
+    def setUp(self):
+        self.image = {"Bytes": b"fake image content"}
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    def test_entries_are_keyed_by_request_parameters(self, mock_detect):
+        mock_detect.return_value = {"Labels": [{"Name": "Tree", "Confidence": 99}]}
+
+        label_cache.detect_labels("abc", self.image, max_labels=10)
+        label_cache.detect_labels("abc", self.image, max_labels=10)
+        label_cache.detect_labels("abc", self.image, max_labels=10, min_confidence=75)
+
+        self.assertEqual(mock_detect.call_count, 2)
+        mock_detect.assert_called_with(Image=self.image, MaxLabels=10, MinConfidence=75)
+        self.assertEqual(LabelCache.objects.get(params="MaxLabels=10").hits, 1)
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    def test_expired_entries_are_refreshed(self, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        label_cache.detect_labels("abc", self.image)
+        LabelCache.objects.update(created_at=timezone.now() - timedelta(days=365))
+
+        before = label_cache.stats()
+        label_cache.detect_labels("abc", self.image)
+
+        self.assertEqual(mock_detect.call_count, 2)
+        self.assertEqual(label_cache.stats()["expired"], before["expired"] + 1)
+
+    @override_settings(LABEL_CACHE_MAX_ENTRIES=2)
+    def test_evicts_least_recently_used(self):
+        now = timezone.now()
+        for i, content_hash in enumerate(["old", "mid", "new"]):
+            label_cache.put(content_hash, "MaxLabels=10", [])
+            LabelCache.objects.filter(content_hash=content_hash).update(last_used_at=now + timedelta(minutes=i))
+
+        self.assertEqual(label_cache.evict(), 1)
+        self.assertEqual(set(LabelCache.objects.values_list("content_hash", flat=True)), {"mid", "new"})
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    def test_analyze_image_uses_cache_for_known_content(self, mock_detect):
+        user = User.objects.create_user(username="tester", password="pass")
+        UploadedImage.objects.create(user=user, image="user_1/uploads/a.jpg", content_hash="abc")
+        mock_detect.return_value = {"Labels": [{"Name": "Dog"}]}
+
+        self.assertEqual(analyze_image("bucket", "user_1/uploads/a.jpg"), ["Dog"])
+        self.assertEqual(analyze_image("bucket", "user_1/uploads/a.jpg"), ["Dog"])
+        mock_detect.assert_called_once()
@@ -0,0 +1,76 @@
+# This module contains unit tests for the precomputed label embedding cache.
+# It tests that labels are encoded in one batch, written as a normalised float32 matrix
+# and memory-mapped back, and that the cache is keyed on the model name and CSV contents.
+
+import os
+import tempfile
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from images import label_embeddings
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return np.array([[len(text), 1.0, 0.0] for text in texts], dtype=np.float64)
+
+
+class LabelEmbeddingsTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv_path = os.path.join(self.tmp.name, "labels.csv")
+        with open(self.csv_path, "w") as f:
+            f.write("Label\nDog\nBeach\nDog\nMountain\n")
+        override = override_settings(LABEL_EMBEDDINGS_DIR=os.path.join(self.tmp.name, "cache"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_build_and_load_roundtrip(self):
+        model = FakeModel()
+        labels, matrix = label_embeddings.get_label_embeddings(model, "fake-model", self.csv_path)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(labels, ["Dog", "Beach", "Mountain"])
+        self.assertIsInstance(matrix, np.memmap)
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+
+    def test_cached_matrix_is_reused(self):
+        model = FakeModel()
+        label_embeddings.get_label_embeddings(model, "fake-model", self.csv_path)
+        label_embeddings.get_label_embeddings(model, "fake-model", self.csv_path)
+        self.assertEqual(model.calls, 1)
+
+    def test_cache_is_keyed_on_model_and_csv(self):
+        label_embeddings.build_label_embeddings(FakeModel(), "fake-model", self.csv_path)
+        self.assertIsNone(label_embeddings.load_label_embeddings("other-model", self.csv_path))
+
+        with open(self.csv_path, "a") as f:
+            f.write("Forest\n")
+        self.assertIsNone(label_embeddings.load_label_embeddings("fake-model", self.csv_path))
+
+
+class TopKLabelsTest(TestCase):
+    def setUp(self):
+        self.labels = ["Dog", "Cat", "Beach", "Mountain"]
+        matrix = np.array([[1, 0, 0], [0.8, 0.6, 0], [0, 0, 1], [0, 1, 0]], dtype=np.float32)
+        self.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def test_returns_best_matches_in_order(self):
+        ranked = label_embeddings.top_k_labels(self.matrix, self.labels, [2.0, 0.1, 0.0], k=2)
+        self.assertEqual([label for label, _ in ranked], ["Dog", "Cat"])
+        self.assertAlmostEqual(ranked[0][1], 0.99875, places=4)
+
+    def test_k_larger_than_label_set(self):
+        ranked = label_embeddings.top_k_labels(self.matrix, self.labels, [0, 0, 1], k=15)
+        self.assertEqual(len(ranked), 4)
+        self.assertEqual(ranked[0][0], "Beach")
+
+    def test_zero_query_vector(self):
+        self.assertEqual(label_embeddings.top_k_labels(self.matrix, self.labels, [0, 0, 0], k=3), [])
@@ -0,0 +1,134 @@
+# This module contains unit tests for the compiled label taxonomy.
+# It tests that parents, aliases, categories and (opt-in) head nouns compile into transitive
+# closures, that the shipped parents file keeps look-alike labels apart, that the compiled file
+# round-trips through disk, and that album membership follows the hierarchy.
+
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from images import label_taxonomy, tag_index
+from images.models import Album, UploadedImage
+
+
+def entry(parents=(), aliases=(), categories=()):
+    return {"parents": list(parents), "aliases": list(aliases), "categories": list(categories)}
+
+
+ENTRIES = {
+    "Animal": entry(),
+    "Mammal": entry(parents=["Animal"]),
+    "Dog": entry(parents=["Mammal"], aliases=["Puppy"], categories=["Animals and Pets"]),
+    "Cat": entry(parents=["Mammal"]),
+    "Car": entry(),
+    "Police Car": entry(),
+    "Beach": entry(),
+}
+
+
+def small_taxonomy():
+    return label_taxonomy.Taxonomy(**label_taxonomy.compile_taxonomy(ENTRIES))
+
+
+class CompileTaxonomyTest(SimpleTestCase):
+    def test_closures_are_transitive(self):
+        taxonomy = small_taxonomy()
+
+        self.assertEqual(taxonomy.ancestors("Dog"), {"Mammal", "Animal", "Animals and Pets"})
+        self.assertEqual(taxonomy.ancestors("Puppy"), {"Dog", "Mammal", "Animal", "Animals and Pets"})
+        self.assertEqual(taxonomy.expand(["Animal", "Beach"]), {"Animal", "Mammal", "Dog", "Puppy", "Cat", "Beach"})
+        self.assertEqual(taxonomy.generalise(["Cat", "Custom tag"]), {"Cat", "Mammal", "Animal", "Custom tag"})
+
+    def test_head_noun_parents_are_opt_in(self):
+        self.assertEqual(small_taxonomy().ancestors("Police Car"), frozenset())
+        heads = label_taxonomy.Taxonomy(**label_taxonomy.compile_taxonomy(ENTRIES, head_nouns=True))
+        self.assertEqual(heads.ancestors("Police Car"), {"Car"})
+
+    def test_cycles_terminate(self):
+        compiled = label_taxonomy.compile_taxonomy({"A": entry(parents=["B"]), "B": entry(parents=["A"])})
+        self.assertIn("B", compiled["ancestors"]["A"])
+
+    def test_shipped_parents(self):
+        paths = [label_taxonomy.CSV_FILE_PATH, label_taxonomy.PARENTS_CSV_PATH]
+        entries = label_taxonomy.read_entries(paths)
+        taxonomy = label_taxonomy.Taxonomy(**label_taxonomy.compile_taxonomy(entries))
+
+        self.assertLessEqual({"Mammal", "Animal"}, taxonomy.ancestors("Dog"))
+        self.assertIn("Car", taxonomy.ancestors("Police Car"))
+        for label, lookalike in (("Hot Dog", "Dog"), ("Sea Lion", "Lion"), ("Ice Cream", "Cream"), ("Cable Car", "Car")):
+            self.assertNotIn(lookalike, taxonomy.ancestors(label), label)
+        # Every label the parents file names is a Rekognition label
+        curated = label_taxonomy.read_entries([label_taxonomy.PARENTS_CSV_PATH])
+        named = set(curated) | {parent for entry in curated.values() for parent in entry["parents"]}
+        self.assertEqual(named - set(label_taxonomy.read_entries([label_taxonomy.CSV_FILE_PATH])), set())
+
+    def test_build_and_load_from_csv(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        extra = os.path.join(directory, "extra.csv")
+        with open(extra, "w", encoding="utf-8") as f:
+            f.write("Label,Parents,Aliases\nDog,Animal,Puppy|Hound dog\n")
+
+        with override_settings(LABEL_TAXONOMY_DIR=directory, LABEL_TAXONOMY_EXTRA_CSV=extra):
+            self.assertIsNone(label_taxonomy.load())
+            built, path = label_taxonomy.build()
+            loaded = label_taxonomy.load()
+
+        self.assertTrue(path.startswith(directory))
+        self.assertEqual(loaded.ancestors("Police Car"), {"Car", "Vehicle", "Transportation"})
+        self.assertLessEqual({"Dog", "Animal"}, loaded.ancestors("Hound dog"))
+        self.assertIn("Dog", loaded.expand(["Animal"]))
+        self.assertEqual(loaded.entries["Dog"], built.entries["Dog"])
+
+
+@patch("images.label_taxonomy.get_taxonomy", side_effect=small_taxonomy)
+class HierarchicalAlbumTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def _image(self, tags):
+        image = UploadedImage.objects.create(user=self.user, image="key.jpg")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def test_album_tags_match_labels_below_them(self, mock_taxonomy):
+        dog = self._image(["Dog"])
+        self._image(["Beach"])
+        album = Album.objects.create(user=self.user, name="Animals")
+
+        response = self.client.post(f"/images/album/{album.id}/add-tags/", {"tags": ["Animal"]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image["id"] for image in response.data["images"]], [dog.id])
+        self.assertEqual(set(album.images.values_list("id", flat=True)), {dog.id})
+
+    def test_removing_a_tag_keeps_images_matched_below_the_others(self, mock_taxonomy):
+        dog = self._image(["Dog"])
+        self._image(["Beach"])
+        album = Album.objects.create(user=self.user, name="Animals")
+        self.client.post(f"/images/album/{album.id}/add-tags/", {"tags": ["Animal", "Beach"]}, format="json")
+
+        response = self.client.post(f"/images/album/{album.id}/remove-tags/", {"tags": ["Beach"]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image["id"] for image in response.data["images"]], [dog.id])
+        self.assertEqual(set(album.images.values_list("id", flat=True)), {dog.id})
+
+    def test_image_tag_edits_follow_the_hierarchy(self, mock_taxonomy):
+        album = Album.objects.create(user=self.user, name="Mammals", tags=["Mammal"])
+        image = self._image(["Cat"])
+        self.assertTrue(album.images.filter(id=image.id).exists())
+
+        tag_index.set_image_tags(image, ["Cat", "Dog"])
+        tag_index.set_image_tags(image, ["Dog"])
+        self.assertTrue(album.images.filter(id=image.id).exists())
+
+        tag_index.set_image_tags(image, ["Car"])
+        self.assertFalse(album.images.filter(id=image.id).exists())
@@ -0,0 +1,114 @@
+# This module contains unit tests for keyset-paginated and streamed image listings.
+# It tests that pages walk the whole library newest first without gaps or repeats,
+# that bad cursors are rejected, that the NDJSON mode streams one image per line, and that
+# each page resolves its image URLs in one batch.
+
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from images import image_urls, pagination
+from images.models import Album, UploadedImage
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+        # Two images share each timestamp so ties are broken by id
+        now = timezone.now()
+        self.images = []
+        for i in range(7):
+            image = UploadedImage.objects.create(user=self.user, image=f"key{i}.jpg", name=f"img{i}")
+            UploadedImage.objects.filter(id=image.id).update(uploaded_at=now - timedelta(minutes=i // 2))
+            self.images.append(image)
+        self.newest_first = list(
+            UploadedImage.objects.order_by("-uploaded_at", "-id").values_list("id", flat=True)
+        )
+
+    def _walk(self, url, page_size, key="results"):
+        ids, cursor = [], None
+        while True:
+            params = {"page_size": page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item["id"] for item in response.data[key])
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_library_in_order(self):
+        self.assertEqual(self._walk("/images/my-images/", 3), self.newest_first)
+        self.assertEqual(self._walk(f"/images/user-images/{self.user.id}/", 2), self.newest_first)
+
+    def test_album_images_are_paged(self):
+        album = Album.objects.create(user=self.user, name="All")
+        album.images.add(*self.images)
+
+        self.assertEqual(self._walk(f"/images/album/{album.id}/", 4, key="images"), self.newest_first)
+
+    def test_public_images_are_paged(self):
+        other = User.objects.create_user(username="other", password="otherpass")
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self._walk("/images/explore/images/", 5), self.newest_first)
+
+    def test_unpaginated_request_returns_plain_list(self):
+        response = self.client.get("/images/my-images/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+
+    @override_settings(IMAGE_LIST_MAX_PAGE_SIZE=2)
+    def test_page_size_is_clamped(self):
+        response = self.client.get("/images/my-images/", {"page_size": 50})
+
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor_and_page_size_are_rejected(self):
+        self.assertEqual(self.client.get("/images/my-images/", {"cursor": "not-a-cursor"}).status_code, 400)
+        self.assertEqual(self.client.get("/images/my-images/", {"page_size": "0"}).status_code, 400)
+        self.assertEqual(self.client.get("/images/my-images/", {"page_size": "abc"}).status_code, 400)
+
+    def test_cursor_round_trip(self):
+        image = UploadedImage.objects.get(id=self.newest_first[0])
+
+        self.assertEqual(pagination.decode_cursor(pagination.encode_cursor(image)), (image.uploaded_at, image.id))
+
+    @override_settings(IMAGE_LIST_STREAM_CHUNK_SIZE=2)
+    def test_stream_returns_ndjson(self):
+        response = self.client.get("/images/my-images/", {"stream": "true"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], self.newest_first)
+
+    def test_listings_resolve_urls_once_per_page(self):
+        album = Album.objects.create(user=self.user, name="All")
+        album.images.add(*self.images)
+        other = User.objects.create_user(username="other", password="otherpass")
+
+        for url, user in (
+            ("/images/my-images/", self.user),
+            (f"/images/user-images/{self.user.id}/", self.user),
+            (f"/images/album/{album.id}/", self.user),
+            ("/images/explore/images/", other),
+        ):
+            self.client.force_authenticate(user)
+            with patch("images.image_urls.image_urls", wraps=image_urls.image_urls) as batch, \
+                    patch("images.image_urls.image_url", wraps=image_urls.image_url) as single:
+                response = self.client.get(url, {"page_size": 7})
+
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(batch.call_count, 1, url)
+            self.assertEqual(single.call_count, 0, url)
@@ -0,0 +1,117 @@
+# This module contains unit tests for album prompt parsing.
+# It tests that negation cues split prompts into included text and excluded phrases, that the
+# label trie finds multi-word and plural labels anywhere in a prompt without spanning a clause
+# boundary or negation cue, and that labels are excluded by name or by scoring closer to an
+# excluded phrase. A tiny label space stands in for the model.
+
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from images import prompt_parser, tag_index
+from images.models import Album, UploadedImage
+
+LABEL_VECTORS = {
+    "Animal": [1, 0, 0, 0],
+    "Beach": [0, 1, 0, 0.2],
+    "Car": [0, 0, 1, 0],
+    "Cat": [1, 0, 0, 0],
+    "Dog": [1, 0.2, 0, 0],
+    "Sunset": [0, 0.3, 0, 1],
+}
+LABELS = list(LABEL_VECTORS)
+MATRIX = prompt_parser.normalise(np.array(list(LABEL_VECTORS.values()), dtype=np.float32))
+WORD_VECTORS = {word.lower(): vector for word, vector in LABEL_VECTORS.items()}
+
+
+def fake_encode(text):
+    vector = np.zeros(4, dtype=np.float32)
+    for word, _, _ in prompt_parser.tokenize(text):
+        vector += WORD_VECTORS.get(word, 0)
+    return vector
+
+
+class ParsePromptTest(SimpleTestCase):
+    def setUp(self):
+        self.matcher = prompt_parser.LabelMatcher(["Dog", "Hot Dog", "Beach", "18-wheeler Truck", "Sunset", "Car"])
+
+    def test_negations_run_to_the_next_clause(self):
+        parsed = prompt_parser.parse("Beach photos without dogs or cats, no cars but sunsets", self.matcher)
+
+        self.assertEqual(parsed.positive_text, "Beach photos sunsets")
+        self.assertEqual(parsed.negative_phrases, ["dogs or cats", "cars"])
+        self.assertEqual(parsed.positive_labels, ["Beach", "Sunset"])
+        self.assertEqual(parsed.negative_labels, ["Dog", "Car"])
+
+    def test_longest_label_wins(self):
+        parsed = prompt_parser.parse("18-wheeler trucks except hot dogs", self.matcher)
+
+        self.assertEqual(parsed.positive_labels, ["18-wheeler Truck"])
+        self.assertEqual(parsed.negative_labels, ["Hot Dog"])
+
+    def test_labels_do_not_span_clauses_or_negations(self):
+        matcher = prompt_parser.LabelMatcher(["Sea", "Lion", "Sea Lion", "Ice", "Cream", "Ice Cream", "Sunset"])
+
+        parsed = prompt_parser.parse("sunset at sea, no lions", matcher)
+        self.assertEqual(parsed.positive_labels, ["Sunset", "Sea"])
+        self.assertEqual(parsed.negative_labels, ["Lion"])
+
+        parsed = prompt_parser.parse("ice, no cream", matcher)
+        self.assertEqual((parsed.positive_labels, parsed.negative_labels), (["Ice"], ["Cream"]))
+
+        parsed = prompt_parser.parse("ice without cream", matcher)
+        self.assertEqual((parsed.positive_labels, parsed.negative_labels), (["Ice"], ["Cream"]))
+
+        parsed = prompt_parser.parse("no sea lions", matcher)
+        self.assertEqual((parsed.positive_labels, parsed.negative_labels), ([], ["Sea Lion"]))
+
+    def test_every_label_in_the_vocabulary_can_be_excluded(self):
+        labels = prompt_parser.label_embeddings.load_rekognition_tags()
+        matcher = prompt_parser.LabelMatcher(labels)
+
+        missed = [label for label in labels if label not in prompt_parser.parse(f"not {label}", matcher).negative_labels]
+        self.assertEqual(missed, [])
+
+
+@patch("images.embedding_model.encode", side_effect=fake_encode)
+@patch("images.embedding_model.get_label_index", return_value=(LABELS, MATRIX))
+class ResolveTagsTest(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, prompt_parser, "_matcher", prompt_parser._matcher)
+        prompt_parser._matcher = prompt_parser.LabelMatcher(LABELS)
+
+    def test_labels_closer_to_a_negation_are_excluded(self, *mocks):
+        included, excluded = prompt_parser.resolve_tags("beach photos without animals", k=3)
+
+        self.assertEqual(included, ["Beach", "Sunset"])
+        self.assertEqual(excluded, ["Animal", "Dog"])
+
+    def test_named_labels_count_beyond_the_top_k(self, *mocks):
+        included, excluded = prompt_parser.resolve_tags("beach and sunset, no cars", k=1)
+
+        self.assertEqual(included, ["Beach", "Sunset"])
+        self.assertEqual(excluded, ["Car"])
+
+    def test_prompt_endpoint_applies_exclusions(self, *mocks):
+        user = User.objects.create_user(username="testuser", password="testpass")
+        client = APIClient()
+        client.force_authenticate(user)
+        images = {}
+        for tag in ("Beach", "Dog", "Sunset"):
+            images[tag] = UploadedImage.objects.create(user=user, image=f"{tag}.jpg")
+            tag_index.set_image_tags(images[tag], [tag])
+        album = Album.objects.create(user=user, name="Holiday")
+
+        response = client.post(
+            f"/images/album/{album.id}/update-tags-from-prompt/", {"prompt": "beach photos without animals"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated_tags"], ["Beach", "Sunset"])
+        self.assertIn("Dog", response.data["excluded_tags"])
+        self.assertEqual(
+            {image["id"] for image in response.data["matched_images"]}, {images["Beach"].id, images["Sunset"].id}
+        )
@@ -0,0 +1,158 @@
+# This module contains query-count regression tests for the image and user API endpoints.
+# Each endpoint is called against a small library, then again after the library has grown,
+# and must run the same number of queries both times, so a new N+1 pattern fails the suite.
+
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from images import tag_index
+from images.models import Album, UploadedImage, UploadJob
+from users.models import Profile
+
+
+class QueryCountTest(TestCase):
+    # Images, albums and other users added before each measured call
+    GROWTH = (1, 4)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+        self.album = Album.objects.create(user=self.user, name="Everything", tags=["Dog"])
+        self.size = 0
+
+    def _image(self, tags, user=None):
+        image = UploadedImage.objects.create(user=user or self.user, image="key.jpg", name="photo")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def _grow(self, count):
+        """Add `count` images, albums with covers and other users (half without a profile)."""
+        for i in range(self.size, self.size + count):
+            image = self._image(["Dog", "Beach"] if i % 2 else ["Dog"])
+            self.album.images.add(image)
+            Album.objects.create(user=self.user, name=f"Album {i}", cover_image=image, tags=["Beach"])
+
+            other = User.objects.create_user(username=f"other{i}", password="otherpass")
+            if i % 2:
+                Profile.objects.create(user=other, profile_picture="profile_pictures/other.jpg")
+            cover = self._image(["Dog"], user=other)
+            Album.objects.create(user=other, name=f"Other {i}", cover_image=cover)
+        self.size += count
+
+    def assertConstantQueries(self, method, url, data=None, target=None):
+        """
+        Call the endpoint as the library grows and require the same query count each time.
+        `target` builds fresh url format arguments (e.g. an image to delete) before each measured call,
+        and `data` may be a function of those arguments.
+        """
+        baseline = None
+        for count in self.GROWTH:
+            # Run on-commit hooks (e.g. cache invalidation) as a real request's commit would
+            with self.captureOnCommitCallbacks(execute=True):
+                self._grow(count)
+            args = target() if target else {}
+            request_url = url.format(**args)
+            request_data = data(args) if callable(data) else data
+
+            if baseline is None:
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(request_url, request_data, format="json")
+                baseline = len(queries)
+            else:
+                with self.assertNumQueries(baseline):
+                    response = getattr(self.client, method)(request_url, request_data, format="json")
+            self.assertLess(response.status_code, 400, f"{method.upper()} {request_url}: {response.status_code}")
+
+    def test_image_listings(self):
+        self.assertConstantQueries("get", "/images/my-images/")
+        self.assertConstantQueries("get", "/images/my-images/?page_size=3")
+        self.assertConstantQueries("get", "/images/user-images/{user}/", target=lambda: {"user": self.user.id})
+        self.assertConstantQueries("get", "/images/image/{image}/", target=lambda: {"image": self._image(["Dog"]).id})
+
+    def test_album_listings(self):
+        self.assertConstantQueries("get", "/images/albums/")
+        self.assertConstantQueries("get", "/images/album/{album}/", target=lambda: {"album": self.album.id})
+        self.assertConstantQueries("get", "/images/user-albums/{user}/", target=lambda: {"user": self.user.id})
+
+    def test_explore(self):
+        self.assertConstantQueries("get", "/images/explore/users/")
+        self.assertConstantQueries("get", "/images/explore/images/")
+        self.assertConstantQueries("get", "/images/explore/albums/")
+
+    def test_tags_and_analytics(self):
+        self.assertConstantQueries("get", "/images/user-tags/")
+        self.assertConstantQueries("get", "/images/analytics/")
+        self.assertConstantQueries("get", "/images/search/tags/?tags=Dog")
+        self.assertConstantQueries("get", "/images/search/tags/?tags=Dog,Beach&match=all&kind=albums")
+        self.assertConstantQueries("get", "/images/search/tags/suggest/?prefix=D")
+
+    def test_upload_job_status(self):
+        def job():
+            return {"job": UploadJob.objects.create(user=self.user, name="a.jpg", image=self._image([])).id}
+
+        self.assertConstantQueries("get", "/images/upload-jobs/{job}/", target=job)
+
+    def test_image_edits(self):
+        new_image = lambda: {"image": self._image(["Dog"]).id}
+
+        self.assertConstantQueries("post", "/images/image/{image}/edit-tags/", {"tags": ["Beach", "Sky"]}, target=new_image)
+        self.assertConstantQueries("post", "/images/image/{image}/edit-name/", {"name": "Renamed"}, target=new_image)
+        self.assertConstantQueries(
+            "post", "/images/finalize-upload/", lambda args: {"image_id": args["image"], "tags": ["Beach"]}, target=new_image
+        )
+
+    @patch("images.aws_clients.s3_client.delete_objects")
+    def test_delete_image(self, mock_delete):
+        def image_in_albums():
+            image = self._image(["Dog"])
+            self.album.images.add(image)
+            Album.objects.create(user=self.user, name="Cover", cover_image=image).images.add(image)
+            return {"image": image.id}
+
+        self.assertConstantQueries("delete", "/images/delete-image/{image}/", target=image_in_albums)
+
+    def test_album_edits(self):
+        new_album = lambda: {"album": Album.objects.create(user=self.user, name="New").id}
+
+        self.assertConstantQueries("post", "/images/create-album/", {"name": "Holiday"})
+        self.assertConstantQueries("post", "/images/album/{album}/add-tags/", {"tags": ["Dog"]}, target=new_album)
+        self.assertConstantQueries(
+            "post", "/images/album/{album}/remove-tags/", {"tags": ["Dog"]},
+            target=lambda: {"album": Album.objects.create(user=self.user, name="Dogs", tags=["Dog", "Beach"]).id},
+        )
+        self.assertConstantQueries("delete", "/images/delete-album/{album}/", target=new_album)
+
+    def test_album_contents(self):
+        def album_and_image():
+            image = self._image(["Sky"])
+            self.album.images.add(image)
+            return {"album": self.album.id, "image": image.id}
+
+        def album_and_new_images():
+            return {"album": self.album.id, "images": [self._image(["Sky"]).id for _ in range(3)]}
+
+        self.assertConstantQueries(
+            "post", "/images/album/{album}/", lambda args: {"image_ids": args["images"]}, target=album_and_new_images
+        )
+        self.assertConstantQueries(
+            "post", "/images/album/{album}/set-cover/", lambda args: {"image_id": args["image"]}, target=album_and_image
+        )
+        self.assertConstantQueries(
+            "delete", "/images/album/{album}/", lambda args: {"image_id": args["image"]}, target=album_and_image
+        )
+
+    def test_user_endpoints(self):
+        Profile.objects.create(user=self.user)
+
+        self.assertConstantQueries("get", "/users/me/")
+        self.assertConstantQueries("get", "/users/profile/me/")
+        self.assertConstantQueries("get", "/users/profile/{user}/", target=lambda: {"user": self.user.id})
+        self.assertConstantQueries("post", "/users/update-profile/", {"first_name": "Test"})
@@ -0,0 +1,152 @@
+# This module contains unit tests for the normalised tag index.
+# It tests that Tag / ImageTag rows follow every tag write, and that the tag listing,
+# analytics, explore search and album views read from the index.
+
+import importlib
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from images import album_membership, tag_index
+from images.models import Album, ImageTag, Tag, UploadedImage
+
+upper_trgm = importlib.import_module("images.migrations.0019_tag_name_upper_trgm_index")
+
+
+class TagIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _image(self, tags, user=None):
+        image = UploadedImage.objects.create(user=user or self.user, image="key.jpg")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def test_set_image_tags_syncs_index(self):
+        image = self._image(["Dog", "Beach"])
+        self.assertEqual(set(image.image_tags.values_list("tag__name", flat=True)), {"Dog", "Beach"})
+
+        added, removed = tag_index.set_image_tags(image, ["Dog", "Park"])
+
+        self.assertEqual((added, removed), ({"Park"}, {"Beach"}))
+        self.assertEqual(set(image.image_tags.values_list("tag__name", flat=True)), {"Dog", "Park"})
+        self.assertEqual(Tag.objects.filter(name="Dog").count(), 1)
+
+    def test_edit_tags_view_updates_index(self):
+        image = self._image(["Dog"])
+        self.client.post(f"/images/image/{image.id}/edit-tags/", {"tags": ["cat"]}, format="json")
+        self.assertEqual(list(ImageTag.objects.filter(image=image).values_list("tag__name", flat=True)), ["Cat"])
+
+    def test_finalize_upload_updates_index(self):
+        image = UploadedImage.objects.create(user=self.user, image="key.jpg")
+        self.client.post("/images/finalize-upload/", {"image_id": image.id, "tags": ["Sky"]}, format="json")
+        self.assertTrue(ImageTag.objects.filter(image=image, tag__name="Sky").exists())
+
+    def test_user_tags_view(self):
+        self._image(["Dog", "Beach"])
+        self._image(["Dog"])
+        self._image(["Secret"], user=User.objects.create_user(username="other", password="pass"))
+
+        response = self.client.get("/images/user-tags/")
+        self.assertEqual(response.data["tags"], ["Beach", "Dog"])
+
+    def test_analytics_counts(self):
+        self._image(["Dog", "Beach"])
+        self._image(["Dog"])
+
+        response = self.client.get("/images/analytics/")
+        self.assertEqual(response.data["total_images"], 2)
+        self.assertEqual(list(response.data["top_tags"]), [("Dog", 2), ("Beach", 1)])
+
+    def test_public_search_matches_tag_text(self):
+        other = User.objects.create_user(username="other", password="pass")
+        match = self._image(["Mountain"], user=other)
+        self._image(["Beach"], user=other)
+
+        response = self.client.get("/images/explore/images/?search=mount")
+        self.assertEqual([image["id"] for image in response.data], [match.id])
+
+    def test_album_view_includes_tag_matches(self):
+        match = self._image(["Dog"])
+        self._image(["Beach"])
+        album = Album.objects.create(user=self.user, name="Dogs")
+        album_membership.set_album_tags(album, ["Dog"])
+
+        response = self.client.get(f"/images/album/{album.id}/")
+        self.assertEqual([image["id"] for image in response.data["images"]], [match.id])
+
+    def test_rebuild_restores_missing_rows(self):
+        image = UploadedImage.objects.create(user=self.user, image="key.jpg", tags=["Dog"])
+        self.assertEqual(tag_index.rebuild(), 1)
+        self.assertTrue(ImageTag.objects.filter(image=image, tag__name="Dog").exists())
+
+
+class TagSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.other = User.objects.create_user(username="other", password="pass")
+        self.dog_beach = self._image(["Dog", "Beach"], self.other)
+        self.dog = self._image(["Dog"], self.other)
+        self.mine = self._image(["Dog"], self.user)
+
+    def _image(self, tags, user):
+        image = UploadedImage.objects.create(user=user, image="key.jpg")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def _ids(self, response):
+        return sorted(item["id"] for item in response.data)
+
+    def test_match_any(self):
+        response = self.client.get("/images/search/tags/?tags=Beach,Dog")
+        self.assertEqual(self._ids(response), sorted([self.dog_beach.id, self.dog.id, self.mine.id]))
+
+    def test_match_all(self):
+        response = self.client.get("/images/search/tags/?tags=Beach,Dog&match=all")
+        self.assertEqual(self._ids(response), [self.dog_beach.id])
+
+    def test_scope_mine(self):
+        self.client.login(username="testuser", password="testpass")
+        response = self.client.get("/images/search/tags/?tags=Dog&scope=mine")
+        self.assertEqual(self._ids(response), [self.mine.id])
+
+    def test_albums(self):
+        album = Album.objects.create(user=self.other, name="Coast", tags=["Beach", "Sea"])
+        Album.objects.create(user=self.other, name="Pets", tags=["Dog"])
+
+        response = self.client.get("/images/search/tags/?tags=Beach,Sea&match=all&kind=albums")
+        self.assertEqual(self._ids(response), [album.id])
+
+    def test_missing_tags(self):
+        self.assertEqual(self.client.get("/images/search/tags/").status_code, 400)
+
+    def test_limit_is_clamped_and_validated(self):
+        self.assertEqual(len(self.client.get("/images/search/tags/?tags=Dog&limit=-1").data), 1)
+        self.assertEqual(len(self.client.get("/images/search/tags/?tags=Dog&limit=0").data), 1)
+        self.assertEqual(self.client.get("/images/search/tags/?tags=Dog&limit=x").status_code, 400)
+
+    def test_suggest_by_prefix(self):
+        self._image(["Beach Hut", "Bear"], self.other)
+        response = self.client.get("/images/search/tags/suggest/?prefix=bea")
+        self.assertEqual(response.data["tags"], ["Beach", "Beach Hut", "Bear"])
+
+
+class TagTextIndexTest(SimpleTestCase):
+    def test_postgres_lookups_use_the_indexed_expression(self):
+        # Compiled without connecting, so this runs without a PostgreSQL server
+        connection = ConnectionHandler({"default": {"ENGINE": "django.db.backends.postgresql", "NAME": "x"}})["default"]
+        queries = [
+            ImageTag.objects.filter(tag__name__icontains="do").values("image_id"),
+            Tag.objects.filter(name__istartswith="do"),
+        ]
+        for queryset in queries:
+            sql, _ = queryset.query.get_compiler(connection=connection).as_sql()
+            self.assertIn('UPPER("images_tag"."name"::text) LIKE UPPER(%s)', sql)
+        self.assertIn("UPPER(name::text)", upper_trgm.NEW_INDEX[1])
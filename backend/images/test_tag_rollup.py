@@ -0,0 +1,90 @@
+# This module contains unit tests for the per-user TagCount rollup.
+# It tests that counts follow tag edits and image deletes incrementally (never below zero), that
+# a rebuild from the tag index agrees with them, and that analytics reports daily and weekly upload buckets.
+
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from images import tag_index, tag_rollup
+from images.models import TagCount, UploadedImage
+
+
+class TagRollupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _image(self, tags, user=None):
+        image = UploadedImage.objects.create(user=user or self.user, image="key.jpg")
+        tag_index.set_image_tags(image, tags)
+        return image
+
+    def _counts(self, user=None):
+        return dict(tag_rollup.user_tag_counts(user or self.user))
+
+    def test_counts_follow_tag_edits(self):
+        first = self._image(["Dog", "Beach"])
+        self._image(["Dog"])
+        self._image(["Dog"], user=User.objects.create_user(username="other", password="otherpass"))
+        self.assertEqual(self._counts(), {"Dog": 2, "Beach": 1})
+
+        tag_index.set_image_tags(first, ["Sky"])
+
+        self.assertEqual(self._counts(), {"Dog": 1, "Sky": 1})
+        self.assertFalse(TagCount.objects.filter(user=self.user, tag__name="Beach").exists())
+
+    @patch("images.aws_clients.s3_client.delete_objects")
+    def test_delete_image_decrements_counts(self, mock_delete):
+        image = self._image(["Dog", "Beach"])
+        self._image(["Dog"])
+
+        response = self.client.delete(f"/images/delete-image/{image.id}/")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self._counts(), {"Dog": 1})
+
+    def test_remove_images_handles_several_images(self):
+        images = [self._image(["Dog", "Beach"]), self._image(["Dog"]), self._image(["Dog"])]
+
+        tag_rollup.remove_images([image.id for image in images[:2]])
+
+        self.assertEqual(self._counts(), {"Dog": 1})
+
+    def test_remove_images_floors_drifted_counts_at_zero(self):
+        images = [self._image(["Dog", "Beach"]), self._image(["Dog", "Beach"])]
+        TagCount.objects.filter(user=self.user, tag__name="Dog").update(count=1)
+
+        tag_rollup.remove_images([image.id for image in images])
+
+        self.assertEqual(self._counts(), {})
+
+    def test_rebuild_matches_incremental_counts(self):
+        self._image(["Dog", "Beach"])
+        self._image(["Dog"])
+        incremental = self._counts()
+        TagCount.objects.all().delete()
+
+        tag_rollup.rebuild()
+
+        self.assertEqual(self._counts(), incremental)
+
+    def test_analytics_upload_buckets(self):
+        now = timezone.now()
+        for age in (0, 0, 1, 10):
+            image = self._image(["Dog"])
+            UploadedImage.objects.filter(id=image.id).update(uploaded_at=now - timedelta(days=age))
+
+        response = self.client.get("/images/analytics/", {"days": 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["top_tags"], [("Dog", 4)])
+        self.assertEqual([bucket["count"] for bucket in response.data["uploads_by_day"]], [1, 2])
+        self.assertEqual(response.data["uploads_by_day"][-1]["period"], now.date().isoformat())
+        self.assertEqual(sum(bucket["count"] for bucket in response.data["uploads_by_week"]), 4)
+        self.assertEqual(self.client.get("/images/analytics/", {"days": "x"}).status_code, 400)
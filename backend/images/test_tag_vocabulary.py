@@ -0,0 +1,77 @@
+# This module contains unit tests for the per-user tag vocabulary cache.
+# It tests that repeated reads are served from the cache, that tag edits and image deletes
+# invalidate it once committed, and that autocomplete can filter it by prefix.
+
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from images import tag_index, tag_vocabulary
+from images.models import UploadedImage
+
+
+class TagVocabularyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def _image(self, tags, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = UploadedImage.objects.create(user=user or self.user, image="key.jpg")
+            tag_index.set_image_tags(image, tags)
+        return image
+
+    def test_repeated_reads_use_cache(self):
+        self._image(["Dog", "Beach"])
+        self.assertEqual(tag_vocabulary.user_tags(self.user), ["Beach", "Dog"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_vocabulary.user_tags(self.user), ["Beach", "Dog"])
+
+    def test_tag_edit_invalidates_after_commit(self):
+        image = self._image(["Dog"])
+        other = self._image(["Cat"], user=User.objects.create_user(username="other", password="otherpass"))
+        self.assertEqual(tag_vocabulary.user_tags(self.user), ["Dog"])
+        self.assertEqual(tag_vocabulary.user_tags(other.user), ["Cat"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/images/image/{image.id}/edit-tags/", {"tags": ["sky"]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tag_vocabulary.user_tags(self.user), ["Sky"])
+        with self.assertNumQueries(0):
+            tag_vocabulary.user_tags(other.user)
+
+    @patch("images.aws_clients.s3_client.delete_objects")
+    def test_delete_image_invalidates(self, mock_delete):
+        image = self._image(["Dog"])
+        self._image(["Beach"])
+        self.assertEqual(tag_vocabulary.user_tags(self.user), ["Beach", "Dog"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/images/delete-image/{image.id}/")
+
+        self.assertEqual(tag_vocabulary.user_tags(self.user), ["Beach"])
+
+    def test_lost_version_key_does_not_resurrect_old_entries(self):
+        self._image(["Dog"])
+        tag_vocabulary.user_tags(self.user)
+        cache.delete(tag_vocabulary._version_key(self.user.id))
+
+        tag_vocabulary.invalidate(self.user.id)
+
+        with self.assertNumQueries(1):
+            tag_vocabulary.user_tags(self.user)
+
+    def test_user_tags_view_prefix(self):
+        self._image(["Dog", "Dolphin", "Beach"])
+
+        response = self.client.get("/images/user-tags/", {"prefix": "do"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["tags"], ["Dog", "Dolphin"])
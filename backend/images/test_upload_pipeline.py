@@ -0,0 +1,246 @@
+# This module contains unit tests for the asynchronous upload pipeline.
+# It tests that uploads are accepted without touching AWS, that the worker moves jobs
+# through their states, and that failures (including a worker dying mid-job) are retried and then recorded.
+
+import io
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from images import upload_pipeline
+from images.models import PendingStorageDeletion, StagedUpload, UploadedImage, UploadJob
+
+
+class UploadPipelineTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(UPLOAD_SPOOL_DIR=self.tmp.name, UPLOAD_JOB_MAX_ATTEMPTS=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _enqueue(self):
+        image_file = io.BytesIO(b"fake image content")
+        image_file.name = "test.jpg"
+        return self.client.post("/images/upload/async/", {"image": image_file}, format="multipart")
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_upload_returns_before_storage(self, mock_upload, mock_detect):
+        response = self._enqueue()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], UploadJob.STATUS_RECEIVED)
+        mock_upload.assert_not_called()
+        mock_detect.assert_not_called()
+
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_worker_stores_and_tags(self, mock_upload, mock_detect):
+        mock_detect.return_value = {
+            "Labels": [{"Name": "Sky", "Confidence": 90}, {"Name": "Tree", "Confidence": 99}]
+        }
+        job_id = self._enqueue().data["job_id"]
+
+        self.assertEqual(upload_pipeline.run_worker(once=True), 1)
+
+        job = UploadJob.objects.get(id=job_id)
+        self.assertEqual(job.status, UploadJob.STATUS_TAGGED)
+        self.assertEqual(job.suggested_tags, ["Tree", "Sky"])
+        self.assertEqual(UploadedImage.objects.get(id=job.image_id).image, upload_pipeline.storage_key(self.user.id, job.content_hash, "test.jpg"))
+        mock_upload.assert_called_once()
+
+        response = self.client.get(f"/images/upload-jobs/{job_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["status"], "tagged")
+        self.assertEqual(response.data["image_id"], job.image_id)
+        self.assertEqual(response.data["tags"], ["Tree", "Sky"])
+
+    @patch("images.aws_clients.s3_client.upload_fileobj", side_effect=Exception("S3 down"))
+    def test_job_fails_after_max_attempts(self, mock_upload):
+        job_id = self._enqueue().data["job_id"]
+
+        upload_pipeline.run_worker(once=True)
+
+        job = UploadJob.objects.get(id=job_id)
+        self.assertEqual(job.status, UploadJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, "S3 down")
+        self.assertEqual(self.client.get(f"/images/upload-jobs/{job_id}/").data["error"], "S3 down")
+
+    def test_abandoned_job_is_retried_after_its_lease_then_failed(self):
+        job_id = self._enqueue().data["job_id"]
+
+        # A worker claims the job and dies before finishing it
+        self.assertEqual(upload_pipeline.claim_next_job().id, job_id)
+        job = UploadJob.objects.get(id=job_id)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(upload_pipeline.claim_next_job())
+
+        UploadJob.objects.filter(id=job_id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(upload_pipeline.claim_next_job().id, job_id)
+
+        UploadJob.objects.filter(id=job_id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(upload_pipeline.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (UploadJob.STATUS_FAILED, 2))
+
+    def test_job_status_is_private(self):
+        other = User.objects.create_user(username="other", password="pass")
+        job = UploadJob.objects.create(user=other, name="x.jpg")
+        response = self.client.get(f"/images/upload-jobs/{job.id}/")
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkUploadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _files(self, *names):
+        files = []
+        for name in names:
+            image_file = io.BytesIO(f"fake image content of {name}".encode())
+            image_file.name = name
+            files.append(image_file)
+        return files
+
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_bulk_upload_creates_images_and_jobs(self, mock_upload):
+        response = self.client.post("/images/bulk-upload/", {"images": self._files("a.jpg", "b.jpg", "c.jpg")}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["name"] for r in response.data["results"]], ["a.jpg", "b.jpg", "c.jpg"])
+        self.assertEqual(mock_upload.call_count, 3)
+        self.assertEqual(UploadedImage.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(UploadJob.objects.filter(user=self.user, status=UploadJob.STATUS_STORED).count(), 3)
+
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_bulk_upload_reports_per_file_failures(self, mock_upload):
+        def upload(fileobj, bucket, key, **kwargs):
+            if key.endswith("bad.jpg"):
+                raise Exception("denied")
+
+        mock_upload.side_effect = upload
+
+        response = self.client.post("/images/bulk-upload/", {"images": self._files("good.jpg", "bad.jpg")}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        good, bad = response.data["results"]
+        self.assertEqual(good["status"], "uploaded")
+        self.assertEqual(UploadedImage.objects.get(id=good["id"]).name, "good.jpg")
+        self.assertEqual(bad, {"name": "bad.jpg", "status": "failed", "error": "denied"})
+
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_bulk_upload_skips_duplicate_content(self, mock_upload):
+        files = self._files("a.jpg") + self._files("a.jpg")
+        response = self.client.post("/images/bulk-upload/", {"images": files}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mock_upload.call_count, 1)
+        first, second = response.data["results"]
+        self.assertEqual(first["image_url"], second["image_url"])
+
+    def test_bulk_upload_no_files(self):
+        response = self.client.post("/images/bulk-upload/", {}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+
+@patch("images.aws_clients.rekognition_client.detect_labels")
+@patch("images.aws_clients.s3_client.upload_fileobj")
+class StagedUploadTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def _stage(self):
+        image_file = io.BytesIO(b"fake image content")
+        image_file.name = "test.jpg"
+        return self.client.post("/images/generate-tags/", {"image": image_file, "stage": "true"}, format="multipart")
+
+    def test_stage_then_finalize_calls_aws_once(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": [{"Name": "Tree", "Confidence": 99}]}
+
+        staged = self._stage()
+        self.assertEqual(staged.status_code, 200)
+        self.assertEqual(staged.data["tags"], ["Tree"])
+
+        response = self.client.post(
+            "/images/finalize-upload/", {"upload_token": staged.data["upload_token"], "tags": ["Tree", "Park"]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        image = UploadedImage.objects.get(id=response.data["id"])
+        self.assertEqual(image.tags, ["Tree", "Park"])
+        self.assertEqual(image.name, "test.jpg")
+        mock_upload.assert_called_once()
+        mock_detect.assert_called_once()
+
+    def test_finalize_rejects_tampered_token(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        token = self._stage().data["upload_token"]
+
+        response = self.client.post("/images/finalize-upload/", {"upload_token": token + "x", "tags": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_finalize_rejects_other_users_token(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        token = self._stage().data["upload_token"]
+
+        User.objects.create_user(username="other", password="pass")
+        self.client.login(username="other", password="pass")
+        response = self.client.post("/images/finalize-upload/", {"upload_token": token, "tags": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(UPLOAD_TOKEN_MAX_AGE=-1)
+    def test_finalize_rejects_expired_token(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        token = self._stage().data["upload_token"]
+
+        response = self.client.post("/images/finalize-upload/", {"upload_token": token, "tags": []}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_token_can_only_be_finalized_once(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        token = self._stage().data["upload_token"]
+
+        first = self.client.post("/images/finalize-upload/", {"upload_token": token, "tags": ["Tree"]}, format="json")
+        replay = self.client.post("/images/finalize-upload/", {"upload_token": token, "tags": ["Tree"]}, format="json")
+
+        self.assertEqual((first.status_code, replay.status_code), (201, 400))
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_unfinalized_uploads_are_deleted_after_expiry(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        self._stage()
+        key = StagedUpload.objects.get().key
+
+        self.assertEqual(upload_pipeline.expire_staged_uploads(), 0)
+        StagedUpload.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(upload_pipeline.expire_staged_uploads(), 1)
+
+        self.assertFalse(StagedUpload.objects.exists())
+        self.assertEqual(list(PendingStorageDeletion.objects.values_list("key", flat=True)), [key])
+
+    def test_expiry_keeps_objects_an_image_uses(self, mock_upload, mock_detect):
+        mock_detect.return_value = {"Labels": []}
+        self._stage()
+        staged = StagedUpload.objects.get()
+        UploadedImage.objects.create(user=self.user, image=staged.key, content_hash=staged.content_hash)
+
+        StagedUpload.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        upload_pipeline.expire_staged_uploads()
+
+        self.assertFalse(PendingStorageDeletion.objects.exists())
@@ -0,0 +1,98 @@
+# This module contains unit tests for resized image variants and blurhash placeholders.
+# It tests rendering sizes and formats, that duplicates reuse stored variants, that bulk uploads
+# build variants in their worker pool, and that listings expose thumbnail_url and srcset.
+
+import io
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from images import variants
+from images.models import UploadedImage
+
+
+def image_bytes(width, height, color=(200, 30, 30), fmt="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=(200, 400, 800), IMAGE_VARIANT_FORMATS=("webp", "jpeg"))
+class VariantsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def test_render_sizes_and_formats(self):
+        rendered, placeholder = variants.render(image_bytes(1000, 500))
+
+        self.assertEqual([(width, fmt) for width, fmt, _ in rendered], [
+            (200, "webp"), (200, "jpeg"), (400, "webp"), (400, "jpeg"), (800, "webp"), (800, "jpeg"),
+        ])
+        with Image.open(io.BytesIO(rendered[0][2])) as small:
+            self.assertEqual((small.format, small.size), ("WEBP", (200, 100)))
+        self.assertEqual(len(placeholder), 28)
+
+    def test_small_image_gets_one_size(self):
+        rendered, _ = variants.render(image_bytes(120, 80))
+
+        self.assertEqual({width for width, _, _ in rendered}, {120})
+
+    def test_blurhash_matches_reference_encoder(self):
+        with Image.new("RGB", (32, 32), (255, 0, 0)) as solid:
+            self.assertEqual(variants.blurhash(solid), "L9TI:j|cfQ|c|co1fQo1fQfQfQfQ")
+
+    @patch("images.aws_clients.s3_client.put_object")
+    def test_build_reuses_variants_of_duplicate(self, mock_put):
+        first = UploadedImage.objects.create(user=self.user, image="a.jpg", content_hash="ab" * 32)
+        second = UploadedImage.objects.create(user=self.user, image="a.jpg", content_hash="ab" * 32)
+
+        variants.build_for_image(first, image_bytes(500, 500))
+        calls = mock_put.call_count
+        variants.build_for_image(second)
+
+        self.assertEqual(calls, 4)
+        self.assertEqual(mock_put.call_count, calls)
+        second.refresh_from_db()
+        self.assertEqual(second.variants["200"]["webp"], f"user_{self.user.id}/variants/{'ab' * 8}/200w.webp")
+        self.assertEqual(second.blurhash, first.blurhash)
+
+    @patch("images.aws_clients.s3_client.put_object")
+    @patch("images.aws_clients.s3_client.upload_fileobj")
+    def test_bulk_upload_builds_variants(self, mock_upload, mock_put):
+        image_file = io.BytesIO(image_bytes(900, 600, fmt="JPEG"))
+        image_file.name = "photo.jpg"
+
+        response = self.client.post("/images/bulk-upload/", {"images": [image_file]}, format="multipart")
+
+        self.assertEqual(response.status_code, 201)
+        image = UploadedImage.objects.get(id=response.data["results"][0]["id"])
+        self.assertEqual(sorted(image.variants), ["200", "400", "800"])
+        self.assertTrue(image.blurhash)
+
+    @override_settings(AWS_STORAGE_BUCKET_NAME="test-bucket")
+    def test_listing_fields(self):
+        image = UploadedImage.objects.create(user=self.user, image="orig.jpg", blurhash="L0TIyj", variants={
+            "400": {"webp": "v/400w.webp", "jpeg": "v/400w.jpg"},
+            "200": {"webp": "v/200w.webp", "jpeg": "v/200w.jpg"},
+        })
+        UploadedImage.objects.create(user=self.user, image="plain.jpg")
+
+        response = self.client.get("/images/my-images/")
+
+        by_key = {item["image_url"].rsplit("/", 1)[1]: item for item in response.data}
+        self.assertTrue(by_key["orig.jpg"]["thumbnail_url"].endswith("/v/200w.jpg"))
+        self.assertEqual(
+            by_key["orig.jpg"]["srcset"],
+            "https://test-bucket.s3.amazonaws.com/v/200w.webp 200w, https://test-bucket.s3.amazonaws.com/v/400w.webp 400w",
+        )
+        self.assertEqual(by_key["plain.jpg"]["thumbnail_url"], by_key["plain.jpg"]["image_url"])
+        self.assertEqual(by_key["plain.jpg"]["srcset"], "")
+
+        explore = {item["id"]: item for item in APIClient().get("/images/explore/images/").data}
+        self.assertEqual(explore[image.id]["thumbnail_url"], by_key["orig.jpg"]["thumbnail_url"])
+        self.assertEqual(explore[image.id]["blurhash"], "L0TIyj")
@@ -14,8 +14,8 @@ class ImageUploadViewTest(TestCase):
         self.user = User.objects.create_user(username="testuser", password="testpass")
         self.client.login(username="testuser", password="testpass")
 
-    @patch("images.views.rekognition_client.detect_labels")
-    @patch("images.views.s3_client.upload_fileobj")
+    @patch("images.aws_clients.rekognition_client.detect_labels")
+    @patch("images.aws_clients.s3_client.upload_fileobj")
     def test_image_upload_success(self, mock_upload, mock_detect):
         mock_detect.return_value = {
             "Labels": [{"Name": "Tree", "Confidence": 99}, {"Name": "Sky", "Confidence": 97}]
@@ -0,0 +1,371 @@
+# This module implements the asynchronous image upload pipeline.
+# Uploads are spooled to local disk and recorded as UploadJob rows; a worker process started with
+# `manage.py process_upload_jobs` then stores them in S3 and labels them with Rekognition,
+# moving each job through received -> stored -> tagged (or failed). The database is the queue,
+# so no external broker is needed. Bulk uploads are streamed to S3 through a thread pool and
+# handed to the same worker for tagging. Staged uploads store and label an image in one call
+# and return a signed, single-use upload token that the finalize step commits tags against;
+# objects staged but never finalized are deleted once their token expires.
+# Every path also builds the image's resized variants (see `variants`) off the request path.
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import image_deletion
+from . import image_urls
+from . import label_cache
+from . import tag_index
+from . import variants
+from .models import StagedUpload, UploadedImage, UploadJob
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def spool_dir():
+    return getattr(settings, "UPLOAD_SPOOL_DIR", os.path.join(settings.MEDIA_ROOT, "upload_spool"))
+
+
+def max_attempts():
+    return getattr(settings, "UPLOAD_JOB_MAX_ATTEMPTS", 3)
+
+
+def job_lease_seconds():
+    return getattr(settings, "UPLOAD_JOB_LEASE_SECONDS", 600)
+
+
+def top_tags_from_labels(labels, limit=5):
+    """Return the names of the highest-confidence Rekognition labels."""
+    ai_tags = sorted(labels, key=lambda x: x["Confidence"], reverse=True)[:limit]
+    return [label["Name"] for label in ai_tags]
+
+
+def storage_key(user_id, content_hash, name):
+    """Return the S3 key for an upload; the content hash keeps same-named files apart."""
+    return f"user_{user_id}/uploads/{content_hash[:16]}/{name}"
+
+
+def find_stored_duplicate(user_id, content_hash):
+    """Return the S3 key of an identical image this user already stored, or None."""
+    return (
+        UploadedImage.objects.filter(user_id=user_id, content_hash=content_hash)
+        .values_list("image", flat=True)
+        .first()
+    )
+
+
+def enqueue_upload(user, image_file):
+    """Write the uploaded file to the spool directory, hashing it on the way, and create a job for the worker."""
+    os.makedirs(spool_dir(), exist_ok=True)
+    spool_path = os.path.join(spool_dir(), f"{uuid.uuid4().hex}{os.path.splitext(image_file.name)[1]}")
+
+    digest = hashlib.sha256()
+    with open(spool_path, "wb") as f:
+        for chunk in image_file.chunks():
+            digest.update(chunk)
+            f.write(chunk)
+
+    return UploadJob.objects.create(
+        user=user, name=image_file.name, spool_path=spool_path, content_hash=digest.hexdigest()
+    )
+
+
+def _store(job):
+    """Upload the spooled file to S3 and create its UploadedImage row (received -> stored)."""
+    s3_key = find_stored_duplicate(job.user_id, job.content_hash)
+    if s3_key is None:
+        s3_key = storage_key(job.user_id, job.content_hash, job.name)
+        with open(job.spool_path, "rb") as f:
+            get_storage().upload(f, s3_key)
+
+    # Save image without tags (tags will be added when user confirms). The row and the state change
+    # commit together, so a worker dying here never leaves a second image behind on retry.
+    with transaction.atomic():
+        job.image = UploadedImage.objects.create(
+            user=job.user, image=s3_key, tags=[], name=job.name, content_hash=job.content_hash
+        )
+        job.status = UploadJob.STATUS_STORED
+        job.save(update_fields=["image", "status", "updated_at"])
+    with open(job.spool_path, "rb") as f:
+        build_variants(job.image, f.read())
+    _remove_spool_file(job)
+
+
+def build_variants(image, data=None):
+    """Build an image's variants now. They only save bandwidth, so a failure is logged and the original is served."""
+    try:
+        variants.build_for_image(image, data)
+    except Exception as e:
+        logger.warning("Building variants for image %s failed: %s", image.id, e)
+
+
+def _tag(job):
+    """Ask Rekognition for suggested tags on the stored object (stored -> tagged)."""
+    labels = label_cache.detect_labels(job.content_hash, get_storage().labeler_image(job.image.image))
+    job.suggested_tags = top_tags_from_labels(labels)
+    job.status = UploadJob.STATUS_TAGGED
+    job.save(update_fields=["suggested_tags", "status", "updated_at"])
+
+
+def _remove_spool_file(job):
+    try:
+        os.remove(job.spool_path)
+    except FileNotFoundError:
+        pass
+
+
+def process_job(job):
+    """Advance a job as far as it can go. Errors are recorded and retried up to the attempt limit."""
+    try:
+        if job.status == UploadJob.STATUS_RECEIVED:
+            _store(job)
+        if job.status == UploadJob.STATUS_STORED:
+            _tag(job)
+    except Exception as e:
+        logger.exception("Upload job %s failed in state %s", job.id, job.status)
+        job.error = str(e)
+        if job.attempts >= max_attempts():
+            job.status = UploadJob.STATUS_FAILED
+            _remove_spool_file(job)
+    # Release the lease so a failed attempt is retried straight away
+    job.locked_until = None
+    job.save(update_fields=["error", "status", "locked_until", "updated_at"])
+    return job
+
+
+def _fail_abandoned_jobs(now):
+    """Fail jobs whose worker died during their last allowed attempt, so they stop holding spool files."""
+    abandoned = UploadJob.objects.filter(
+        status__in=[UploadJob.STATUS_RECEIVED, UploadJob.STATUS_STORED],
+        attempts__gte=max_attempts(),
+        locked_until__lt=now,
+    )
+    for job in abandoned:
+        _remove_spool_file(job)
+    abandoned.update(status=UploadJob.STATUS_FAILED, error="Worker stopped while processing the job", locked_until=None)
+
+
+def claim_next_job():
+    """
+    Claim the oldest pending job by counting an attempt and leasing it for UPLOAD_JOB_LEASE_SECONDS.
+    The claim commits on its own, so a worker that dies mid-job still used up an attempt and the
+    job is picked up again once its lease runs out. Returns the job, or None if the queue is empty.
+    """
+    now = timezone.now()
+    _fail_abandoned_jobs(now)
+    with transaction.atomic():
+        job = (
+            UploadJob.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[UploadJob.STATUS_RECEIVED, UploadJob.STATUS_STORED], attempts__lt=max_attempts())
+            .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.locked_until = now + timedelta(seconds=job_lease_seconds())
+        UploadJob.objects.filter(id=job.id).update(attempts=F("attempts") + 1, locked_until=job.locked_until)
+        job.attempts += 1
+    return job
+
+
+def process_next_job():
+    """
+    Claim and process the oldest pending job. Returns the job, or None if the queue is empty.
+    Storage, labeling and variant rendering run outside any transaction, under the job's lease.
+    """
+    job = claim_next_job()
+    if job is None:
+        return None
+    return process_job(job)
+
+
+UPLOAD_TOKEN_SALT = "images.upload-token"
+
+
+def upload_token_max_age():
+    return getattr(settings, "UPLOAD_TOKEN_MAX_AGE", 3600)
+
+
+def stage_upload(user, image_file):
+    """
+    Store an image in S3 and label it, reading its bytes once, without creating an UploadedImage yet.
+    Returns (upload_token, suggested_tags); pass the token to finalize_staged_upload to save the image.
+    """
+    data = image_file.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    s3_key = find_stored_duplicate(user.id, digest)
+    if s3_key is None:
+        s3_key = storage_key(user.id, digest, image_file.name)
+        image_file.seek(0)
+        get_storage().upload(image_file, s3_key)
+
+    labels = label_cache.detect_labels(digest, {"Bytes": data})
+    staged = StagedUpload.objects.create(user=user, key=s3_key, content_hash=digest, name=image_file.name)
+
+    token = signing.TimestampSigner(salt=UPLOAD_TOKEN_SALT).sign_object({"user": user.id, "staged": staged.id})
+    return token, top_tags_from_labels(labels)
+
+
+def finalize_staged_upload(user, token, tags):
+    """
+    Create the UploadedImage for a staged upload with the user's chosen tags. Each token works once.
+    Raises signing.BadSignature (or SignatureExpired) for invalid, expired, used or foreign tokens.
+    """
+    payload = signing.TimestampSigner(salt=UPLOAD_TOKEN_SALT).unsign_object(token, max_age=upload_token_max_age())
+    if payload["user"] != user.id:
+        raise signing.BadSignature("Upload token belongs to another user")
+
+    with transaction.atomic():
+        # Taking the row lock consumes the token: a replay, even a concurrent one, finds no row
+        staged = StagedUpload.objects.select_for_update().filter(id=payload.get("staged"), user=user).first()
+        if staged is None:
+            raise signing.BadSignature("Upload token has already been used")
+        staged.delete()
+
+        image = UploadedImage.objects.create(
+            user=user, image=staged.key, tags=[], name=staged.name, content_hash=staged.content_hash
+        )
+        tag_index.set_image_tags(image, tags)
+        variants.schedule(image)
+    return image
+
+
+def expire_staged_uploads(user=None):
+    """
+    Forget staged uploads whose token has expired (or all of `user`'s, e.g. when their account is
+    deleted) and queue their stored objects for deletion, unless an image or another staged upload
+    uses the same object. Returns how many expired.
+    """
+    expired = StagedUpload.objects.select_for_update(skip_locked=True)
+    if user is not None:
+        expired = expired.filter(user=user)
+    else:
+        expired = expired.filter(created_at__lt=timezone.now() - timedelta(seconds=upload_token_max_age()))
+    with transaction.atomic():
+        expired = list(expired)
+        if not expired:
+            return 0
+        StagedUpload.objects.filter(id__in=[staged.id for staged in expired]).delete()
+        keys = {staged.key for staged in expired}
+        keys -= set(UploadedImage.objects.filter(image__in=keys).values_list("image", flat=True))
+        keys -= set(StagedUpload.objects.filter(key__in=keys).values_list("key", flat=True))
+        image_deletion.enqueue(sorted(keys))
+    return len(expired)
+
+
+def bulk_upload_workers():
+    return getattr(settings, "BULK_UPLOAD_MAX_WORKERS", 8)
+
+
+def _upload_one(user_id, image_file, s3_key, digest, transfer_config):
+    """Upload one file and build its variants. Returns (error, (variants, blurhash) or None)."""
+    try:
+        get_storage().upload(image_file, s3_key, transfer_config=transfer_config)
+    except Exception as e:
+        logger.warning("Bulk upload of %s failed: %s", s3_key, e)
+        return str(e), None
+
+    try:
+        image_file.seek(0)
+        return None, variants.generate_and_store(user_id, digest, image_file.read())
+    except Exception as e:
+        logger.warning("Building variants for %s failed: %s", s3_key, e)
+        return None, None
+
+
+def bulk_store(user, image_files):
+    """
+    Upload many files to S3 and build their variants through a bounded thread pool, then create their
+    UploadedImage rows and tagging jobs with one bulk_create each. Returns one result dict per file, in input order.
+    Files whose bytes this user already stored, or that repeat earlier in the batch, are not re-uploaded.
+    """
+    # Each file already gets its own pool thread, so keep per-file multipart transfers single-threaded.
+    transfer_config = TransferConfig(max_concurrency=1, use_threads=False)
+
+    with ThreadPoolExecutor(max_workers=bulk_upload_workers()) as pool:
+        hashes = list(pool.map(label_cache.content_hash, image_files))
+
+        existing = {}
+        built = {}
+        for digest, s3_key, variant_keys, placeholder in UploadedImage.objects.filter(
+            user=user, content_hash__in=set(hashes)
+        ).values_list("content_hash", "image", "variants", "blurhash"):
+            existing[digest] = s3_key
+            if variant_keys:
+                built[digest] = (variant_keys, placeholder)
+
+        s3_keys = []
+        to_upload = []
+        for image_file, digest in zip(image_files, hashes):
+            if digest not in existing:
+                existing[digest] = storage_key(user.id, digest, image_file.name)
+                to_upload.append((image_file, existing[digest], digest))
+            s3_keys.append(existing[digest])
+
+        failed = {}
+        outcomes = pool.map(lambda args: _upload_one(user.id, *args, transfer_config), to_upload)
+        for (_, s3_key, digest), (error, rendered) in zip(to_upload, outcomes):
+            if error is not None:
+                failed[s3_key] = error
+            elif rendered is not None:
+                built[digest] = rendered
+    errors = [failed.get(s3_key) for s3_key in s3_keys]
+
+    stored = []
+    for image_file, s3_key, digest, error in zip(image_files, s3_keys, hashes, errors):
+        if error is None:
+            variant_keys, placeholder = built.get(digest, ({}, ""))
+            stored.append(UploadedImage(
+                user=user, image=s3_key, tags=[], name=image_file.name, content_hash=digest,
+                variants=variant_keys, blurhash=placeholder,
+            ))
+    with transaction.atomic():
+        UploadedImage.objects.bulk_create(stored)
+        jobs = UploadJob.objects.bulk_create([
+            UploadJob(user=user, image=image, name=image.name, content_hash=image.content_hash, status=UploadJob.STATUS_STORED)
+            for image in stored
+        ])
+
+    created = iter(zip(stored, jobs))
+    results = []
+    for image_file, error in zip(image_files, errors):
+        if error is not None:
+            results.append({"name": image_file.name, "status": "failed", "error": error})
+            continue
+        image, job = next(created)
+        results.append({
+            "name": image_file.name,
+            "status": "uploaded",
+            "id": image.id,
+            "job_id": job.id,
+            "image_url": image_urls.image_url(image.image),
+        })
+    return results
+
+
+def run_worker(poll_interval=1.0, once=False):
+    """Process jobs until the queue is empty (with `once`) or forever, sleeping while idle."""
+    processed = 0
+    while True:
+        job = process_next_job()
+        if job is not None:
+            processed += 1
+            continue
+        if once:
+            return processed
+        time.sleep(poll_interval)
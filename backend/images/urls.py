@@ -5,6 +5,9 @@
 from django.urls import path
 from .views import ( 
     ImageUploadView, 
+    AsyncImageUploadView,
+    BulkImageUploadView,
+    UploadJobStatusView,
     UserImagesView, 
     FinalizeImageUploadView, 
     GenerateTagsView, 
@@ -18,6 +21,7 @@ from .views import (
     RemoveTagsFromAlbumView, 
     UserTagsView, 
     DeleteImageView, 
+    BulkDeleteImagesView,
     ImageDetailView, 
     EditImageTagsView, 
     AnalyticsView, 
@@ -26,11 +30,18 @@ from .views import (
     PublicImagesView, 
     PublicAlbumsView, 
     UpdateAlbumTagsFromPromptView,
+    TagSearchView,
+    TagSuggestView,
+    SemanticSearchView,
     UserSpecificImagesView,
-    UserSpecificAlbumsView)
+    UserSpecificAlbumsView,
+    MetricsView)
 
 urlpatterns = [
     path('upload/', ImageUploadView.as_view(), name='image-upload'),
+    path('upload/async/', AsyncImageUploadView.as_view(), name='image-upload-async'),
+    path('bulk-upload/', BulkImageUploadView.as_view(), name='bulk-upload'),
+    path('upload-jobs/<int:job_id>/', UploadJobStatusView.as_view(), name='upload-job-status'),
     path('my-images/', UserImagesView.as_view(), name='user-images'),
     path('finalize-upload/', FinalizeImageUploadView.as_view(), name='finalize-upload'),
     path('generate-tags/', GenerateTagsView.as_view(), name='generate-tags'),
@@ -44,6 +55,7 @@ urlpatterns = [
     path("album/<int:album_id>/remove-tags/", RemoveTagsFromAlbumView.as_view(), name="remove-tags"),
     path("user-tags/", UserTagsView.as_view(), name="user-tags"),
     path("delete-image/<int:image_id>/", DeleteImageView.as_view(), name="delete-image"),
+    path("bulk-delete/", BulkDeleteImagesView.as_view(), name="bulk-delete"),
     path("image/<int:image_id>/", ImageDetailView.as_view(), name="image-detail"),
     path("image/<int:image_id>/edit-tags/", EditImageTagsView.as_view(), name="edit-image-tags"),
     path("analytics/", AnalyticsView.as_view(), name="analytics"),
@@ -54,4 +66,8 @@ urlpatterns = [
     path('album/<int:album_id>/update-tags-from-prompt/', UpdateAlbumTagsFromPromptView.as_view(), name='update-tags-from-prompt'),
     path("user-images/<int:user_id>/", UserSpecificImagesView.as_view(), name="user-specific-images"),
     path("user-albums/<int:user_id>/", UserSpecificAlbumsView.as_view(), name="user-specific-albums"),
+    path("search/tags/", TagSearchView.as_view(), name="tag-search"),
+    path("search/tags/suggest/", TagSuggestView.as_view(), name="tag-suggest"),
+    path("search/semantic/", SemanticSearchView.as_view(), name="semantic-search"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
@@ -0,0 +1,224 @@
+# This module generates the resized variants and blurhash placeholder for uploaded images.
+# Each image is decoded once, resized to the IMAGE_VARIANT_WIDTHS in WebP and JPEG, and the
+# results are stored next to the original under content-addressed keys, so duplicates share
+# them and they can be cached forever. Uploads hand the work to a small thread pool that runs
+# after the upload's transaction commits; `manage.py build_image_variants` backfills old images.
+
+import io
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from . import image_urls
+from .models import UploadedImage
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+SAVE_OPTIONS = {"webp": {"quality": 80, "method": 4}, "jpeg": {"quality": 82, "optimize": True, "progressive": True}}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def widths():
+    return tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", (200, 400, 800)))
+
+
+def formats():
+    return tuple(getattr(settings, "IMAGE_VARIANT_FORMATS", ("webp", "jpeg")))
+
+
+def workers():
+    return getattr(settings, "IMAGE_VARIANT_WORKERS", 4)
+
+
+def variant_key(user_id, content_hash, width, fmt):
+    return f"user_{user_id}/variants/{content_hash[:16]}/{width}w.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+# Blurhash (https://blurha.sh): a DCT of a tiny copy of the image, packed into base 83
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _base83(value, length):
+    return "".join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(values):
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, x_components=4, y_components=3):
+    """Return the blurhash string for a PIL image."""
+    small = image.convert("RGB")
+    small.thumbnail((32, 32))
+    pixels = _srgb_to_linear(np.asarray(small, dtype=np.float64))
+    height, width = pixels.shape[:2]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            basis = np.outer(np.cos(np.pi * j * np.arange(height) / height), np.cos(np.pi * i * np.arange(width) / width))
+            scale = 1 if i == j == 0 else 2
+            factors.append(scale * (pixels * basis[:, :, None]).sum(axis=(0, 1)) / (width * height))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    max_value = 1.0
+    if ac:
+        quantised = int(max(0, min(82, math.floor(max(abs(v) for f in ac for v in f) * 166 - 0.5))))
+        max_value = (quantised + 1) / 166
+        result += _base83(quantised, 1)
+    else:
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(math.copysign(abs(v / max_value) ** 0.5, v) * 9 + 9.5)))) for v in factor
+        )
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def render(data):
+    """
+    Decode image bytes once and return ([(width, fmt, bytes)], blurhash).
+    Widths wider than the original are skipped; an image narrower than every width gets one
+    variant at its own size.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    targets = [width for width in widths() if width < image.width] or [image.width]
+    rendered = []
+    for width in targets:
+        resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt in formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+            rendered.append((width, fmt, buffer.getvalue()))
+    return rendered, blurhash(image)
+
+
+def generate_and_store(user_id, content_hash, data):
+    """Render an image's variants and upload them. Returns ({width: {fmt: key}}, blurhash)."""
+    rendered, placeholder = render(data)
+    keys = {}
+    for width, fmt, body in rendered:
+        key = variant_key(user_id, content_hash, width, fmt)
+        get_storage().save_bytes(
+            key, body, content_type=CONTENT_TYPES[fmt], cache_control="public, max-age=31536000, immutable"
+        )
+        keys.setdefault(str(width), {})[fmt] = key
+    return keys, placeholder
+
+
+def stored_variants(user_id, content_hash):
+    """Return (variants, blurhash) already built for these bytes by the same user, or None."""
+    if not content_hash:
+        return None
+    return (
+        UploadedImage.objects.filter(user_id=user_id, content_hash=content_hash)
+        .exclude(variants={})
+        .values_list("variants", "blurhash")
+        .first()
+    )
+
+
+def build_for_image(image, data=None):
+    """
+    Give an image its variants, reusing those of an identical upload when there is one.
+    Without `data` the original is read back from storage.
+    """
+    built = stored_variants(image.user_id, image.content_hash)
+    if built is None:
+        if data is None:
+            data = get_storage().read(image.image)
+        built = generate_and_store(image.user_id, image.content_hash or str(image.id), data)
+
+    image.variants, image.blurhash = built
+    UploadedImage.objects.filter(id=image.id).update(variants=image.variants, blurhash=image.blurhash)
+    return image
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix="image-variants")
+        return _pool
+
+
+def _build_in_background(image_id, data=None):
+    try:
+        image = UploadedImage.objects.filter(id=image_id).first()
+        if image is not None:
+            build_for_image(image, data)
+        return True
+    except Exception:
+        logger.exception("Building variants for image %s failed", image_id)
+        return False
+    finally:
+        connection.close()
+
+
+def schedule(image, data=None):
+    """Build an image's variants in the background pool once the current transaction commits."""
+    transaction.on_commit(lambda: _get_pool().submit(_build_in_background, image.id, data))
+
+
+def backfill(limit=None):
+    """Build variants for images that have none, IMAGE_VARIANT_WORKERS at a time. Returns (built, failed)."""
+    pending = UploadedImage.objects.filter(variants={}).order_by("id").values_list("id", flat=True)
+    image_ids = list(pending[:limit] if limit else pending)
+
+    with ThreadPoolExecutor(max_workers=workers(), thread_name_prefix="image-variants") as pool:
+        results = list(pool.map(_build_in_background, image_ids))
+    return results.count(True), results.count(False)
+
+
+def page_urls(images):
+    """Return {key: url} for the originals and variants of a page of images, resolved in one batch."""
+    keys = []
+    for image in images:
+        keys.append(image.image)
+        keys.extend(key for formats in (image.variants or {}).values() for key in formats.values())
+    return image_urls.image_urls(keys)
+
+
+def listing_fields(image, urls=None):
+    """
+    Return the thumbnail_url, srcset and blurhash fields for an image in a listing response.
+    Pass the page's `urls` from page_urls() so a listing resolves its URLs in one batch.
+    """
+    variants = image.variants or {}
+    sized = sorted((int(width), keys) for width, keys in variants.items())
+    webp = [(width, keys["webp"]) for width, keys in sized if "webp" in keys]
+    if urls is None:
+        urls = page_urls([image])
+
+    thumbnail = next((keys.get("jpeg") or keys.get("webp") for _, keys in sized), None)
+    return {
+        "thumbnail_url": urls[thumbnail] if thumbnail else urls.get(str(image.image)),
+        "srcset": ", ".join(f"{urls[key]} {width}w" for width, key in webp),
+        "blurhash": image.blurhash or None,
+    }
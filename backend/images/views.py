@@ -3,7 +3,7 @@
 # analytics, and public exploration of images and albums.
 
 import os
-import boto3
+import time
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
@@ -11,56 +11,40 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
-from .models import UploadedImage, Album
-from .serializers import UploadedImageSerializer, AlbumSerializer, UserSerializer
+from django.core import signing
+from .models import UploadedImage, Album, UploadJob
+from .serializers import UploadedImageSerializer, AlbumSerializer, UserSerializer, serialize_images, serialize_albums
 from .aws_rekognition import analyze_image 
 from rest_framework import status
 from django.db import models
-from collections import Counter
 from django.contrib.auth.models import User, AnonymousUser
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.generics import ListAPIView
 from django.db.models import Q
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+from datetime import timedelta
 from django.contrib.auth.models import User
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
+from . import embedding_model
+from . import upload_pipeline
+from . import label_cache
+from . import tag_index
+from . import album_membership
+from . import pagination
+from . import tag_rollup
+from . import tag_vocabulary
+from . import image_urls
+from . import variants
+from . import aws_clients
+from . import image_deletion
+from . import image_search
+from . import prompt_parser
+from . import label_taxonomy
+from .storage import get_storage
 from users.models import Profile 
 
-# AWS Rekognition and S3 clients
-# These clients are used for interacting with AWS services for image analysis and storage.
-
-# Converting tags into vector embeddings
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-CSV_FILE_PATH = os.path.join(os.path.dirname(__file__), "AmazonRekognitionAllLabels.csv")
-
-def load_rekognition_tags():
-    try:
-        df = pd.read_csv(CSV_FILE_PATH)
-        return df.iloc[:, 0].dropna().unique().tolist()
-    except Exception as e:
-        print(f"Error loading Rekognition tags: {e}")
-        return []
-
-rekognition_tags = load_rekognition_tags()
-rekognition_embeddings = {tag: model.encode(tag) for tag in rekognition_tags}
-
-# AWS S3 client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
-)
-
-# AWS Rekognition client
-rekognition_client = boto3.client(
-    "rekognition",
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
-)
+# The embedding model and label matrix are loaded lazily by `embedding_model` on first use,
+# so importing this module (e.g. for migrations or management commands) never loads torch.
 
 # Image upload and processing views
 # These views handle image uploads, tag generation, and finalising uploads with user-selected tags.
@@ -75,34 +59,33 @@ class ImageUploadView(APIView):
             if not image_file:
                 return Response({"error": "No image provided"}, status=400)
 
-            # Define S3 path
-            s3_key = f"user_{request.user.id}/uploads/{image_file.name}"
-            s3_bucket = settings.AWS_STORAGE_BUCKET_NAME
+            content_hash = label_cache.content_hash(image_file)
 
-            # Upload image to S3
-            s3_client.upload_fileobj(image_file, s3_bucket, s3_key)
+            # Reuse the stored object if this user already uploaded the same bytes
+            s3_key = upload_pipeline.find_stored_duplicate(request.user.id, content_hash)
+            if s3_key is None:
+                s3_key = upload_pipeline.storage_key(request.user.id, content_hash, image_file.name)
+                get_storage().upload(image_file, s3_key)
 
-            # Analyse image with AWS Rekognition (top 5 tags sorted by confidence)
-            rekognition_response = rekognition_client.detect_labels(
-                Image={"S3Object": {"Bucket": s3_bucket, "Name": s3_key}},
-                MaxLabels=10
-            )
-            ai_tags = sorted(rekognition_response["Labels"], key=lambda x: x["Confidence"], reverse=True)[:5]
-            top_tags = [label["Name"] for label in ai_tags]
+            # Analyse image with AWS Rekognition (top 5 tags sorted by confidence), reusing cached labels
+            labels = label_cache.detect_labels(content_hash, get_storage().labeler_image(s3_key))
+            top_tags = upload_pipeline.top_tags_from_labels(labels)
 
             # Save image without tags (tags will be added when user confirms)
             uploaded_image = UploadedImage.objects.create(
                 user=request.user,
                 image=s3_key,
                 tags=[],
-                name=image_file.name
+                name=image_file.name,
+                content_hash=content_hash
             )
+            variants.schedule(uploaded_image)
 
             return Response({
                 "message": "Image uploaded successfully",
                 "data": {
                     "id": uploaded_image.id,
-                    "image_url": f"https://{s3_bucket}.s3.amazonaws.com/{s3_key}",
+                    "image_url": image_urls.image_url(s3_key),
                     "tags": top_tags
                 },
             }, status=201)
@@ -110,6 +93,62 @@ class ImageUploadView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+class AsyncImageUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        """ Accepts an image and returns immediately; storage and tagging run in the upload worker """
+        image_file = request.FILES.get("image")
+        if not image_file:
+            return Response({"error": "No image provided"}, status=400)
+
+        job = upload_pipeline.enqueue_upload(request.user, image_file)
+
+        return Response({
+            "message": "Image received",
+            "job_id": job.id,
+            "status": job.status,
+        }, status=status.HTTP_202_ACCEPTED)
+
+class BulkImageUploadView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        """ Uploads many images in one request; suggested tags are generated by the upload worker """
+        image_files = request.FILES.getlist("images")
+        if not image_files:
+            return Response({"error": "No images provided"}, status=400)
+
+        max_files = getattr(settings, "BULK_UPLOAD_MAX_FILES", 500)
+        if len(image_files) > max_files:
+            return Response({"error": f"At most {max_files} images can be uploaded at once"}, status=400)
+
+        results = upload_pipeline.bulk_store(request.user, image_files)
+        uploaded = sum(1 for result in results if result["status"] == "uploaded")
+
+        return Response({
+            "message": f"Uploaded {uploaded} of {len(results)} images",
+            "results": results,
+        }, status=201 if uploaded else 500)
+
+class UploadJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """ Poll the state of an asynchronous upload and its suggested tags """
+        job = get_object_or_404(UploadJob.objects.select_related("image"), id=job_id, user=request.user)
+
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "image_id": job.image_id,
+            "image_url": image_urls.image_url(job.image.image) if job.image else None,
+            "tags": job.suggested_tags,
+            "error": job.error if job.status == UploadJob.STATUS_FAILED else None,
+        }, status=200)
+
 class UserImagesView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -117,17 +156,18 @@ class UserImagesView(APIView):
         try:
             user_images = UploadedImage.objects.filter(user=request.user)
 
-            image_data = [
-                {
+            def serialize_page(images):
+                urls = variants.page_urls(images)
+                return [{
                     "id": image.id,
-                    "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{image.image}",
+                    "image_url": urls.get(image.image),
                     "tags": image.tags,
                     "name": image.name,
                     "uploaded_at": image.uploaded_at.strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                for image in user_images
-            ]
-            return Response(image_data, status=200)
+                    **variants.listing_fields(image, urls),
+                } for image in images]
+
+            return pagination.list_response(request, user_images, serialize_page)
 
         except Exception as e:
             return Response({"error": str(e)}, status=500)
@@ -145,33 +185,35 @@ class UserSpecificImagesView(APIView):
         if not user_images.exists():
             return Response({"error": "No images found for this user."}, status=404)
 
-        image_data = [
-            {
+        def serialize_page(images):
+            urls = variants.page_urls(images)
+            return [{
                 "id": img.id,
-                "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{img.image}",
+                "image_url": urls.get(img.image),
                 "tags": img.tags,
-                "posted_by": img.user.username,
-            }
-            for img in user_images
-        ]
-        return Response(image_data, status=200)
+                "posted_by": user.username,
+                **variants.listing_fields(img, urls),
+            } for img in images]
+
+        return pagination.list_response(request, user_images, serialize_page)
 
 class UserSpecificAlbumsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, user_id):
         user = get_object_or_404(User, id=user_id)
-        albums = Album.objects.filter(user=user)
+        albums = Album.objects.filter(user=user).select_related("cover_image")
 
         if not albums.exists():
             return Response({"error": "No albums found for this user."}, status=404)
 
+        urls = image_urls.image_urls([album.cover_image.image for album in albums if album.cover_image])
         album_data = [
             {
                 "id": album.id,
                 "name": album.name,
-                "owner": album.user.username,
-                "cover_image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{album.cover_image.image}"
+                "owner": user.username,
+                "cover_image_url": urls.get(album.cover_image.image)
                 if album.cover_image else None,
             }
             for album in albums
@@ -187,8 +229,18 @@ class FinalizeImageUploadView(APIView):
     def post(self, request):
         try:
             image_id = request.data.get("image_id")
+            upload_token = request.data.get("upload_token")
             selected_tags = request.data.get("tags", [])
 
+            # Staged uploads from generate-tags are saved here, with no second upload or Rekognition call
+            if upload_token:
+                try:
+                    image = upload_pipeline.finalize_staged_upload(request.user, upload_token, selected_tags)
+                except signing.BadSignature:
+                    return Response({"error": "Upload token is invalid or has expired"}, status=400)
+
+                return Response({"message": "Image uploaded successfully!", "id": image.id, "tags": image.tags}, status=201)
+
             if not image_id:
                 return Response({"error": "Image ID is required"}, status=400)
 
@@ -196,8 +248,7 @@ class FinalizeImageUploadView(APIView):
             if not image:
                 return Response({"error": "Image not found or unauthorized"}, status=404)
 
-            image.tags = selected_tags
-            image.save()
+            tag_index.set_image_tags(image, selected_tags)
 
             return Response({"message": "Tags updated successfully!", "tags": image.tags}, status=200)
 
@@ -214,13 +265,18 @@ class GenerateTagsView(APIView):
             if not image_file:
                 return Response({"error": "No image provided"}, status=400)
 
-            rekognition_response = rekognition_client.detect_labels(
-                Image={"Bytes": image_file.read()},
-                MaxLabels=10
-            )
+            # With "stage", also store the image and return a token for finalize-upload
+            if str(request.data.get("stage", "")).lower() in ("1", "true"):
+                upload_token, top_tags = upload_pipeline.stage_upload(request.user, image_file)
+                return Response({
+                    "message": "Tags generated successfully",
+                    "tags": top_tags,
+                    "upload_token": upload_token,
+                }, status=200)
 
-            ai_tags = sorted(rekognition_response["Labels"], key=lambda x: x["Confidence"], reverse=True)[:5]
-            top_tags = [label["Name"] for label in ai_tags] 
+            content_hash = label_cache.content_hash(image_file)
+            labels = label_cache.detect_labels(content_hash, {"Bytes": image_file.read()})
+            top_tags = upload_pipeline.top_tags_from_labels(labels)
 
             return Response({
                 "message": "Tags generated successfully",
@@ -249,12 +305,13 @@ class UserAlbumsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        albums = Album.objects.filter(user=request.user)
+        albums = Album.objects.filter(user=request.user).select_related("cover_image")
+        urls = image_urls.image_urls([album.cover_image.image for album in albums if album.cover_image])
         data = [
             {
                 "id": album.id,
                 "name": album.name,
-                "cover_image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{album.cover_image.image}" if album.cover_image else None
+                "cover_image_url": urls.get(album.cover_image.image) if album.cover_image else None
             } 
             for album in albums
         ]
@@ -264,37 +321,41 @@ class AlbumImagesView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, album_id):
-        album = get_object_or_404(Album, id=album_id)
-        all_images = UploadedImage.objects.filter(user=album.user)
+        album = get_object_or_404(Album.objects.select_related("user"), id=album_id)
 
-        # Get existing manually-added images 
-        existing_images = set(album.images.all())
+        # Membership (manual + tag-matched images) is kept up to date when tags change,
+        # so viewing an album is a read-only query
+        combined_images = album.images.all()
 
-        # Get tag-matching images
-        tag_matched = set(
-            img for img in all_images if any(tag in album.tags for tag in img.tags)
-        )
-
-        # Combine both sets (preserve manual + auto-tagged)
-        combined_images = list(existing_images.union(tag_matched))
+        def serialize_page(images):
+            urls = variants.page_urls(images)
+            return [{
+                "id": img.id,
+                "image_url": urls.get(img.image),
+                "tags": img.tags,
+                **variants.listing_fields(img, urls),
+            } for img in images]
 
-        # Update album.images (only if needed)
-        album.images.set(combined_images)
+        # ?stream=true streams just the images; ?page_size / ?cursor page them under "images"
+        if request.query_params.get("stream") == "true":
+            return pagination.stream_ndjson(combined_images, serialize_page)
 
-        return Response({
+        album_data = {
             "id": album.id,
             "album_name": album.name,
             "owner_username": album.user.username,
             "tags": album.tags,
-            "images": [
-                {
-                    "id": img.id,
-                    "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{img.image}",
-                    "tags": img.tags,
-                }
-                for img in combined_images
-            ]
-        }, status=200)
+        }
+        if "page_size" in request.query_params or "cursor" in request.query_params:
+            try:
+                page, album_data["next_cursor"] = pagination.paginate(combined_images, request)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            album_data["images"] = serialize_page(page)
+        else:
+            album_data["images"] = pagination.serialize_all(combined_images, serialize_page)
+
+        return Response(album_data, status=200)
 
     def post(self, request, album_id):
         album = get_object_or_404(Album, id=album_id, user=request.user)
@@ -323,7 +384,7 @@ class AlbumImagesView(APIView):
 
         image = get_object_or_404(UploadedImage, id=image_id, user=request.user)
 
-        if image not in album.images.all():
+        if not album.images.filter(id=image.id).exists():
             return Response({"error": "Image not found in album"}, status=400)
 
         album.images.remove(image)
@@ -334,10 +395,13 @@ class UserTagsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user_images = UploadedImage.objects.filter(user=request.user)
+        # Unique tags across the user's images, cached until their tags next change.
+        # Autocomplete can narrow them with ?prefix= on every keystroke without touching the database
+        unique_tags = tag_vocabulary.user_tags(request.user)
 
-        # Extract unique tags from the user's images
-        unique_tags = sorted(set(tag for image in user_images for tag in image.tags))
+        prefix = request.query_params.get("prefix", "").strip().lower()
+        if prefix:
+            unique_tags = [tag for tag in unique_tags if tag.lower().startswith(prefix)]
 
         return Response({"tags": unique_tags}, status=200)
 
@@ -350,7 +414,6 @@ class SetAlbumCoverView(APIView):
         image_id = request.data.get("image_id")
 
         print(f"Received album_id: {album_id}, image_id: {image_id}")
-        print(f"Album contains images: {[img.id for img in album.images.all()]}")
 
         if not image_id:
             return Response({"error": "Image ID is required"}, status=400)
@@ -360,7 +423,7 @@ class SetAlbumCoverView(APIView):
         except UploadedImage.DoesNotExist:
             return Response({"error": "Image not found"}, status=404)
 
-        if image not in album.images.all():
+        if not album.images.filter(id=image.id).exists():
             return Response({"error": "Image is not in the album"}, status=400)
 
         album.cover_image = image
@@ -370,18 +433,18 @@ class SetAlbumCoverView(APIView):
 
         return Response({
             "message": "Cover image updated successfully",
-            "cover_image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{album.cover_image.image}"
+            "cover_image_url": image_urls.image_url(album.cover_image.image)
         }, status=200)
 
 class ImageDetailView(APIView):
     permission_classes = [AllowAny] 
 
     def get(self, request, image_id):
-        image = get_object_or_404(UploadedImage, id=image_id) 
+        image = get_object_or_404(UploadedImage.objects.select_related("user"), id=image_id)
 
         data = {
             "id": image.id,
-            "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{image.image}",
+            "image_url": image_urls.image_url(image.image),
             "name": image.name,
             "tags": image.tags,
             "uploaded_at": image.uploaded_at.strftime("%Y-%m-%d %H:%M:%S"),
@@ -401,6 +464,7 @@ class EditImageNameView(APIView):
 
         image.name = new_name
         image.save()
+        image_search.mark_stale([image])
 
         return Response({"message": "Image name updated successfully", "name": image.name}, status=200)
 
@@ -426,21 +490,12 @@ class AddTagsToAlbumView(APIView):
         if not isinstance(tags_to_add, list):
             return Response({"error": "Tags should be a list"}, status=400)
 
-        # Update album's tags
-        album.tags = list(set(album.tags + tags_to_add))
-        album.save()
-
-        # Find all images that match the updated album tags
-        matching_images = UploadedImage.objects.filter(user=request.user).filter(
-            models.Q(tags__overlap=album.tags)
-        )
-
-        # Combine with existing manually-added images
-        existing_images = set(album.images.all())
-        combined_images = list(existing_images.union(matching_images))
+        # Update album's tags; images carrying the new tags join the album
+        album_membership.set_album_tags(album, list(set(album.tags + tags_to_add)))
 
-        # Update album
-        album.images.set(combined_images)
+        # Find all images that match the updated album tags, or labels below them in the taxonomy
+        matching_images = list(tag_index.images_with_any_tag(request.user, label_taxonomy.get_taxonomy().expand(album.tags)))
+        urls = image_urls.image_urls([img.image for img in matching_images])
 
         print(f"Tags after saving album: {album.tags}")
         print(f"Successfully linked {len(matching_images)} images to album '{album.name}'")
@@ -449,7 +504,7 @@ class AddTagsToAlbumView(APIView):
             "message": "Tags added successfully",
             "tags": album.tags,
             "images": [
-                {"id": img.id, "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{img.image}", "tags": img.tags}
+                {"id": img.id, "image_url": urls.get(img.image), "tags": img.tags}
                 for img in matching_images
             ]
         }, status=200)
@@ -467,21 +522,16 @@ class RemoveTagsFromAlbumView(APIView):
         # Flatten nested lists if needed
         tags_to_remove = [tag for sublist in tags_to_remove for tag in (sublist if isinstance(sublist, list) else [sublist])]
 
-        # Remove only the selected tags from the album's tags
-        album.tags = [tag for tag in album.tags if tag not in tags_to_remove]
-        album.save()
+        # Remove only the selected tags from the album's tags; images that only
+        # matched through them leave the album
+        album_membership.set_album_tags(album, [tag for tag in album.tags if tag not in tags_to_remove])
 
         print(f"Tags removed: {tags_to_remove}")
         print(f"Updated Album Tags: {album.tags}")
 
-        # Find images that still match at least one album tag
-        updated_images = UploadedImage.objects.filter(user=request.user).filter(
-            models.Q(tags__overlap=album.tags)
-        )
-
-        # Ensure only images that no longer match album tags are removed
-        images_to_remove = album.images.exclude(id__in=updated_images.values_list('id', flat=True))
-        album.images.remove(*images_to_remove)
+        # Find images that still match at least one album tag, or a label below one in the taxonomy
+        updated_images = list(tag_index.images_with_any_tag(request.user, label_taxonomy.get_taxonomy().expand(album.tags)))
+        urls = image_urls.image_urls([img.image for img in updated_images])
 
         print(f"Remaining Images in Album: {[img.id for img in updated_images]}")
 
@@ -491,7 +541,7 @@ class RemoveTagsFromAlbumView(APIView):
             "images": [
                 {
                     "id": img.id, 
-                    "image_url": f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{img.image}", 
+                    "image_url": urls.get(img.image), 
                     "tags": img.tags
                 }
                 for img in updated_images
@@ -504,25 +554,34 @@ class DeleteImageView(APIView):
     def delete(self, request, image_id):
         image = get_object_or_404(UploadedImage, id=image_id, user=request.user)
 
-        albums = Album.objects.filter(images=image)
-        for album in albums:
-            album.images.remove(image)
+        # Albums, tag counts and stored objects are cleaned up in one batch (see image_deletion)
+        image_deletion.delete_images(request.user, [image.id])
+
+        return Response({"message": "Image deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
-            if album.cover_image == image:
-                album.cover_image = None
-                album.save()
+class BulkDeleteImagesView(APIView):
+    permission_classes = [IsAuthenticated]
 
+    def post(self, request):
+        """ Deletes many of the user's images at once; ids that are not the user's images are reported as not found """
+        image_ids = request.data.get("image_ids")
+        if not isinstance(image_ids, list) or not image_ids:
+            return Response({"error": "image_ids must be a non-empty list"}, status=400)
         try:
-            s3_client.delete_object(
-                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                Key=image.image
-            )
-        except Exception as e:
-            print(f"Failed to delete image from S3: {e}")
+            image_ids = list(dict.fromkeys(int(image_id) for image_id in image_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "image_ids must be integers"}, status=400)
 
-        image.delete()
+        max_images = getattr(settings, "BULK_DELETE_MAX_IMAGES", 1000)
+        if len(image_ids) > max_images:
+            return Response({"error": f"At most {max_images} images can be deleted at once"}, status=400)
 
-        return Response({"message": "Image deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
+        deleted = image_deletion.delete_images(request.user, image_ids)
+
+        return Response({
+            "deleted": deleted,
+            "not_found": sorted(set(image_ids) - set(deleted)),
+        }, status=200)
 
 class EditImageTagsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -536,8 +595,7 @@ class EditImageTagsView(APIView):
         
         formatted_tags = list(set(tag.capitalize() for tag in updated_tags))
 
-        image.tags = formatted_tags
-        image.save()
+        tag_index.set_image_tags(image, formatted_tags)
 
         return Response({"message": "Tags updated successfully", "tags": image.tags}, status=200)
 
@@ -548,36 +606,59 @@ class AnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user_images = UploadedImage.objects.filter(user=request.user)
+        try:
+            days = min(int(request.query_params.get("days", 30)), 366)
+            weeks = min(int(request.query_params.get("weeks", 12)), 104)
+        except ValueError:
+            return Response({"error": "days and weeks must be numbers"}, status=400)
 
-        total_images = user_images.count()
+        total_images = UploadedImage.objects.filter(user=request.user).count()
 
-        all_tags = [tag for image in user_images for tag in image.tags]
-        tag_counts = Counter(all_tags)
+        # Per-tag counts come from the TagCount rollup, kept current on every tag write
+        tag_counts = tag_rollup.user_tag_counts(request.user)
 
-        top_tags = tag_counts.most_common(5)
-        tag_distribution = [{"tag": tag, "count": count} for tag, count in tag_counts.items()]
+        top_tags = tag_counts[:5]
+        tag_distribution = [{"tag": tag, "count": count} for tag, count in tag_counts]
 
         return Response({
             "total_images": total_images,
             "top_tags": top_tags,
             "tag_distribution": tag_distribution,
+            "uploads_by_day": self.upload_buckets(request.user, TruncDay, timedelta(days=days)),
+            "uploads_by_week": self.upload_buckets(request.user, TruncWeek, timedelta(weeks=weeks)),
         }, status=200)
 
+    def upload_buckets(self, user, trunc, period):
+        """ Upload counts per day or week over the given period, grouped in SQL; empty buckets are omitted """
+        buckets = (
+            UploadedImage.objects.filter(user=user, uploaded_at__gte=timezone.now() - period)
+            .annotate(bucket=trunc("uploaded_at"))
+            .values_list("bucket")
+            .annotate(count=models.Count("id"))
+            .order_by("bucket")
+        )
+        return [{"period": bucket.date().isoformat(), "count": count} for bucket, count in buckets]
+
 class PublicUsersView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
         search_query = request.query_params.get("search", "")
 
-        users = User.objects.filter(username__icontains=search_query)
-        users_data = []
+        users = list(User.objects.filter(username__icontains=search_query).select_related("profile"))
 
+        # Create any missing profiles in one query instead of one get_or_create per user
+        missing = [Profile(user=user) for user in users if not hasattr(user, "profile")]
+        Profile.objects.bulk_create(missing)
+        for profile in missing:
+            profile.user.profile = profile
+
+        users_data = []
         for user in users:
-            profile, _ = Profile.objects.get_or_create(user=user)
-            
+            profile = user.profile
+
             profile_picture_url = (
-                f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{profile.profile_picture}"
+                image_urls.image_url(profile.profile_picture)
                 if profile.profile_picture else None
             )
 
@@ -602,16 +683,21 @@ class PublicImagesView(ListAPIView):
 
         search_query = self.request.query_params.get("search", "")
         if search_query:
-            queryset = queryset.filter(tags__icontains=search_query)
+            queryset = queryset.filter(id__in=tag_index.images_matching_tag_text(search_query).values("id"))
 
-        return queryset
+        return queryset.select_related("user")
+
+    def list(self, request, *args, **kwargs):
+        return pagination.list_response(
+            request, self.get_queryset(), lambda images: serialize_images(images, **self.get_serializer_context())
+        )
 
 class PublicAlbumsView(ListAPIView):
     serializer_class = AlbumSerializer
     permission_classes = [AllowAny] 
 
     def get_queryset(self):
-        queryset = Album.objects.all().select_related("user")
+        queryset = Album.objects.all().select_related("user", "cover_image")
 
         if self.request.user and self.request.user.is_authenticated:
             queryset = queryset.exclude(user=self.request.user)
@@ -622,6 +708,91 @@ class PublicAlbumsView(ListAPIView):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        return Response(serialize_albums(self.get_queryset(), **self.get_serializer_context()), status=200)
+
+
+class TagSearchView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Finds images (or albums with ?kind=albums) by exact tags: ?tags=Dog,Beach matches any of them,
+        add &match=all to require every tag. Use ?scope=mine for the logged-in user's own items.
+        """
+        tags = [tag.strip() for tag in request.query_params.get("tags", "").split(",") if tag.strip()]
+        if not tags:
+            return Response({"error": "At least one tag is required"}, status=400)
+
+        kind = request.query_params.get("kind", "images")
+        if kind not in ("images", "albums"):
+            return Response({"error": "kind must be 'images' or 'albums'"}, status=400)
+
+        if kind == "albums":
+            queryset, serialize = Album.objects.select_related("user", "cover_image"), serialize_albums
+        else:
+            queryset, serialize = UploadedImage.objects.select_related("user"), serialize_images
+
+        if request.query_params.get("scope") == "mine":
+            if not request.user.is_authenticated:
+                return Response({"error": "Authentication required"}, status=401)
+            queryset = queryset.filter(user=request.user)
+
+        match_all = request.query_params.get("match") == "all"
+        queryset = tag_index.filter_by_tags(queryset, tags, match_all=match_all)
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 100)), 500))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=400)
+
+        return Response(serialize(queryset.order_by("-id")[:limit]), status=200)
+
+class SemanticSearchView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """
+        Ranks images by meaning rather than exact tags, e.g. ?q=dogs playing on a beach.
+        Searches every image, or the logged-in user's own with ?scope=mine; ?limit= caps the results.
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "A search query is required"}, status=400)
+
+        user = None
+        if request.query_params.get("scope") == "mine":
+            if not request.user.is_authenticated:
+                return Response({"error": "Authentication required"}, status=401)
+            user = request.user
+
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=400)
+
+        started = time.perf_counter()
+        results = image_search.search(query, user=user, k=limit)
+        images = serialize_images([image for image, _ in results])
+        for item, (_, score) in zip(images, results):
+            item["score"] = round(score, 4)
+
+        return Response({
+            "results": images,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        }, status=200)
+
+class TagSuggestView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        """ Tag-name autocomplete by prefix, e.g. ?prefix=moun """
+        prefix = request.query_params.get("prefix", "").strip()
+        if not prefix:
+            return Response({"tags": []}, status=200)
+
+        return Response({"tags": tag_index.suggest_tag_names(prefix)}, status=200)
+
 
 class UpdateAlbumTagsFromPromptView(APIView):
     permission_classes = [IsAuthenticated]
@@ -633,47 +804,44 @@ class UpdateAlbumTagsFromPromptView(APIView):
 
         album = get_object_or_404(Album, id=album_id, user=request.user)
 
-        # Convert prompt to vector embedding
-        prompt_vector = model.encode(prompt)
-
-        def cosine_similarity(vec1, vec2):
-            return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
-
-        all_user_images = UploadedImage.objects.filter(user=request.user)
-        existing_tags = set(tag for image in all_user_images for tag in image.tags)
+        existing_tags = set(tag_vocabulary.user_tags(request.user))
 
-        # Compute similarity between the prompt and tags
-        tag_scores = [(tag, cosine_similarity(prompt_vector, emb)) for tag, emb in rekognition_embeddings.items()]
-        tag_scores.sort(key=lambda x: x[1], reverse=True)
-
-        # Determine which tags to include or exclude based on the prompt
-        positive_tags = []
-        negative_tags = []
-
-        for tag, score in tag_scores[:15]:
-            if f"no {tag.lower()}" in prompt.lower() or f"without {tag.lower()}" in prompt.lower():
-                negative_tags.append(tag)
-            else:
-                positive_tags.append(tag)
+        # Split the prompt into what to include and what to exclude, and rank labels for each
+        positive_tags, negative_tags = prompt_parser.resolve_tags(prompt, k=15)
 
         # Keep only tags that exist in the user's images
-        new_album_tags = [tag for tag in positive_tags if tag in existing_tags and tag not in negative_tags]
+        new_album_tags = [tag for tag in positive_tags if tag in existing_tags]
 
         if not new_album_tags:
             return Response({"error": "No valid tags to update"}, status=400)
 
-        album.tags = new_album_tags
-        album.save()
+        album_membership.set_album_tags(album, new_album_tags)
 
-        matching_images = UploadedImage.objects.filter(user=request.user, tags__overlap=new_album_tags)
-        existing_images = set(album.images.all())
-        combined_images = list(existing_images.union(matching_images))
-        album.images.set(combined_images)
+        matching_images = tag_index.images_with_any_tag(
+            request.user, label_taxonomy.get_taxonomy().expand(new_album_tags)
+        ).select_related("user")
 
         return Response({
             "prompt": prompt,
             "updated_tags": new_album_tags,
             "excluded_tags": negative_tags,
             "album_id": album.id,
-            "matched_images": UploadedImageSerializer(matching_images, many=True).data,
+            "matched_images": serialize_images(matching_images),
         })
+
+
+# Operational views
+# These views expose in-process metrics for staff users.
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "embedding_model": embedding_model.metrics(),
+            "label_cache": label_cache.stats(),
+            "image_urls": image_urls.stats(),
+            "aws_clients": aws_clients.stats(),
+            "storage_deletions": image_deletion.stats(),
+            "image_search": image_search.stats(),
+        }, status=200)
@@ -12,13 +12,14 @@ from .serializers import UserSerializer
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from images.models import UploadedImage, Album
+from images import image_deletion, image_urls, upload_pipeline
+from images.storage import get_storage
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.conf import settings
 from .models import Profile
-import boto3
 from rest_framework.parsers import MultiPartParser, FormParser
 import json
 import traceback
@@ -41,7 +42,7 @@ class UserProfileView(APIView):
 
             # Ensure profile picture URL is correctly formatted
             if profile.profile_picture:
-                profile_picture_url = f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/{profile.profile_picture}"
+                profile_picture_url = image_urls.image_url(profile.profile_picture)
             else:
                 profile_picture_url = None
 
@@ -100,30 +101,22 @@ class UploadProfilePictureView(APIView):
 
             profile_picture = request.FILES["profile_picture"]
             
-            # Define S3 path
+            # Define storage path
             s3_key = f"profile_pictures/{user.username}.jpg"
-            s3_bucket = settings.AWS_STORAGE_BUCKET_NAME
-
-            # Upload to S3
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION,
-            )
 
+            # Upload through the configured storage backend
             try:
-                s3_client.upload_fileobj(profile_picture, s3_bucket, s3_key)
+                get_storage().upload(profile_picture, s3_key)
             except Exception as s3_error:
-                print(f"S3 Upload Error: {s3_error}")
-                return Response({"error": "Failed to upload profile picture to S3"}, status=500)
+                print(f"Storage Upload Error: {s3_error}")
+                return Response({"error": "Failed to upload profile picture"}, status=500)
 
             # Update the profile picture URL in the database
             profile, _ = Profile.objects.get_or_create(user=user)
             profile.profile_picture = s3_key 
             profile.save()
 
-            profile_picture_url = f"https://{s3_bucket}.s3.amazonaws.com/{s3_key}"
+            profile_picture_url = image_urls.image_url(s3_key)
 
             return Response({
                 "message": "Profile picture updated successfully",
@@ -184,8 +177,9 @@ class DeleteAccountView(APIView):
     def delete(self, request):
         user = request.user
 
-        # Delete all user-related images
-        UploadedImage.objects.filter(user=user).delete()
+        # Delete all user-related images, queueing their stored objects for deletion
+        image_deletion.delete_images(user, list(UploadedImage.objects.filter(user=user).values_list("id", flat=True)))
+        upload_pipeline.expire_staged_uploads(user=user)
 
         # Delete all user-related albums
         Album.objects.filter(user=user).delete()
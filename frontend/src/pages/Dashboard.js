@@ -168,7 +168,13 @@ const Dashboard = () => {
             style={{ position: "relative" }}
             onClick={() => !removeImageMode && navigate(`/image/${img.id}`)}
           >
-            <img src={img.image_url} alt="Uploaded" />
+            <img
+              src={img.thumbnail_url || img.image_url}
+              srcSet={img.srcset || undefined}
+              sizes="200px"
+              loading="lazy"
+              alt="Uploaded"
+            />
             {removeImageMode && (
               <button className="remove-image-btn" onClick={(e) => {
                 e.stopPropagation();
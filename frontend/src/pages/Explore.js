@@ -121,7 +121,13 @@ const Explore = () => {
         <div className="images-grid">
           {images.map((img) => (
             <div key={img.id} className="image-card" onClick={() => navigate(`/image/${img.id}`)}>
-              <img src={img.image_url} alt={img.name || "Image"} />
+              <img
+                src={img.thumbnail_url || img.image_url}
+                srcSet={img.srcset || undefined}
+                sizes="200px"
+                loading="lazy"
+                alt={img.name || "Image"}
+              />
             </div>
           ))}
         </div>
@@ -1,7 +1,9 @@
 // This page allows users to drag and drop images, generate AI tags, select or add custom tags,
-// and upload images to the server with finalised tags.
+// and upload images to the server with finalised tags. Generating tags also stores the image,
+// so finalising only commits the chosen tags against the returned upload token. Tokens are kept
+// per dropped file, and an expired or already used token falls back to a fresh upload.
 
-import React, { useState, useCallback } from "react";
+import React, { useState, useCallback, useRef } from "react";
 import { useDropzone } from "react-dropzone";
 import { useNavigate } from "react-router-dom";
 import axios from "axios";
@@ -12,6 +14,8 @@ function Upload() {
   const [aiTags, setAiTags] = useState({});
   const [selectedTags, setSelectedTags] = useState({});
   const [customTags, setCustomTags] = useState({});
+  // Keyed by File object, as two dropped files can share a name
+  const uploadTokens = useRef(new WeakMap());
   const navigate = useNavigate();
 
   const dropzoneStyle = {
@@ -32,9 +36,12 @@ function Upload() {
 
     setImages((prev) => [...prev, ...fileObjects]);
 
-    // Fetch AI tags immediately without uploading the image
+    // Fetch AI tags immediately; the image is stored once and an upload token is kept for finalising
     for (const fileObj of fileObjects) {
-      const tags = await getAiTagsForImage(fileObj.file);
+      const { tags, uploadToken } = await getAiTagsForImage(fileObj.file);
+      if (uploadToken) {
+        uploadTokens.current.set(fileObj.file, uploadToken);
+      }
       if (tags.length > 0) {
         setAiTags((prev) => ({
           ...prev,
@@ -50,13 +57,14 @@ function Upload() {
     multiple: true,
   });
 
-  // Fetch AI-generated tags without uploading the image
+  // Fetch AI-generated tags and stage the image for a later finalise
   const getAiTagsForImage = async (imageFile) => {
     const token = localStorage.getItem("token");
-    if (!token) return [];
+    if (!token) return { tags: [], uploadToken: null };
 
     const formData = new FormData();
     formData.append("image", imageFile);
+    formData.append("stage", "true");
 
     try {
       const response = await axios.post("http://127.0.0.1:8000/images/generate-tags/", formData, {
@@ -66,11 +74,44 @@ function Upload() {
         },
       });
 
-      return response.data.tags || [];
+      return { tags: response.data.tags || [], uploadToken: response.data.upload_token || null };
     } catch (error) {
       console.error("Error fetching AI tags:", error);
-      return [];
+      return { tags: [], uploadToken: null };
+    }
+  };
+
+  // Saves an image with its tags: commits a staged upload if there is one, otherwise uploads it first
+  const saveImage = async (imageObj, tags, token) => {
+    const headers = { Authorization: `Bearer ${token}` };
+    const uploadToken = uploadTokens.current.get(imageObj.file);
+
+    if (uploadToken) {
+      // Tokens are single-use and expire, so one that is rejected is dropped for a fresh upload
+      try {
+        await axios.post("http://127.0.0.1:8000/images/finalize-upload/", {
+          upload_token: uploadToken,
+          tags,
+        }, { headers });
+        uploadTokens.current.delete(imageObj.file);
+        return;
+      } catch (error) {
+        if (error.response?.status !== 400) throw error;
+        uploadTokens.current.delete(imageObj.file);
+      }
     }
+
+    const formData = new FormData();
+    formData.append("image", imageObj.file);
+
+    const uploadResponse = await axios.post("http://127.0.0.1:8000/images/upload/", formData, {
+      headers: { ...headers, "Content-Type": "multipart/form-data" },
+    });
+
+    await axios.post("http://127.0.0.1:8000/images/finalize-upload/", {
+      image_id: uploadResponse.data.data.id,
+      tags,
+    }, { headers });
   };
 
   const toggleTag = (imageName, tag) => {
@@ -106,27 +147,8 @@ function Upload() {
       return;
     }
 
-    const formData = new FormData();
-    formData.append("image", imageObj.file);
-
     try {
-      // Upload the image first
-      const uploadResponse = await axios.post("http://127.0.0.1:8000/images/upload/", formData, {
-        headers: {
-          Authorization: `Bearer ${token}`,
-          "Content-Type": "multipart/form-data",
-        },
-      });
-
-      const uploadedImageId = uploadResponse.data.data.id;
-
-      // Send only selected tags
-      await axios.post("http://127.0.0.1:8000/images/finalize-upload/", {
-        image_id: uploadedImageId,
-        tags: finalTags,
-      }, {
-        headers: { Authorization: `Bearer ${token}` },
-      });
+      await saveImage(imageObj, finalTags, token);
 
       // Remove uploaded image from the list
       setImages((prevImages) => prevImages.filter((_, i) => i !== index));
@@ -150,27 +172,8 @@ function Upload() {
     }
 
     for (const imageObj of images) {
-      const formData = new FormData();
-      formData.append("image", imageObj.file);
-
       try {
-        const uploadResponse = await axios.post("http://127.0.0.1:8000/images/upload/", formData, {
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "multipart/form-data",
-          },
-        });
-
-        const uploadedImageId = uploadResponse.data.data.id;
-        const finalTags = aiTags[imageObj.file.name] || [];
-
-        await axios.post("http://127.0.0.1:8000/images/finalize-upload/", {
-          image_id: uploadedImageId,
-          tags: finalTags,
-        }, {
-          headers: { Authorization: `Bearer ${token}` },
-        });
-
+        await saveImage(imageObj, aiTags[imageObj.file.name] || [], token);
       } catch (error) {
         console.error("Quick Upload failed for an image:", error);
       }